@@ -9,14 +9,31 @@ import json
 import html
 import sys
 import os
-from typing import List, Dict, Tuple
-from collections import defaultdict
+import mmap
+from typing import List, Dict, Tuple, Optional
+
+from channel_stream import CHANNEL_PATTERN, CHANNEL_PATTERN_BYTES, decode_span, sniff_span_encoding
+from channel_table import Channel, ChannelTable
+from channel_classifier import GZIPTVChannelClassifier
+from pinyin_table import pinyin_initial
+from playlist_render import (DEFAULT_FCC, DEFAULT_FORMATS, DetailsSink, GZIPTVPlaylistRenderer, M3USink,
+                             PlaylistSink, create_sinks)
+from multicast_probe import DEAD_CATEGORY, GZIPTVMulticastProber, apply_results, save_results
+from playlist_snapshot import GZIPTVChannelSnapshot, atomic_open, save_change_report
+from stage_profiler import NULL_PROFILER, create_profiler, profile_dir_from_argv
 
 
 class GZIPTVM3UGenerator:
-    def __init__(self, html_file: str = 'final_frameset_builder.html'):
+    def __init__(self, html_file: str = 'final_frameset_builder.html', channel_store=None,
+                 classifier: Optional[GZIPTVChannelClassifier] = None, profiler=None):
         self.html_file = html_file
-        self.channels = []
+        self.channels = ChannelTable()
+        # 分类规则来自 channel_rules.json
+        self.classifier = classifier or GZIPTVChannelClassifier()
+        # 可选的频道历史库（channel_store.GZIPTVChannelStore）
+        self.channel_store = channel_store
+        # 分阶段性能分析（stage_profiler.GZITVStageProfiler），默认关闭
+        self.profiler = profiler or NULL_PROFILER
 
         print("=" * 70)
         print("贵州电信IPTV M3U生成器")
@@ -52,19 +69,56 @@ class GZIPTVM3UGenerator:
         print("❌ 所有编码尝试失败")
         sys.exit(1)
 
-    def extract_channels(self, content: str) -> List[Dict]:
+    def extract_channels(self, content: str) -> ChannelTable:
         """从HTML中提取频道信息"""
         print("\n🔍 提取频道信息...")
 
-        channels = []
-
         # 查找所有包含 ChannelName 和 ChannelSDP 的片段
-        # 格式: ChannelName="..."ChannelSDP="..."
-        pattern = r'ChannelName="([^"]+)"[^>]*?ChannelSDP="([^"]+)"'
-        matches = re.findall(pattern, content)
+        matches = CHANNEL_PATTERN.findall(content)
 
         print(f"  找到 {len(matches)} 个频道配置")
 
+        return self.build_channels(matches)
+
+    def extract_channels_from_file(self, html_file: Optional[str] = None) -> ChannelTable:
+        """内存映射方式提取频道：直接扫描原始字节，只解码命中的片段；文件不存在或没有频道数据时返回空表"""
+        html_file = html_file or self.html_file
+        print(f"📖 映射文件: {html_file}")
+
+        try:
+            with self.profiler.stage('load'), open(html_file, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    print("❌ 文件为空")
+                    return ChannelTable()
+
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if mm.find(b'ChannelName=') < 0 or mm.find(b'ChannelSDP=') < 0:
+                        print("❌ 未找到频道数据")
+                        return ChannelTable()
+
+                    print("\n🔍 提取频道信息...")
+                    # 只有命中的片段会被复制出来
+                    spans = [match.group(1, 2) for match in CHANNEL_PATTERN_BYTES.finditer(mm)]
+        except FileNotFoundError:
+            print(f"  ❌ 文件不存在: {html_file}")
+            return ChannelTable()
+
+        print(f"  找到 {len(spans)} 个频道配置")
+
+        with self.profiler.stage('extract'):
+            encoding = sniff_span_encoding([span for pair in spans for span in pair])
+            if not encoding:
+                print("❌ 所有编码尝试失败")
+                return ChannelTable()
+            print(f"  使用 {encoding} 编码解码频道片段")
+
+            matches = [(decode_span(name, encoding), decode_span(sdp, encoding)) for name, sdp in spans]
+            return self.build_channels(matches)
+
+    def build_channels(self, matches: List[Tuple[str, str]]) -> ChannelTable:
+        """将 (ChannelName, ChannelSDP) 对转换为频道记录"""
+        channels = []
+
         for i, (channel_name, channel_sdp) in enumerate(matches):
             try:
                 # HTML解码频道名称
@@ -106,14 +160,7 @@ class GZIPTVM3UGenerator:
                 sort_key = self.get_sort_key(clean_name, category)
 
                 # 添加到列表
-                channels.append({
-                    'original_name': channel_name,
-                    'name': clean_name,
-                    'igmp_url': igmp_url,
-                    'rtsp_url': rtsp_url,
-                    'category': category,
-                    'sort_key': sort_key
-                })
+                channels.append(Channel(channel_name, clean_name, igmp_url, rtsp_url, category, sort_key))
 
                 print(f"  ✓ {clean_name} [{category}]")
 
@@ -121,7 +168,7 @@ class GZIPTVM3UGenerator:
                 print(f"  ⚠️  解析第 {i + 1} 个频道失败: {e}")
                 continue
 
-        return channels
+        return ChannelTable(channels)
 
     def clean_channel_name(self, name: str) -> str:
         """清理频道名称"""
@@ -137,26 +184,14 @@ class GZIPTVM3UGenerator:
 
         return name.strip()
 
+    @property
+    def categories_order(self) -> List[str]:
+        """分组顺序：分类规则的顺序，组播探测标记的失效频道排在最后"""
+        return self.classifier.order + [DEAD_CATEGORY]
+
     def categorize_channel(self, name: str) -> str:
         """频道分类"""
-        # 央视分类
-        cctv_keywords = ['CCTV', '中央', '央视', 'CGTN']
-        for keyword in cctv_keywords:
-            if keyword in name:
-                return '央视'
-
-        # 卫视分类
-        if '卫视' in name:
-            return '卫视'
-
-        # 贵州分类
-        guizhou_keywords = ['贵州', '贵阳', '黔', '毕节', '安顺', '铜仁', '遵义', '雷山', '仁怀','六盘水', '凯里','六枝', '观山湖', '瓮安', '思南', '桐梓', '云岩']
-        for keyword in guizhou_keywords:
-            if keyword in name:
-                return '贵州'
-
-        # 其他分类
-        return '其他'
+        return self.classifier.classify(name)
 
     def get_sort_key(self, name: str, category: str) -> tuple:
         """获取排序键"""
@@ -184,67 +219,37 @@ class GZIPTVM3UGenerator:
 
             first_char = name[0]
 
-            # 如果是中文字符，获取拼音首字母
+            # 如果是中文字符，查表获取拼音首字母
             if '\u4e00' <= first_char <= '\u9fff':
-                # 常见频道首字母映射
-                pinyin_map = {
-                    'C': ['C', 'c', '中', '重', '川'],
-                    'A': ['A', 'a', '安', '澳'],
-                    'B': ['B', 'b', '北', '百', '八'],
-                    'D': ['D', 'd', '大', '东', '都'],
-                    'E': ['E', 'e', '二', '鄂'],
-                    'F': ['F', 'f', '福', '方'],
-                    'G': ['G', 'g', '贵', '广', '甘'],
-                    'H': ['H', 'h', '湖', '河', '海', '黑'],
-                    'J': ['J', 'j', '江', '吉', '九'],
-                    'K': ['K', 'k', '康', '卡'],
-                    'L': ['L', 'l', '六', '辽', '龙'],
-                    'M': ['M', 'm', '民', '美'],
-                    'N': ['N', 'n', '宁', '南', '农'],
-                    'Q': ['Q', 'q', '青', '七', '黔'],
-                    'R': ['R', 'r', '人', '日'],
-                    'S': ['S', 's', '三', '上', '四', '山', '四', '陕'],
-                    'T': ['T', 't', '天', '台'],
-                    'W': ['W', 'w', '五', '卫', '晚'],
-                    'X': ['X', 'x', '西', '新', '湘', '厦'],
-                    'Y': ['Y', 'y', '一', '央', '云', '延', '宜'],
-                    'Z': ['Z', 'z', '藏', '浙', '重', '中']
-                }
-
-                for key, chars in pinyin_map.items():
-                    if first_char in chars:
-                        return (key, name)
+                initial = pinyin_initial(first_char)
+                if initial:
+                    return (initial, name)
 
                 return (first_char.upper(), name)
             else:
                 # 英文字母直接返回
                 return (first_char.upper(), name)
 
-    def sort_channels(self, channels: List[Dict]) -> Dict[str, List[Dict]]:
-        """按分类和排序键排序"""
-        # 按分类分组
-        grouped = defaultdict(list)
-        for channel in channels:
-            grouped[channel['category']].append(channel)
-
-        # 对每个分类内的频道按排序键排序
-        for category in grouped:
-            if category == '央视':
-                # 央视按照数字排序
-                grouped[category] = sorted(grouped[category], key=lambda x: x['sort_key'])
-            else:
-                # 其他分类按照首字母排序
-                grouped[category] = sorted(grouped[category], key=lambda x: x['sort_key'])
+    def sort_channels(self, channels: ChannelTable) -> Dict[str, List[Channel]]:
+        """按分类和排序键排序（结果由频道表缓存）"""
+        return channels.grouped()
 
-        return grouped
+    def parse_records(self, records: List[Tuple[str, str]]) -> bool:
+        """直接使用已解析的 (ChannelName, ChannelSDP) 记录，例如获取脚本边下载边解析的结果"""
+        print(f"\n🔍 处理 {len(records)} 个频道配置...")
+        with self.profiler.stage('extract'):
+            self.channels = self.build_channels(records)
 
-    def parse_html(self) -> bool:
-        """解析HTML文件"""
-        content = self.load_html()
-        if not content:
+        if not self.channels:
+            print("❌ 未提取到任何频道")
             return False
 
-        self.channels = self.extract_channels(content)
+        print(f"\n✅ 成功提取 {len(self.channels)} 个频道")
+        return True
+
+    def parse_html(self) -> bool:
+        """解析HTML文件"""
+        self.channels = self.extract_channels_from_file()
 
         if not self.channels:
             print("❌ 未提取到任何频道")
@@ -257,62 +262,13 @@ class GZIPTVM3UGenerator:
         """生成M3U内容"""
         print(f"\n🎬 生成M3U文件 (UDPXY: {udpxy_url})...")
 
-        # 按分类和排序键排序
-        grouped_channels = self.sort_channels(self.channels)
-
-        # 分类顺序
-        categories_order = ['央视', '卫视', '贵州', '其他']
-
-        m3u_lines = ['#EXTM3U']
-
-        for category in categories_order:
-            if category not in grouped_channels or not grouped_channels[category]:
-                continue
-
-            channels = grouped_channels[category]
-
-            # 添加分类注释
-            m3u_lines.append(f'\n# 分类: {category}')
-
-            for channel in channels:
-                # 提取组播IP和端口
-                igmp_match = re.search(r'igmp://([^:]+):(\d+)', channel['igmp_url'])
-                if not igmp_match:
-                    continue
-
-                ip = igmp_match.group(1)
-                port = igmp_match.group(2)
-
-                # 构建播放地址
-                play_url = f"{udpxy_url}/{ip}:{port}?fcc=10.255.5.32:8027"
-
-                # 构建EXTINF行
-                extinf_parts = [
-                    f'#EXTINF:-1',
-                    f'tvg-name="{channel["name"]}"',
-                    f'category="贵州电信iptv"',
-                    f'group-title="{category}"'
-                ]
-
-                # 如果有rtsp链接，添加时移信息
-                if channel['rtsp_url']:
-                    # 移除URL末尾的斜杠（如果有）
-                    rtsp_url = channel['rtsp_url'].rstrip('/')
-                    catchup_source = f"{rtsp_url}/?playseek=${{(b)yyyyMMddHHmmss}}-${{(e)yyyyMMddHHmmss}}"
-                    extinf_parts.append(f'catchup="default"')
-                    extinf_parts.append(f'catchup-source="{catchup_source}"')
-
-                extinf_line = ' '.join(extinf_parts) + f',{channel["name"]}'
-
-                m3u_lines.append(extinf_line)
-                m3u_lines.append(play_url)
-
-        return '\n'.join(m3u_lines)
+        renderer = GZIPTVPlaylistRenderer(udpxy_url)
+        return renderer.render_text(self.channels.ordered(self.categories_order), M3USink())
 
     def save_m3u(self, m3u_content: str, filename: str = "iptv_channels.m3u") -> bool:
         """保存M3U文件"""
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
+            with atomic_open(filename) as f:
                 f.write(m3u_content)
 
             print(f"💾 M3U文件已保存: {filename}")
@@ -324,32 +280,8 @@ class GZIPTVM3UGenerator:
     def save_details(self, filename: str = "channels_detail.txt") -> bool:
         """保存频道详细信息"""
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write("贵州电信IPTV频道列表\n")
-                f.write("=" * 70 + "\n\n")
-
-                # 按分类和排序键排序
-                grouped_channels = self.sort_channels(self.channels)
-
-                # 分类顺序
-                categories_order = ['央视', '卫视', '贵州', '其他']
-
-                for category in categories_order:
-                    if category not in grouped_channels or not grouped_channels[category]:
-                        continue
-
-                    channels = grouped_channels[category]
-
-                    f.write(f"\n【{category}】({len(channels)}个)\n")
-                    f.write("-" * 70 + "\n")
-
-                    for i, channel in enumerate(channels):
-                        f.write(f"{i + 1:3d}. {channel['name']}\n")
-                        f.write(f"     原名称: {channel['original_name']}\n")
-                        f.write(f"     组播地址: {channel['igmp_url']}\n")
-                        if channel['rtsp_url']:
-                            f.write(f"     时移地址: {channel['rtsp_url']}\n")
-                        f.write("\n")
+            renderer = GZIPTVPlaylistRenderer()
+            renderer.render(self.channels.ordered(self.categories_order), [DetailsSink(filename)])
 
             print(f"📋 详细信息已保存: {filename}")
             return True
@@ -357,47 +289,194 @@ class GZIPTVM3UGenerator:
             print(f"❌ 保存详细信息失败: {e}")
             return False
 
-    def run(self, udpxy_url: str = "http://192.168.1.44:5140/rtp") -> bool:
-        """运行生成流程"""
-        print("\n" + "=" * 70)
-        print("开始生成M3U文件")
-        print("=" * 70)
+    def render_outputs(self, udpxy_url: str, sinks: List[PlaylistSink], fcc_selector=None,
+                       epg_url: Optional[str] = None, fcc: Optional[str] = DEFAULT_FCC,
+                       epg_ids: Optional[Dict[Tuple[str, Optional[str]], str]] = None) -> bool:
+        """遍历一次排好序的频道，同时写出所有输出格式
 
-        # 解析HTML
-        if not self.parse_html():
+        fcc_selector（fcc_selector.GZIPTVFCCSelector）为每个频道选择FCC服务器，否则都使用fcc；
+        epg_ids 为 (频道原名称, 组播地址) -> ChannelID，作为M3U的tvg-id
+        """
+        print(f"\n🎬 生成播放列表 (UDPXY: {udpxy_url}, 格式: {', '.join(sink.name for sink in sinks)})...")
+        try:
+            renderer = GZIPTVPlaylistRenderer(udpxy_url, fcc, fcc_selector=fcc_selector, epg_url=epg_url,
+                                              epg_ids=epg_ids)
+            renderer.render(self.channels.ordered(self.categories_order), sinks)
+        except Exception as e:
+            print(f"❌ 保存播放列表失败: {e}")
             return False
 
-        # 生成M3U
-        m3u_content = self.generate_m3u(udpxy_url)
+        for sink in sinks:
+            print(f"💾 {sink.description}已保存: {sink.filename}")
+        return True
+
+    def record_history(self):
+        """把本次提取到的频道写入历史库"""
+        if self.channel_store is None:
+            return
+        try:
+            run_id = self.channel_store.record_run(self.channels)
+            print(f"🗄️ 频道历史已记录: 第 {run_id} 次运行")
+        except Exception as e:
+            print(f"⚠️ 记录频道历史失败: {e}")
+
+    def probe_channels(self, prober: GZIPTVMulticastProber, mode: str = 'flag',
+                       results_file: str = "probe_results.json"):
+        """探测组播组是否有数据，失效频道按mode标记（移入"失效"分类）或删除"""
+        print(f"\n📡 探测组播组 (并发 {prober.max_concurrency}，超时 {prober.timeout}s)...")
+        results = prober.probe(self.channels)
+        save_results(results, results_file)
+
+        dead, unknown = apply_results(self.channels, results, mode, self.get_sort_key)
+        alive = sum(1 for result in results.values() if result.alive)
+        action = '删除' if mode == 'drop' else '标记'
+        print(f"  {len(results)} 个组播组，存活 {alive} 个；{action} {dead} 个失效频道")
+        if unknown:
+            # 探测出错（例如 --probe-interface 不是本机地址）的频道保持不变
+            print(f"  ⚠️ {unknown} 个频道探测出错，无法判断，保持不变")
+
+    def load_epg_ids(self) -> Dict[Tuple[str, Optional[str]], str]:
+        """读取频道的ChannelID，与 epg_fetcher.py 写入节目单的频道ID一致"""
+        from epg_fetcher import load_channel_ids
+
+        if not os.path.exists(self.html_file):
+            print(f"  ⚠️ 未找到 {self.html_file}，tvg-id 使用频道名称")
+            return {}
+        return load_channel_ids(self.html_file)
+
+    def select_fcc(self, fcc_selector):
+        """探测候选FCC服务器的延迟（TTL内使用缓存结果）"""
+        print(f"\n⚡ 探测 {len(fcc_selector.candidates)} 个FCC服务器 (选择方式: {fcc_selector.strategy})...")
+        results = fcc_selector.measure()
+        for result in sorted(results.values(), key=lambda r: (not r.alive, r.latency_ms or 0, r.endpoint)):
+            if result.alive:
+                print(f"  ✅ {result.endpoint}: {result.latency_ms:.1f}ms")
+            else:
+                print(f"  ❌ {result.endpoint}: {result.error or '不可用'}")
+        if not any(result.alive for result in results.values()):
+            print(f"  ⚠️ 没有可用的FCC服务器，使用 {fcc_selector.fallback}")
+
+    def check_changes(self, udpxy_url: str, snapshot: GZIPTVChannelSnapshot,
+                      outputs: Tuple[str, ...] = ("iptv_channels.m3u", "channels_detail.txt")) -> Dict:
+        """与上一次的频道快照比较，判断是否需要重写输出文件"""
+        report = snapshot.compare(self.channels, udpxy_url)
+        missing = [filename for filename in outputs if not os.path.exists(filename)]
+        report['rewrite'] = report['has_changes'] or report['render_changed'] or bool(missing)
+
+        counts = report['counts']
+        if report['first_run']:
+            print(f"\n🆕 没有频道快照，全部 {counts['total']} 个频道视为新增")
+        else:
+            print(f"\n🔄 频道变化: 新增 {counts['added']}，删除 {counts['removed']}，修改 {counts['changed']}")
+            for channel in report['added']:
+                print(f"  + {channel['name']} ({channel['igmp_url']})")
+            for channel in report['removed']:
+                print(f"  - {channel['name']} ({channel['igmp_url']})")
+            for change in report['changed']:
+                print(f"  * {change['after']['name']} ({change['after']['igmp_url']})")
+            if report['render_changed']:
+                print(f"  UDPXY地址或FCC服务器已变化")
+        if missing:
+            print(f"  输出文件不存在: {', '.join(missing)}")
+        return report
+
+    def run(self, udpxy_url: str = "http://192.168.1.44:5140/rtp", incremental: bool = False,
+            snapshot_file: str = "channels_snapshot.json",
+            report_file: str = "channels_changes.json",
+            formats: Tuple[str, ...] = DEFAULT_FORMATS, compress: bool = False,
+            prober: Optional[GZIPTVMulticastProber] = None, probe_mode: str = 'flag',
+            fcc_selector=None, epg_url: Optional[str] = None, fcc: Optional[str] = DEFAULT_FCC,
+            output_dir: str = '', records: Optional[List[Tuple[str, str]]] = None) -> bool:
+        """运行生成流程
+
+        incremental=True 时与上一次的频道快照比较，频道和UDPXY地址都没有变化时不重写输出文件，
+        并写出变化报告 channels_changes.json；
+        formats 为输出格式（m3u/details/json/txt/xspf），compress=True 时输出gzip压缩文件；
+        指定 prober 时先探测组播组，失效频道按 probe_mode 标记或删除；
+        指定 fcc_selector 时按延迟选择FCC服务器，否则使用fcc（None表示不加FCC参数）；
+        指定 epg_url 时在M3U文件头引用该地址的节目单（epg_fetcher.py 生成的 xmltv.xml）；
+        输出文件、快照和报告写入 output_dir（默认当前目录）；
+        records 为获取脚本边下载边解析出的 (ChannelName, ChannelSDP)，指定时不再读取HTML文件
+        """
+        sinks = create_sinks(formats, compress, output_dir)
+        snapshot_file = os.path.join(output_dir, snapshot_file)
+        report_file = os.path.join(output_dir, report_file)
 
-        # 保存文件
-        if not self.save_m3u(m3u_content):
+        print("\n" + "=" * 70)
+        print("开始生成M3U文件")
+        print("=" * 70)
+
+        # 解析HTML（获取时已经解析出频道的，直接使用）
+        if not (self.parse_records(records) if records else self.parse_html()):
             return False
 
-        # 保存详细信息
-        self.save_details()
+        with self.profiler.stage('save'):
+            self.record_history()
+
+        if prober is not None:
+            with self.profiler.stage('probe'):
+                self.probe_channels(prober, probe_mode, os.path.join(output_dir, "probe_results.json"))
+
+        # 快照中记录的渲染参数：选择的FCC服务器变化时也需要重写
+        render_key = udpxy_url
+        if fcc != DEFAULT_FCC:
+            render_key += f" fcc={fcc}"
+        if fcc_selector is not None:
+            with self.profiler.stage('fcc'):
+                self.select_fcc(fcc_selector)
+            render_key = f"{udpxy_url} fcc={fcc_selector.signature()}"
+        epg_ids = None
+        if epg_url:
+            render_key += f" epg={epg_url}"
+            epg_ids = self.load_epg_ids()
+
+        # 分组排序，结果由频道表缓存，渲染和统计直接使用
+        with self.profiler.stage('sort'):
+            self.channels.ordered(self.categories_order)
+
+        report = None
+        if incremental:
+            snapshot = GZIPTVChannelSnapshot(snapshot_file)
+            report = self.check_changes(render_key, snapshot, tuple(sink.filename for sink in sinks))
+
+        if report is None or report['rewrite']:
+            # 一次遍历写出全部格式（边渲染边写文件）
+            with self.profiler.stage('render'):
+                rendered = self.render_outputs(udpxy_url, sinks, fcc_selector, epg_url, fcc, epg_ids)
+            if not rendered:
+                return False
+
+            # 输出写完后再更新快照，写入失败时下次仍会重写
+            if report is not None:
+                with self.profiler.stage('save'):
+                    snapshot.save(report['keyed_channels'], render_key)
+
+        if report is not None:
+            with self.profiler.stage('save'):
+                save_change_report(report, report_file)
+            print(f"📝 变化报告已保存: {report_file}")
 
         print("\n" + "=" * 70)
-        print("🎉 M3U文件生成完成！")
+        if report is None or report['rewrite']:
+            print("🎉 M3U文件生成完成！")
+        else:
+            print("✅ 频道没有变化，保留现有M3U文件")
         print("=" * 70)
         print("\n📁 生成的文件:")
-        print("  1. iptv_channels.m3u - M3U播放列表")
-        print("  2. channels_detail.txt - 频道详细信息")
+        for i, sink in enumerate(sinks):
+            print(f"  {i + 1}. {sink.filename} - {sink.description}")
         print("\n📊 频道统计:")
 
         # 显示分类统计
-        grouped_channels = self.sort_channels(self.channels)
-        categories_order = ['央视', '卫视', '贵州', '其他']
-
-        for category in categories_order:
-            if category in grouped_channels:
-                count = len(grouped_channels[category])
-                print(f"  {category}: {count}个")
+        for category, channels in self.channels.ordered(self.categories_order):
+            print(f"  {category}: {len(channels)}个")
 
         print(f"\n📱 使用方法:")
         print("  1. 确保UDPXY服务器运行在: 192.168.1.44:5140")
         print("  2. 用VLC/PotPlayer打开 iptv_channels.m3u")
         print("  3. 如需修改UDPXY地址，运行: python script.py [udpxy_url]")
+        print("  4. 只在频道变化时更新文件，运行: python script.py [udpxy_url] --incremental")
+        print("  5. 按延迟选择FCC服务器，运行: python script.py [udpxy_url] --fcc=地址1,地址2")
 
         return True
 
@@ -417,17 +496,66 @@ def main():
         sys.exit(1)
 
     # 获取UDPXY地址（可选参数）
+    # --incremental: 频道没有变化时不重写输出文件
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    incremental = '--incremental' in sys.argv[1:]
+    # --formats=m3u,details,json,txt,xspf: 输出格式；--gzip: 输出gzip压缩文件
+    formats = DEFAULT_FORMATS
+    for arg in sys.argv[1:]:
+        if arg.startswith('--formats='):
+            formats = tuple(name for name in arg.split('=', 1)[1].split(',') if name)
+    compress = '--gzip' in sys.argv[1:]
+    # --probe=flag|drop: 探测组播组，失效频道标记或删除；--probe-interface=IP: IPTV专网网卡地址
+    prober = None
+    probe_mode = 'flag'
+    for arg in sys.argv[1:]:
+        if arg.startswith('--probe='):
+            probe_mode = arg.split('=', 1)[1]
+            prober = prober or GZIPTVMulticastProber()
+        elif arg.startswith('--probe-interface='):
+            prober = GZIPTVMulticastProber(interface=arg.split('=', 1)[1])
+    # --fcc=候选1,候选2,...: 按延迟选择FCC服务器（[udp://|tcp://]主机:端口）；--fcc-mode=best|weighted|group
+    fcc_candidates = []
+    fcc_mode = 'best'
+    for arg in sys.argv[1:]:
+        if arg.startswith('--fcc='):
+            fcc_candidates = [endpoint for endpoint in arg.split('=', 1)[1].split(',') if endpoint]
+        elif arg.startswith('--fcc-mode='):
+            fcc_mode = arg.split('=', 1)[1]
+    fcc_selector = None
+    if fcc_candidates:
+        from fcc_selector import STRATEGIES as FCC_STRATEGIES, GZIPTVFCCSelector
+        if fcc_mode not in FCC_STRATEGIES:
+            print(f"\n❌ 未知的FCC选择方式: {fcc_mode}（可用: {', '.join(FCC_STRATEGIES)}）")
+            sys.exit(1)
+        fcc_selector = GZIPTVFCCSelector(fcc_candidates, strategy=fcc_mode)
+    # --epg-url=URL: 在M3U文件头引用节目单（epg_fetcher.py 生成的 xmltv.xml 的访问地址）
+    epg_url = None
+    for arg in sys.argv[1:]:
+        if arg.startswith('--epg-url='):
+            epg_url = arg.split('=', 1)[1] or None
+    # --profile[=目录]: 分阶段性能分析，结果默认保存到 profile/
+    profiler = create_profiler(profile_dir_from_argv(sys.argv[1:]))
+    # --history: 把频道写入历史库 channel_history.db
+    channel_store = None
+    if '--history' in sys.argv[1:]:
+        from channel_store import GZIPTVChannelStore
+        channel_store = GZIPTVChannelStore()
+
     udpxy_url = "http://192.168.1.44:5140/rtp"
-    if len(sys.argv) > 1:
-        udpxy_url = sys.argv[1]
+    if args:
+        udpxy_url = args[0]
         print(f"使用指定的UDPXY地址: {udpxy_url}")
     else:
         print(f"使用默认UDPXY地址: {udpxy_url}")
 
     input("\n按Enter键开始生成M3U...")
 
-    generator = GZIPTVM3UGenerator()
-    success = generator.run(udpxy_url)
+    generator = GZIPTVM3UGenerator(channel_store=channel_store, profiler=profiler)
+    success = generator.run(udpxy_url, incremental=incremental, formats=formats, compress=compress,
+                            prober=prober, probe_mode=probe_mode, fcc_selector=fcc_selector,
+                            epg_url=epg_url)
+    profiler.save()
 
     if success:
         print(f"\n✨ M3U生成完成！")
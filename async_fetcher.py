@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - 多账号并发获取
+使用asyncio同时为多个账号/机顶盒执行四步认证流程，总耗时接近最慢的单个账号
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from iptv import GZITVHTMLFetcher
+from redirect_chain import GZITVRedirectChain
+from session_cache import GZITVSessionCache
+
+
+@dataclass
+class FetchProfile:
+    """单个账号/机顶盒的配置"""
+    name: str
+    config: Dict = field(default_factory=dict)
+    hardware_params: Dict = field(default_factory=dict)
+    output_dir: Optional[str] = None
+
+
+@dataclass
+class ProfileResult:
+    """单个账号的获取结果"""
+    name: str
+    success: bool
+    elapsed: float
+    output_dir: str
+    error: Optional[str] = None
+
+
+class HostRateLimiter:
+    """按服务器限速：同一host的两次请求至少间隔interval秒
+
+    请求在线程池中执行，因此使用线程锁；每次调用预约下一个可用时间片，
+    锁内不睡眠，不会阻塞其他host的请求
+    """
+
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.next_slot: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def wait(self, method: str, url: str):
+        if self.interval <= 0:
+            return
+
+        host = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, 0.0))
+            self.next_slot[host] = slot + self.interval
+
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class GZITVAsyncFetcher:
+    def __init__(self, profiles: List[FetchProfile], max_concurrency: int = 4,
+                 host_interval: float = 0.2, use_session_cache: bool = True):
+        self.profiles = profiles
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limiter = HostRateLimiter(host_interval)
+        self.use_session_cache = use_session_cache
+
+    def output_dir_for(self, profile: FetchProfile) -> str:
+        """账号的输出目录，默认 profiles/<name>"""
+        return profile.output_dir or os.path.join('profiles', profile.name)
+
+    def build_fetcher(self, profile: FetchProfile) -> GZITVHTMLFetcher:
+        """为账号创建独立的获取器（独立的Session和Cookie）"""
+        output_dir = self.output_dir_for(profile)
+        session_cache = None
+        redirect_chain = None
+        if self.use_session_cache:
+            session_cache = GZITVSessionCache(os.path.join(output_dir, 'iptv_session.json'))
+            redirect_chain = GZITVRedirectChain(os.path.join(output_dir, 'iptv_redirect_chain.json'))
+
+        fetcher = GZITVHTMLFetcher(config=profile.config,
+                                   hardware_params=profile.hardware_params,
+                                   output_dir=output_dir,
+                                   session_cache=session_cache,
+                                   redirect_chain=redirect_chain)
+        fetcher.request_hooks.append(self.rate_limiter.wait)
+        return fetcher
+
+    async def fetch_profile(self, profile: FetchProfile, semaphore: asyncio.Semaphore,
+                            executor: ThreadPoolExecutor) -> ProfileResult:
+        """在线程池中执行单个账号的完整流程"""
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            output_dir = self.output_dir_for(profile)
+            try:
+                fetcher = self.build_fetcher(profile)
+                success = await loop.run_in_executor(executor, fetcher.run)
+                error = None if success else '获取流程失败'
+            except Exception as e:
+                success, error = False, str(e)
+
+            return ProfileResult(name=profile.name, success=bool(success),
+                                 elapsed=time.perf_counter() - start,
+                                 output_dir=output_dir, error=error)
+
+    async def run_all(self) -> List[ProfileResult]:
+        """并发执行所有账号，结果顺序与profiles一致"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                thread_name_prefix='gzitv-fetch') as executor:
+            return await asyncio.gather(*(self.fetch_profile(profile, semaphore, executor)
+                                          for profile in self.profiles))
+
+    def run(self) -> List[ProfileResult]:
+        """运行并打印汇总"""
+        print("=" * 70)
+        print(f"并发获取 {len(self.profiles)} 个账号 (并发数: {self.max_concurrency})")
+        print("=" * 70)
+
+        start = time.perf_counter()
+        results = asyncio.run(self.run_all())
+        total = time.perf_counter() - start
+
+        print("\n📊 获取结果:")
+        for result in results:
+            status = "✅" if result.success else "❌"
+            line = f"  {status} {result.name}: {result.elapsed:.2f}s -> {result.output_dir}"
+            if result.error:
+                line += f" ({result.error})"
+            print(line)
+        print(f"\n⏱️ 总耗时: {total:.2f}s")
+
+        return results
+
+
+def load_profiles(path: str) -> List[FetchProfile]:
+    """从JSON文件加载账号列表
+
+    格式: [{"name": "...", "config": {...}, "hardware_params": {...}, "output_dir": "..."}]
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    return [FetchProfile(name=item['name'],
+                         config=item.get('config', {}),
+                         hardware_params=item.get('hardware_params', {}),
+                         output_dir=item.get('output_dir'))
+            for item in data]
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("用法: python async_fetcher.py profiles.json [并发数]")
+        sys.exit(1)
+
+    profiles = load_profiles(sys.argv[1])
+    max_concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    results = GZITVAsyncFetcher(profiles, max_concurrency=max_concurrency).run()
+    sys.exit(0 if all(result.success for result in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
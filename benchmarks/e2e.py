@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+端到端性能测试
+在本地回放替身服务器上运行 GZITVHTMLFetcher.run() 和 GZIPTVM3UGenerator.run()，
+统计每个步骤和总流程的耗时，无需连接IPTV专网
+
+用法: python -m benchmarks.e2e iptv_cassette.json --runs 10 --latency 0.03 --jitter 0.01
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from iptv import GZITVHTMLFetcher
+from replay_server import GZITVReplayServer
+from session_cache import GZITVSessionCache
+from To_M3U import GZIPTVM3UGenerator
+
+# (报告中的名称, 方法名)
+FETCH_STEPS = [
+    ('fetch.step1_auth', 'step1_complete_authentication'),
+    ('fetch.step2_navigate', 'step2_navigate_to_hardware_page'),
+    ('fetch.step3_hardware', 'step3_submit_hardware_with_mac'),
+    ('fetch.step4_redirect_chain', 'step4_handle_redirect_chain'),
+]
+
+CONVERT_STEPS = [
+    ('convert.parse', 'parse_html'),
+    ('convert.render', 'render_outputs'),
+]
+
+
+def instrument(obj, steps, timings: Dict[str, float]):
+    """用计时包装替换实例上的步骤方法"""
+    for label, method_name in steps:
+        method = getattr(obj, method_name)
+
+        def timed(*args, _method=method, _label=label, **kwargs):
+            start = time.perf_counter()
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                timings[_label] = timings.get(_label, 0.0) + time.perf_counter() - start
+
+        setattr(obj, method_name, timed)
+
+
+def run_once(server: GZITVReplayServer, workdir: str, warm: bool) -> Dict[str, float]:
+    """在替身服务器上执行一次完整的获取+转换，返回各步骤耗时（秒）"""
+    cassette = server.cassette
+    timings: Dict[str, float] = {}
+    server.reset()
+
+    session_cache = GZITVSessionCache(os.path.join(workdir, 'iptv_session.json')) if warm else None
+    fetcher = GZITVHTMLFetcher(config={'base_url': server.rewrite_url(cassette['auth_base_url']),
+                                       'user_id': cassette['user_id']},
+                               output_dir=workdir,
+                               session_cache=session_cache)
+    instrument(fetcher, FETCH_STEPS, timings)
+
+    start = time.perf_counter()
+    if not fetcher.run():
+        raise RuntimeError('获取流程失败')
+    timings['fetch.total'] = time.perf_counter() - start
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        generator = GZIPTVM3UGenerator()
+        instrument(generator, CONVERT_STEPS, timings)
+        start = time.perf_counter()
+        if not generator.run():
+            raise RuntimeError('转换流程失败')
+        timings['convert.total'] = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+
+    timings['total'] = timings['fetch.total'] + timings['convert.total']
+    return timings
+
+
+def summarize(samples: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    """计算每个步骤的统计值（毫秒）"""
+    summary = {}
+    for label, values in samples.items():
+        ordered = sorted(values)
+        summary[label] = {
+            'runs': len(values),
+            'mean_ms': statistics.fmean(values) * 1000,
+            'p50_ms': ordered[len(ordered) // 2] * 1000,
+            'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+            'max_ms': ordered[-1] * 1000,
+        }
+    return summary
+
+
+def print_report(summary: Dict[str, Dict[str, float]]):
+    print(f"\n{'步骤':<28}{'次数':>6}{'平均(ms)':>12}{'P50(ms)':>12}{'P95(ms)':>12}{'最大(ms)':>12}")
+    print("-" * 82)
+    for label, stats in summary.items():
+        print(f"{label:<30}{stats['runs']:>6}{stats['mean_ms']:>12.1f}{stats['p50_ms']:>12.1f}"
+              f"{stats['p95_ms']:>12.1f}{stats['max_ms']:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='贵州电信IPTV 端到端性能测试')
+    parser.add_argument('cassette', help='replay_server.py record 生成的录制文件')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='延迟抖动范围（秒）')
+    parser.add_argument('--warm', action='store_true', help='启用会话缓存（第一次之后为热启动）')
+    parser.add_argument('--json', help='将统计结果写入JSON文件')
+    parser.add_argument('--verbose', action='store_true', help='显示获取/转换脚本的输出')
+    args = parser.parse_args()
+
+    server = GZITVReplayServer(args.cassette, latency=args.latency, jitter=args.jitter)
+    server.start()
+    print(f"🔁 回放服务器: {server.origin} (延迟 {args.latency}s ± {args.jitter}s)")
+
+    # 统计值按步骤顺序输出
+    labels = ([label for label, _ in FETCH_STEPS] + ['fetch.total'] +
+              [label for label, _ in CONVERT_STEPS] + ['convert.total', 'total'])
+    samples: Dict[str, List[float]] = defaultdict(list)
+
+    try:
+        with tempfile.TemporaryDirectory(prefix='gzitv-bench-') as workdir:
+            for run in range(args.runs):
+                output = io.StringIO()
+                redirect = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(output)
+                try:
+                    with redirect:
+                        timings = run_once(server, workdir, args.warm)
+                except RuntimeError as e:
+                    print(output.getvalue())
+                    print(f"❌ 第 {run + 1} 次运行失败: {e}")
+                    sys.exit(1)
+
+                for label, value in timings.items():
+                    samples[label].append(value)
+                print(f"  第 {run + 1} 次: {timings['total'] * 1000:.1f} ms")
+    finally:
+        server.stop()
+
+    summary = summarize({label: samples[label] for label in labels if label in samples})
+    print_report(summary)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 统计结果已保存: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
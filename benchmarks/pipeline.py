@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+转换流程规模测试
+用 benchmarks/synthetic.py 生成不同频道数和编码的页面，分别统计 GZIPTVM3UGenerator 各阶段的耗时
+和峰值内存（tracemalloc），并与保存的基准比较；超出容差的用例会重新测量一次，
+两次都超出容差的阶段视为性能回退，以退出码1结束
+
+每个用例前后各跑一次校准循环，耗时按校准结果换算后再比较，基准在不同机器之间
+（以及CPU频率变化时）也大致可用；内存直接比较
+
+用法:
+  python -m benchmarks.pipeline --save-baseline                  # 默认 100 到 10万 个频道，三种编码，约需几分钟
+  python -m benchmarks.pipeline --sizes 100,1000 --encodings gbk
+  python -m benchmarks.pipeline --tolerance 0.3
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks.synthetic import ENCODINGS, write_frameset
+from To_M3U import GZIPTVM3UGenerator
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pipeline_baseline.json')
+
+# 报告中的阶段顺序
+STAGES = [
+    'load_html',
+    'extract_channels',
+    'extract_channels_from_file',
+    'clean_channel_name',
+    'categorize_channel',
+    'get_sort_key',
+    'sort_channels',
+    'generate_m3u',
+]
+
+# 基准文件格式版本
+BASELINE_VERSION = 1
+
+# 差值低于这些下限时不算回退，避免小规模用例的计时噪声
+MIN_DELTA_MS = 5.0
+MIN_DELTA_KB = 64.0
+
+UDPXY_URL = "http://192.168.1.44:5140/rtp"
+
+
+def calibrate(rounds: int = 10) -> float:
+    """固定的纯Python计算量，取最短耗时（毫秒），用于换算不同机器上的耗时"""
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        total = 0
+        for i in range(300000):
+            total += i * i % 7
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def build_stages(generator: GZIPTVM3UGenerator) -> List[Tuple[str, Callable]]:
+    """准备各阶段的输入，返回 (阶段名, 无参函数)；每个阶段只测自己，不重复前面阶段的工作"""
+    content = generator.load_html()
+    table = generator.extract_channels(content)
+    generator.channels = table
+    raw_names = [channel.original_name for channel in table]
+    names = [channel.name for channel in table]
+    categories = [channel.category for channel in table]
+
+    def sort_channels():
+        # 清掉频道表的缓存，测的是一次完整的分组排序
+        table.invalidate()
+        return generator.sort_channels(table)
+
+    def generate_m3u():
+        # 与实际流程一致：渲染前已经排过序，分组结果来自缓存
+        generator.sort_channels(table)
+        return generator.generate_m3u(UDPXY_URL)
+
+    return [
+        ('load_html', generator.load_html),
+        ('extract_channels', lambda: generator.extract_channels(content)),
+        ('extract_channels_from_file', generator.extract_channels_from_file),
+        ('clean_channel_name', lambda: [generator.clean_channel_name(name) for name in raw_names]),
+        ('categorize_channel', lambda: [generator.categorize_channel(name) for name in names]),
+        ('get_sort_key', lambda: [generator.get_sort_key(name, category)
+                                  for name, category in zip(names, categories)]),
+        ('sort_channels', sort_channels),
+        ('generate_m3u', generate_m3u),
+    ]
+
+
+def time_stage(func: Callable, repeat: int) -> float:
+    """最短耗时（秒），计时期间关闭垃圾回收"""
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return best
+
+
+def peak_memory(func: Callable) -> int:
+    """阶段执行期间新分配内存的峰值（字节），包括返回值"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1] - before
+        del result
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_case(workdir: str, size: int, encoding: str, repeat: int) -> Dict:
+    """生成一个页面并测量所有阶段"""
+    html_file = os.path.join(workdir, f'frameset_{size}_{encoding}.html')
+    file_size = write_frameset(html_file, size, encoding, seed=size)
+    calibration_ms = calibrate()
+
+    # 生成器逐个频道打印进度，写到空设备：打印的开销算在阶段里，但不占内存也不刷屏
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        generator = GZIPTVM3UGenerator(html_file)
+        stages = build_stages(generator)
+        channels = len(generator.channels)
+        results = {}
+        for name, func in stages:
+            results[name] = {
+                'ms': time_stage(func, repeat) * 1000,
+                'peak_kb': peak_memory(func) / 1024,
+            }
+    os.remove(html_file)
+    calibration_ms = min(calibration_ms, calibrate())
+    return {'size': size, 'encoding': encoding, 'channels': channels, 'file_kb': file_size / 1024,
+            'calibration_ms': calibration_ms, 'stages': results}
+
+
+def print_case(key: str, case: Dict):
+    channels = max(case['channels'], 1)
+    print(f"\n📊 {key}: {case['channels']} 个有效频道，文件 {case['file_kb']:.0f} KB，"
+          f"校准 {case['calibration_ms']:.2f} ms")
+    print(f"{'阶段':<28}{'耗时(ms)':>12}{'每频道(µs)':>14}{'峰值内存(KB)':>16}")
+    print("-" * 72)
+    for stage in STAGES:
+        stats = case['stages'][stage]
+        print(f"{stage:<30}{stats['ms']:>12.2f}{stats['ms'] * 1000 / channels:>14.2f}{stats['peak_kb']:>16.1f}")
+
+
+def load_baseline(path: str) -> Optional[Dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    if data.get('version') != BASELINE_VERSION:
+        print(f"⚠️ 基准文件版本不符，忽略: {path}")
+        return None
+    return data
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float, memory_tolerance: float) -> List[Dict]:
+    """返回超出容差的阶段；耗时按两次运行各自用例的校准结果换算到本次"""
+    regressions = []
+    for key, case in current['cases'].items():
+        base_case = baseline['cases'].get(key)
+        if not base_case:
+            continue
+        scale = case['calibration_ms'] / base_case['calibration_ms']
+        for stage, stats in case['stages'].items():
+            base_stats = base_case['stages'].get(stage)
+            if not base_stats:
+                continue
+
+            expected_ms = base_stats['ms'] * scale
+            if (stats['ms'] > expected_ms * (1 + tolerance) and
+                    stats['ms'] - expected_ms > MIN_DELTA_MS):
+                regressions.append({'case': key, 'stage': stage, 'metric': '耗时(ms)',
+                                    'baseline': expected_ms, 'current': stats['ms']})
+
+            base_kb = base_stats['peak_kb']
+            if (stats['peak_kb'] > base_kb * (1 + memory_tolerance) and
+                    stats['peak_kb'] - base_kb > MIN_DELTA_KB):
+                regressions.append({'case': key, 'stage': stage, 'metric': '峰值内存(KB)',
+                                    'baseline': base_kb, 'current': stats['peak_kb']})
+    return regressions
+
+
+def confirm(baseline: Dict, regressions: List[Dict], repeat: int, tolerance: float,
+            memory_tolerance: float) -> List[Dict]:
+    """重新测量出现回退的用例，只保留重新测量后仍然超出容差的阶段（计时噪声一般不会连续出现）"""
+    keys = list(dict.fromkeys(item['case'] for item in regressions))
+    print(f"\n🔁 {len(regressions)} 项超出容差，重新测量: {', '.join(keys)}")
+    rerun = {'cases': {}}
+    with tempfile.TemporaryDirectory(prefix='gzitv-scale-') as workdir:
+        for key in keys:
+            size, encoding = key.split('/', 1)
+            rerun['cases'][key] = run_case(workdir, int(size), encoding, repeat)
+
+    flagged = {(item['case'], item['stage'], item['metric']) for item in regressions}
+    return [item for item in compare(baseline, rerun, tolerance, memory_tolerance)
+            if (item['case'], item['stage'], item['metric']) in flagged]
+
+
+def print_regressions(regressions: List[Dict], tolerance: float, memory_tolerance: float):
+    print(f"\n❌ {len(regressions)} 项性能回退（耗时容差 {tolerance:.0%}，内存容差 {memory_tolerance:.0%}）:")
+    print(f"{'用例':<18}{'阶段':<28}{'指标':<14}{'基准':>12}{'当前':>12}{'倍数':>8}")
+    print("-" * 92)
+    for item in regressions:
+        ratio = item['current'] / item['baseline'] if item['baseline'] else float('inf')
+        print(f"{item['case']:<20}{item['stage']:<30}{item['metric']:<12}"
+              f"{item['baseline']:>12.2f}{item['current']:>12.2f}{ratio:>8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='贵州电信IPTV 转换流程规模测试')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='频道数，逗号分隔')
+    parser.add_argument('--encodings', default=','.join(ENCODINGS), help=f"页面编码，逗号分隔: {','.join(ENCODINGS)}")
+    parser.add_argument('--repeat', type=int, default=5, help='每个阶段的计时次数（取最短）')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='基准文件')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基准')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='耗时容差（比例）')
+    parser.add_argument('--memory-tolerance', type=float, default=0.2, help='峰值内存容差（比例）')
+    parser.add_argument('--confirm', type=int, default=1, help='发现回退后重新测量的次数')
+    parser.add_argument('--json', help='将本次结果写入JSON文件')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    encodings = [encoding for encoding in args.encodings.split(',') if encoding]
+    unknown = set(encodings) - set(ENCODINGS)
+    if unknown:
+        parser.error(f"不支持的编码: {','.join(sorted(unknown))}")
+
+    print(f"⏱️ Python {platform.python_version()}，每个阶段计时 {args.repeat} 次取最短")
+
+    results = {'version': BASELINE_VERSION, 'python': platform.python_version(), 'cases': {}}
+    with tempfile.TemporaryDirectory(prefix='gzitv-scale-') as workdir:
+        for size in sizes:
+            for encoding in encodings:
+                key = f"{size}/{encoding}"
+                case = run_case(workdir, size, encoding, args.repeat)
+                results['cases'][key] = case
+                print_case(key, case)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 本次结果已保存: {args.json}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 基准已保存: {args.baseline}")
+        return
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"\nℹ️ 没有基准文件 {args.baseline}，使用 --save-baseline 保存本次结果")
+        return
+
+    missing = [key for key in results['cases'] if key not in baseline['cases']]
+    if missing:
+        print(f"\nℹ️ 基准中没有这些用例，不比较: {', '.join(missing)}")
+
+    regressions = compare(baseline, results, args.tolerance, args.memory_tolerance)
+    for _ in range(args.confirm):
+        if not regressions:
+            break
+        regressions = confirm(baseline, regressions, args.repeat, args.tolerance, args.memory_tolerance)
+    if regressions:
+        print_regressions(regressions, args.tolerance, args.memory_tolerance)
+        sys.exit(1)
+    print(f"\n✅ 与基准相比没有性能回退（耗时容差 {args.tolerance:.0%}，内存容差 {args.memory_tolerance:.0%}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+合成频道页面生成器
+生成与 frameset_builder.jsp 返回格式一致的HTML：频道配置夹在其他 CTCSetConfig 和脚本之间，
+频道名称覆盖所有分类以及 new/括号/HTML实体 等需要清理的写法，SDP包括
+仅组播、组播|时移、带AuthInfo的时移、仅单播 几种形式；可选 UTF-8 / GBK / GB18030 编码
+
+用法: python -m benchmarks.synthetic 10000 --encoding gbk --output final_frameset_builder.html
+"""
+
+import argparse
+import random
+from typing import List
+
+ENCODINGS = ('utf-8', 'gbk', 'gb18030')
+
+# 各分类的频道名称
+CCTV_NAMES = ['CCTV-{n}综合', 'CCTV-{n}', 'CCTV{n}高清', 'CCTV-{n}体育new', 'CCTV-{n}(高清)', 'CCTV-{n}4K']
+SATELLITE_NAMES = ['湖南卫视', '浙江卫视', '东方卫视', '江苏卫视', '北京卫视', '重庆卫视', '四川卫视', '广东卫视',
+                   '深圳卫视', '湖北卫视', '黑龙江卫视', '云南卫视', '贵州卫视']
+LOCAL_NAMES = ['贵州{n}', '贵阳新闻', '贵阳经济生活', '遵义综合', '安顺综合', '六盘水新闻', '黔东南综合', '黔南综合',
+               '毕节综合', '铜仁新闻', '贵州公共', '贵州影视文艺']
+THEMED_NAMES = ['五星体育', '体育赛事{n}', '劲爆体育', '卡酷少儿', '金鹰卡通', '少儿动画{n}', '4K超高清{n}',
+                '纪实人文', '中国教育{n}', '央视台球', '重温经典', 'CGTN', 'CGTN Documentary', 'Travel Channel',
+                '快乐垂钓', '茶频道', '书画频道', '求索纪录']
+SUFFIXES = ['', '', '', '高清', 'HD', '(测试)', '（备用）', 'new', ' 标清', '&amp;超清']
+
+# 频道列表前后的其他配置和脚本
+PREAMBLE = [
+    "<html><head><meta http-equiv=\"Content-Type\" content=\"text/html; charset={charset}\">",
+    "<title>frameset_builder</title></head><body>",
+    "<script type=\"text/javascript\">",
+    "Authentication.CTCSetConfig('EPGDomain','http://10.255.9.60:8080/iptvepg/function/index.jsp');",
+    "Authentication.CTCSetConfig('UserGroupNMB','1091');",
+    "Authentication.CTCSetConfig('ManagementDomain','http://10.255.9.62:8082/');",
+]
+POSTAMBLE = [
+    "Authentication.CTCSetConfig('SupportHD','1');",
+    "function gotoPortal(){ document.location = '/iptvepg/frame1081/portal.jsp'; }",
+    "</script>",
+    "<frameset rows=\"*\"><frame src=\"/iptvepg/frame1081/portal.jsp\" name=\"main\"></frameset>",
+    "</body></html>",
+]
+
+
+def channel_name(rng: random.Random, index: int) -> str:
+    pool = rng.choices([CCTV_NAMES, SATELLITE_NAMES, LOCAL_NAMES, THEMED_NAMES], weights=[3, 3, 2, 4])[0]
+    name = rng.choice(pool).format(n=rng.randint(1, 17))
+    # 部分频道带编号，模拟同名频道的不同线路
+    if index % 5 == 0:
+        name += str(index % 97)
+    return name + rng.choice(SUFFIXES)
+
+
+def channel_sdp(rng: random.Random, index: int) -> str:
+    group = f"239.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}"
+    port = rng.choice((8000, 5140, 1234))
+    rtsp = f"rtsp://10.255.{index % 4}.{index % 200 + 1}:554/PLTV/88/224/3221{index:06d}/index.smil"
+    variant = rng.choices(('igmp', 'igmp|rtsp', 'igmp|rtsp_auth', 'rtsp_auth'), weights=[3, 4, 4, 1])[0]
+    if variant == 'igmp':
+        return f"igmp://{group}:{port}"
+    if variant == 'igmp|rtsp':
+        return f"igmp://{group}:{port}|{rtsp}"
+    if variant == 'igmp|rtsp_auth':
+        return f"igmp://{group}:{port}|{rtsp}?AuthInfo={rng.getrandbits(64):016x}&version=1"
+    return f"{rtsp}?AuthInfo={rng.getrandbits(64):016x}"
+
+
+def generate_lines(count: int, seed: int = 0, charset: str = 'UTF-8') -> List[str]:
+    rng = random.Random(seed)
+    lines = [line.format(charset=charset) for line in PREAMBLE]
+    for index in range(count):
+        sdp = channel_sdp(rng, index)
+        lines.append(
+            f"Authentication.CTCSetConfig('Channel','ChannelID=\"{index}\",ChannelName=\"{channel_name(rng, index)}\","
+            f"UserChannelID=\"{index + 1}\",ChannelURL=\"{sdp}\",TimeShift=\"1\",ChannelSDP=\"{sdp}\","
+            f"TimeShiftURL=\"\",ChannelType=\"1\",IsHDChannel=\"1\",ChannelLogoURL=\"\"');")
+    lines.extend(POSTAMBLE)
+    return lines
+
+
+def generate_frameset(count: int, encoding: str = 'utf-8', seed: int = 0) -> bytes:
+    """生成包含count个频道的页面（按encoding编码，CRLF换行）"""
+    lines = generate_lines(count, seed, charset=encoding.upper())
+    return '\r\n'.join(lines).encode(encoding)
+
+
+def write_frameset(path: str, count: int, encoding: str = 'utf-8', seed: int = 0) -> int:
+    data = generate_frameset(count, encoding, seed)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成合成频道页面')
+    parser.add_argument('count', type=int, help='频道数')
+    parser.add_argument('--encoding', default='utf-8', choices=ENCODINGS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='final_frameset_builder.html')
+    args = parser.parse_args()
+
+    size = write_frameset(args.output, args.count, args.encoding, args.seed)
+    print(f"💾 {args.output}: {args.count} 个频道，{args.encoding}，{size / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - 频道分类器
+从规则文件读取各分类的关键词，编译为一个Aho-Corasick多模式自动机，
+每个频道名只扫描一遍即可找出优先级最高的分类，耗时与关键词数量无关
+"""
+
+import json
+import os
+import sys
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# 默认规则文件与本模块放在一起
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'channel_rules.json')
+
+# 规则文件不存在时使用的内置规则
+BUILTIN_RULES = {
+    'categories': [
+        {'name': '央视', 'keywords': ['CCTV', '中央', '央视', 'CGTN']},
+        {'name': '卫视', 'keywords': ['卫视']},
+        {'name': '贵州', 'keywords': ['贵州', '贵阳', '黔', '毕节', '安顺', '铜仁', '遵义', '雷山', '仁怀', '六盘水',
+                                      '凯里', '六枝', '观山湖', '瓮安', '思南', '桐梓', '云岩']},
+    ],
+    'default': '其他',
+}
+
+
+class AhoCorasick:
+    """多模式匹配自动机，每个模式带一个优先级（数值越小越优先）"""
+
+    def __init__(self, patterns: List[Tuple[str, int]]):
+        # 状态转移、失败指针、到达该状态时已匹配模式的最高优先级
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.best: List[Optional[int]] = [None]
+
+        for pattern, priority in patterns:
+            self.add(pattern, priority)
+        self.build()
+
+    def add(self, pattern: str, priority: int):
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.best.append(None)
+            state = next_state
+        if self.best[state] is None or priority < self.best[state]:
+            self.best[state] = priority
+
+    def build(self):
+        """按广度优先计算失败指针，并把失败链上的匹配结果合并到每个状态"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+
+                inherited = self.best[self.fail[next_state]]
+                if inherited is not None and (self.best[next_state] is None or inherited < self.best[next_state]):
+                    self.best[next_state] = inherited
+
+    def search(self, text: str, stop_at: int = 0) -> Optional[int]:
+        """扫描文本，返回命中模式的最高优先级；命中 stop_at 时提前结束"""
+        goto, fail, best = self.goto, self.fail, self.best
+        found = None
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            priority = best[state]
+            if priority is not None and (found is None or priority < found):
+                found = priority
+                if found <= stop_at:
+                    break
+        return found
+
+
+class GZIPTVChannelClassifier:
+    def __init__(self, rules_file: Optional[str] = None):
+        self.rules_file = rules_file or DEFAULT_RULES_FILE
+        rules = self.load_rules(self.rules_file)
+
+        # 分类在规则文件中的顺序即匹配优先级，也是播放列表中的分组顺序
+        self.categories: List[str] = [category['name'] for category in rules['categories']]
+        self.default: str = rules.get('default', '其他')
+
+        patterns = [(keyword, priority)
+                    for priority, category in enumerate(rules['categories'])
+                    for keyword in category['keywords']]
+        self.automaton = AhoCorasick(patterns)
+        self.keyword_count = len(patterns)
+
+    @staticmethod
+    def load_rules(rules_file: str) -> Dict:
+        try:
+            with open(rules_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return BUILTIN_RULES
+
+    @property
+    def order(self) -> List[str]:
+        """分组顺序，默认分类排在最后"""
+        return [name for name in self.categories if name != self.default] + [self.default]
+
+    def classify(self, name: str) -> str:
+        priority = self.automaton.search(name)
+        if priority is None:
+            return self.default
+        return self.categories[priority]
+
+
+def main():
+    """用法: python channel_classifier.py [--rules 规则文件] 频道名称..."""
+    args = sys.argv[1:]
+    rules_file = None
+    if '--rules' in args:
+        position = args.index('--rules')
+        rules_file = args[position + 1]
+        del args[position:position + 2]
+
+    classifier = GZIPTVChannelClassifier(rules_file)
+    print(f"📚 {len(classifier.categories)} 个分类，{classifier.keyword_count} 个关键词: {classifier.rules_file}")
+    for name in args:
+        print(f"  {name} -> {classifier.classify(name)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - 频道历史库
+把每次提取到的频道写入SQLite，按 规范化名称 + 线路序号 识别频道（同名频道的多条线路各占一行，
+线路序号为该名称在页面中第几次出现），组播地址/时移地址/分类的每一种取值记录为一段"状态"，
+保存首次和最后出现时间。
+频道不变时只更新已有状态的最后出现时间，库的大小随变化次数增长，而不是随运行次数增长
+"""
+
+import argparse
+import re
+import sqlite3
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+
+from channel_table import Channel
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    channel_count INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS channels (
+    id INTEGER PRIMARY KEY,
+    norm_name TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    igmp_url TEXT NOT NULL,
+    category TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    last_run INTEGER NOT NULL,
+    UNIQUE (norm_name, line)
+);
+CREATE INDEX IF NOT EXISTS idx_channels_igmp ON channels (igmp_url);
+CREATE INDEX IF NOT EXISTS idx_channels_category ON channels (category);
+
+CREATE TABLE IF NOT EXISTS episodes (
+    id INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL REFERENCES channels (id),
+    name TEXT NOT NULL,
+    original_name TEXT NOT NULL,
+    igmp_url TEXT NOT NULL,
+    rtsp_url TEXT NOT NULL,
+    category TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    first_run INTEGER NOT NULL,
+    last_run INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_episodes_state ON episodes (channel_id, igmp_url, rtsp_url, category, last_run);
+CREATE INDEX IF NOT EXISTS idx_episodes_last_run ON episodes (last_run);
+CREATE INDEX IF NOT EXISTS idx_episodes_igmp ON episodes (igmp_url);
+CREATE INDEX IF NOT EXISTS idx_episodes_first_seen ON episodes (first_seen);
+'''
+
+# 一次运行的频道先批量写入临时表，再用集合操作合并
+INCOMING_SCHEMA = '''
+CREATE TEMP TABLE IF NOT EXISTS incoming (
+    norm_name TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    original_name TEXT NOT NULL,
+    igmp_url TEXT NOT NULL,
+    rtsp_url TEXT NOT NULL,
+    category TEXT NOT NULL
+)
+'''
+
+# 每条线路的状态按开始时间排列后与上一段比较；只比较前后相接的状态（上一段在本段开始前已结束），
+# 时间上重叠的状态不算变化
+EPISODE_CHANGES = '''
+SELECT * FROM (
+    SELECT e.*, c.norm_name, c.line,
+           LAG(e.igmp_url) OVER w AS previous_igmp_url,
+           LAG(e.rtsp_url) OVER w AS previous_rtsp_url,
+           LAG(e.last_seen) OVER w AS previous_last_seen,
+           LAG(e.last_run) OVER w AS previous_last_run
+    FROM episodes e JOIN channels c ON c.id = e.channel_id
+    WINDOW w AS (PARTITION BY e.channel_id ORDER BY e.first_run, e.first_seen, e.id)
+)
+WHERE previous_last_run < first_run
+'''
+
+# 旧版本的 channels 表按名称唯一，同名线路被合并为一行；迁移时原有记录作为第1条线路
+MIGRATE_CHANNELS_V1 = '''
+CREATE TABLE channels_v2 (
+    id INTEGER PRIMARY KEY,
+    norm_name TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    igmp_url TEXT NOT NULL,
+    category TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    last_run INTEGER NOT NULL,
+    UNIQUE (norm_name, line)
+);
+INSERT INTO channels_v2 (id, norm_name, line, name, igmp_url, category, first_seen, last_seen, last_run)
+SELECT id, norm_name, 1, name, igmp_url, category, first_seen, last_seen, last_run FROM channels;
+DROP TABLE channels;
+ALTER TABLE channels_v2 RENAME TO channels;
+'''
+
+SEPARATOR_PATTERN = re.compile(r'[\s\-_·]+')
+
+
+def normalize_name(name: str) -> str:
+    """规范化频道名称：全角转半角、忽略大小写、去掉空格和连接符（CCTV-1 与 cctv1 视为同一频道）"""
+    return SEPARATOR_PATTERN.sub('', unicodedata.normalize('NFKC', name)).casefold()
+
+
+class GZIPTVChannelStore:
+    def __init__(self, path: str = 'channel_history.db'):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.migrate()
+        self.conn.executescript(SCHEMA)
+
+    def migrate(self):
+        columns = {row['name'] for row in self.conn.execute('PRAGMA table_info(channels)')}
+        if columns and 'line' not in columns:
+            with self.conn:
+                for statement in MIGRATE_CHANNELS_V1.split(';'):
+                    if statement.strip():
+                        self.conn.execute(statement)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record_run(self, channels: Iterable[Channel], seen_at: Optional[float] = None) -> int:
+        """在一个事务中写入一次运行提取到的全部频道，返回运行编号"""
+        seen_at = seen_at or time.time()
+        rows = []
+        lines: Dict[str, int] = {}
+        for channel in channels:
+            # 同名频道按出现顺序编号，每条线路分别记录
+            norm_name = normalize_name(channel.name)
+            lines[norm_name] = lines.get(norm_name, 0) + 1
+            rows.append((norm_name, lines[norm_name], channel.name, channel.original_name,
+                         channel.igmp_url, channel.rtsp_url, channel.category))
+
+        with self.conn:
+            previous_run = self.conn.execute('SELECT MAX(id) FROM runs').fetchone()[0] or 0
+            run_id = self.conn.execute('INSERT INTO runs (started_at, channel_count) VALUES (?, ?)',
+                                       (seen_at, len(rows))).lastrowid
+
+            self.conn.execute(INCOMING_SCHEMA)
+            self.conn.execute('DELETE FROM incoming')
+            self.conn.executemany('INSERT INTO incoming VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+            # 频道：按 规范化名称 + 线路序号 合并，记录当前名称、地址和分类
+            self.conn.execute('''
+                INSERT INTO channels (norm_name, line, name, igmp_url, category, first_seen, last_seen, last_run)
+                SELECT norm_name, line, name, igmp_url, category, :seen, :seen, :run FROM incoming WHERE true
+                ON CONFLICT (norm_name, line) DO UPDATE SET
+                    name = excluded.name, igmp_url = excluded.igmp_url, category = excluded.category,
+                    last_seen = excluded.last_seen, last_run = excluded.last_run
+            ''', {'seen': seen_at, 'run': run_id})
+
+            # 上一次运行中仍然有效且状态未变的，延续到本次运行
+            self.conn.execute('''
+                UPDATE episodes SET last_seen = :seen, last_run = :run
+                WHERE last_run = :previous
+                  AND (channel_id, igmp_url, rtsp_url, category) IN (
+                      SELECT c.id, i.igmp_url, i.rtsp_url, i.category
+                      FROM incoming i JOIN channels c ON c.norm_name = i.norm_name AND c.line = i.line)
+            ''', {'seen': seen_at, 'run': run_id, 'previous': previous_run})
+
+            # 其余为新出现的状态
+            self.conn.execute('''
+                INSERT INTO episodes (channel_id, name, original_name, igmp_url, rtsp_url, category,
+                                      first_seen, last_seen, first_run, last_run)
+                SELECT c.id, i.name, i.original_name, i.igmp_url, i.rtsp_url, i.category, :seen, :seen, :run, :run
+                FROM incoming i JOIN channels c ON c.norm_name = i.norm_name AND c.line = i.line
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM episodes e
+                    WHERE e.channel_id = c.id AND e.igmp_url = i.igmp_url AND e.rtsp_url = i.rtsp_url
+                      AND e.category = i.category AND e.last_run = :run)
+                GROUP BY c.id, i.igmp_url, i.rtsp_url, i.category
+            ''', {'seen': seen_at, 'run': run_id})
+
+            self.conn.execute('DELETE FROM incoming')
+
+        return run_id
+
+    def query(self, sql: str, params=()) -> List[Dict]:
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def runs(self, limit: int = 20) -> List[Dict]:
+        """最近的运行"""
+        return self.query('SELECT * FROM runs ORDER BY id DESC LIMIT ?', (limit,))
+
+    def current_channels(self, category: Optional[str] = None) -> List[Dict]:
+        """最近一次运行中出现的频道"""
+        sql = 'SELECT * FROM channels WHERE last_run = (SELECT MAX(id) FROM runs)'
+        if category:
+            return self.query(sql + ' AND category = ? ORDER BY name', (category,))
+        return self.query(sql + ' ORDER BY category, name')
+
+    def channel_history(self, name: str) -> List[Dict]:
+        """频道各条线路的全部状态，按线路和出现时间排列"""
+        return self.query('''
+            SELECT e.*, c.line FROM episodes e JOIN channels c ON c.id = e.channel_id
+            WHERE c.norm_name = ? ORDER BY c.line, e.first_run, e.id
+        ''', (normalize_name(name),))
+
+    def channels_at(self, igmp_url: str) -> List[Dict]:
+        """使用过某个组播地址的全部频道状态"""
+        return self.query('SELECT * FROM episodes WHERE igmp_url = ? ORDER BY first_run', (igmp_url,))
+
+    def multicast_moves(self, since: float = 0) -> List[Dict]:
+        """组播地址发生变化的频道，since 为起始时间戳"""
+        return self.query(EPISODE_CHANGES + '''
+              AND igmp_url != previous_igmp_url AND first_seen >= ?
+            ORDER BY first_seen
+        ''', (since,))
+
+    def lost_catchup(self, since: float = 0) -> List[Dict]:
+        """失去时移地址的频道"""
+        return self.query(EPISODE_CHANGES + '''
+              AND previous_rtsp_url != '' AND rtsp_url = '' AND first_seen >= ?
+            ORDER BY first_seen
+        ''', (since,))
+
+    def disappeared(self, since: float = 0) -> List[Dict]:
+        """不再出现在最近一次运行中的频道"""
+        return self.query('''
+            SELECT * FROM channels
+            WHERE last_run < (SELECT MAX(id) FROM runs) AND last_seen >= ?
+            ORDER BY last_seen DESC
+        ''', (since,))
+
+
+def format_time(timestamp: Optional[float]) -> str:
+    if timestamp is None:
+        return '-'
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='贵州电信IPTV 频道历史查询')
+    parser.add_argument('--db', default='channel_history.db', help='历史库文件')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    history_parser = subparsers.add_parser('history', help='频道的状态变化')
+    history_parser.add_argument('name')
+
+    address_parser = subparsers.add_parser('address', help='使用过某个组播地址的频道')
+    address_parser.add_argument('igmp_url')
+
+    for command, help_text in (('moves', '组播地址发生变化的频道'), ('lost-catchup', '失去时移的频道'),
+                               ('gone', '消失的频道')):
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument('--days', type=float, default=7, help='最近几天')
+
+    subparsers.add_parser('runs', help='最近的运行')
+
+    args = parser.parse_args()
+    store = GZIPTVChannelStore(args.db)
+    since = time.time() - getattr(args, 'days', 0) * 86400
+
+    if args.command == 'history':
+        for row in store.channel_history(args.name):
+            print(f"线路{row['line']}  {format_time(row['first_seen'])} ~ {format_time(row['last_seen'])}  "
+                  f"{row['igmp_url']}  [{row['category']}]  {row['rtsp_url'] or '无时移'}")
+    elif args.command == 'address':
+        for row in store.channels_at(args.igmp_url):
+            print(f"{format_time(row['first_seen'])} ~ {format_time(row['last_seen'])}  {row['name']}")
+    elif args.command == 'moves':
+        for row in store.multicast_moves(since):
+            print(f"{format_time(row['first_seen'])}  {row['name']}: {row['previous_igmp_url']} -> {row['igmp_url']}")
+    elif args.command == 'lost-catchup':
+        for row in store.lost_catchup(since):
+            print(f"{format_time(row['first_seen'])}  {row['name']}: {row['previous_rtsp_url']}")
+    elif args.command == 'gone':
+        for row in store.disappeared(since):
+            print(f"{format_time(row['last_seen'])}  {row['name']} ({row['igmp_url']})")
+    elif args.command == 'runs':
+        for row in store.runs():
+            print(f"#{row['id']}  {format_time(row['started_at'])}  {row['channel_count']} 个频道")
+
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
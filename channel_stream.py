@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - 频道配置提取
+在原始字节上匹配 ChannelName/ChannelSDP，判断编码后只解码命中的片段；
+获取脚本（边下载边解析）和M3U生成器共用，只依赖标准库，导入开销很小
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+
+# 频道配置格式: ChannelName="..."ChannelSDP="..."
+# 字节模式直接扫描原始文件；'"' 和 '>' 不会出现在GBK/GB18030多字节字符的尾字节中，
+# 因此与在解码后文本上匹配的结果一致
+CHANNEL_PATTERN = re.compile(r'ChannelName="([^"]+)"[^>]*?ChannelSDP="([^"]+)"')
+CHANNEL_PATTERN_BYTES = re.compile(rb'ChannelName="([^"]+)"[^>]*?ChannelSDP="([^"]+)"')
+
+# 候选编码，顺序与 To_M3U 的 load_html 保持一致
+CANDIDATE_ENCODINGS = ['utf-8', 'gbk', 'gb2312', 'gb18030']
+
+
+def sniff_span_encoding(spans: List[bytes]) -> Optional[str]:
+    """根据命中的字节片段判断编码，只需判断一次"""
+    sample = b'\n'.join(span for span in spans if not span.isascii())
+    if not sample:
+        return 'utf-8'
+    for encoding in CANDIDATE_ENCODINGS:
+        try:
+            sample.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return None
+
+
+def decode_span(span: bytes, encoding: str, errors: str = 'strict') -> str:
+    """解码单个片段，换行处理与文本模式读取文件一致"""
+    text = span.decode(encoding, errors)
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+
+class ChannelStreamParser:
+    """增量解析频道配置：按块输入原始字节，边下载边输出 (ChannelName, ChannelSDP) 字节片段
+
+    每次只保留从最后一个未完成的 ChannelName=" 开始的尾部，跨块的属性在下一块到达后再匹配；
+    尾部超过 max_pending 的异常记录会被丢弃，内存占用与块大小同级
+    """
+
+    MARKER = b'ChannelName="'
+
+    def __init__(self, max_pending: int = 64 * 1024):
+        self.max_pending = max_pending
+        self.pending = b''
+        self.count = 0
+
+    def feed(self, chunk: bytes) -> List[Tuple[bytes, bytes]]:
+        data = self.pending + chunk if self.pending else chunk
+
+        spans = []
+        end = 0
+        for match in CHANNEL_PATTERN_BYTES.finditer(data):
+            spans.append(match.group(1, 2))
+            end = match.end()
+
+        # 保留可能尚未完整的记录；没有时保留可能被截断的 ChannelName=" 前缀
+        start = data.rfind(self.MARKER, end)
+        if start < 0:
+            start = max(end, len(data) - len(self.MARKER) + 1)
+        self.pending = data[start:]
+        if len(self.pending) > self.max_pending:
+            self.pending = self.pending[-(len(self.MARKER) - 1):]
+
+        self.count += len(spans)
+        return spans
+
+    def close(self):
+        """输入结束，丢弃不完整的尾部"""
+        self.pending = b''
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - 频道表
+频道记录使用 __slots__，组播地址在建表时解析为 (IPv4整数, 端口)；
+分类分组和排序结果按表的版本号缓存，表内容变化后自动失效
+"""
+
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+IGMP_PATTERN = re.compile(r'igmp://([^:]+):(\d+)')
+
+
+def pack_ipv4(host: str) -> Optional[int]:
+    """点分十进制IPv4地址转为整数，不是IPv4地址时返回None"""
+    parts = host.split('.')
+    if len(parts) != 4:
+        return None
+    address = 0
+    for part in parts:
+        if not part.isdigit() or len(part) > 3:
+            return None
+        value = int(part)
+        if value > 255:
+            return None
+        address = (address << 8) | value
+    return address
+
+
+def unpack_ipv4(address: int) -> str:
+    return f"{address >> 24}.{(address >> 16) & 255}.{(address >> 8) & 255}.{address & 255}"
+
+
+class Channel:
+    """一个频道"""
+
+    __slots__ = ('original_name', 'name', 'igmp_url', 'rtsp_url', 'category', 'sort_key', 'address', 'port',
+                 'alive')
+
+    def __init__(self, original_name: str, name: str, igmp_url: str, rtsp_url: str,
+                 category: str, sort_key: tuple):
+        self.original_name = original_name
+        self.name = name
+        self.igmp_url = igmp_url
+        self.rtsp_url = rtsp_url
+        self.category = category
+        self.sort_key = sort_key
+
+        # 组播地址：IPv4 存为整数；主机名等无法打包的地址 address 为None，port 仍然有效
+        self.address: Optional[int] = None
+        self.port: Optional[int] = None
+        match = IGMP_PATTERN.search(igmp_url)
+        if match:
+            self.address = pack_ipv4(match.group(1))
+            self.port = int(match.group(2))
+
+        # 组播探测结果，未探测时为None
+        self.alive: Optional[bool] = None
+
+    @property
+    def ip(self) -> Optional[str]:
+        if self.address is not None:
+            return unpack_ipv4(self.address)
+        match = IGMP_PATTERN.search(self.igmp_url)
+        return match.group(1) if match else None
+
+    @property
+    def multicast(self) -> Optional[str]:
+        """ip:端口，没有有效组播地址时为None"""
+        if self.port is None:
+            return None
+        return f"{self.ip}:{self.port}"
+
+    def to_dict(self) -> Dict:
+        return {
+            'original_name': self.original_name,
+            'name': self.name,
+            'igmp_url': self.igmp_url,
+            'rtsp_url': self.rtsp_url,
+            'category': self.category,
+        }
+
+    def __repr__(self) -> str:
+        return f"Channel({self.name!r}, {self.igmp_url!r}, {self.category!r})"
+
+
+class ChannelTable:
+    """频道列表，附带按版本号缓存的分组和排序结果
+
+    通过表的方法增删频道会自动使缓存失效；直接修改某个频道的分类或排序键后需调用 invalidate()
+    """
+
+    def __init__(self, channels: Optional[Iterable[Channel]] = None):
+        self.channels: List[Channel] = list(channels or [])
+        self.version = 0
+        self._cache_version = -1
+        self._grouped: Dict[str, List[Channel]] = {}
+        self._ordered: Dict[Tuple[str, ...], List[Tuple[str, List[Channel]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.channels)
+
+    def __iter__(self) -> Iterator[Channel]:
+        return iter(self.channels)
+
+    def __getitem__(self, index):
+        return self.channels[index]
+
+    def append(self, channel: Channel):
+        self.channels.append(channel)
+        self.invalidate()
+
+    def extend(self, channels: Iterable[Channel]):
+        self.channels.extend(channels)
+        self.invalidate()
+
+    def remove(self, channel: Channel):
+        self.channels.remove(channel)
+        self.invalidate()
+
+    def remove_where(self, predicate: Callable[[Channel], bool]) -> int:
+        """删除满足条件的频道，返回删除数量"""
+        kept = [channel for channel in self.channels if not predicate(channel)]
+        removed = len(self.channels) - len(kept)
+        if removed:
+            self.channels = kept
+            self.invalidate()
+        return removed
+
+    def clear(self):
+        self.channels.clear()
+        self.invalidate()
+
+    def invalidate(self):
+        self.version += 1
+
+    def _check_cache(self):
+        if self._cache_version != self.version:
+            self._grouped = {}
+            self._ordered = {}
+            self._cache_version = self.version
+
+    def grouped(self) -> Dict[str, List[Channel]]:
+        """按分类分组，组内按排序键排序"""
+        self._check_cache()
+        if not self._grouped and self.channels:
+            grouped: Dict[str, List[Channel]] = {}
+            for channel in self.channels:
+                grouped.setdefault(channel.category, []).append(channel)
+            for channels in grouped.values():
+                channels.sort(key=lambda channel: channel.sort_key)
+            self._grouped = grouped
+        return self._grouped
+
+    def ordered(self, categories_order: Sequence[str]) -> List[Tuple[str, List[Channel]]]:
+        """按给定的分类顺序返回非空分组，不在顺序中的分类不输出"""
+        key = tuple(categories_order)
+        self._check_cache()
+        ordered = self._ordered.get(key)
+        if ordered is None:
+            grouped = self.grouped()
+            ordered = [(category, grouped[category]) for category in key if grouped.get(category)]
+            self._ordered[key] = ordered
+        return ordered
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - 命令行入口（无交互）
+子命令: fetch 获取最终HTML / convert 生成播放列表 / both 依次执行两步
+配置只加载一次，优先级: 命令行参数 > 环境变量 > 配置文件 > 默认值；
+较重的模块（requests等）在执行子命令时才导入，适合cron/systemd定时运行
+
+用法:
+  python cli.py both --config gzitv.json
+  GZITV_USER_ID=... GZITV_STBMAC=... python cli.py fetch --output-dir /var/lib/iptv
+  python cli.py convert --udpxy http://192.168.1.44:5140/rtp --fcc none --formats m3u,json
+  python cli.py both --profile                # 分阶段性能分析，结果保存到 输出目录/profile
+
+配置文件格式（JSON，所有项都可省略）:
+  {"config": {"base_url": "...", "user_id": "...", "authenticator": "..."},
+   "hardware_params": {"stbinfo": "...", "stbtype": "...", "easip": "...", "stbmac": "..."},
+   "output_dir": ".", "udpxy_url": "...", "fcc": "10.255.5.32:8027", "formats": ["m3u", "details"]}
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+# 默认配置文件，--config 和 GZITV_CONFIG 都没有指定时存在则使用
+DEFAULT_CONFIG_FILE = 'gzitv.json'
+
+DEFAULT_UDPXY_URL = "http://192.168.1.44:5140/rtp"
+
+# 环境变量 -> (配置分组, 键)；分组为None表示顶层配置项
+ENV_VARS = {
+    'GZITV_BASE_URL': ('config', 'base_url'),
+    'GZITV_USER_ID': ('config', 'user_id'),
+    'GZITV_AUTHENTICATOR': ('config', 'authenticator'),
+    'GZITV_STBINFO': ('hardware_params', 'stbinfo'),
+    'GZITV_STBTYPE': ('hardware_params', 'stbtype'),
+    'GZITV_DRMSUPPLIER': ('hardware_params', 'drmsupplier'),
+    'GZITV_PRMID': ('hardware_params', 'prmid'),
+    'GZITV_EASIP': ('hardware_params', 'easip'),
+    'GZITV_NETWORKID': ('hardware_params', 'networkid'),
+    'GZITV_STBMAC': ('hardware_params', 'stbmac'),
+    'GZITV_OUTPUT_DIR': (None, 'output_dir'),
+    'GZITV_UDPXY': (None, 'udpxy_url'),
+    'GZITV_FCC': (None, 'fcc'),
+    'GZITV_FORMATS': (None, 'formats'),
+}
+
+
+def load_settings(config_file: Optional[str] = None, environ: Optional[Dict[str, str]] = None) -> Dict:
+    """读取配置文件和环境变量，返回合并后的配置"""
+    environ = os.environ if environ is None else environ
+    settings: Dict = {'config': {}, 'hardware_params': {}}
+
+    path = config_file or environ.get('GZITV_CONFIG')
+    if not path and os.path.exists(DEFAULT_CONFIG_FILE):
+        path = DEFAULT_CONFIG_FILE
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for key, value in data.items():
+            if key in ('config', 'hardware_params'):
+                settings[key].update(value)
+            else:
+                settings[key] = value
+
+    for name, (group, key) in ENV_VARS.items():
+        value = environ.get(name)
+        if value is None:
+            continue
+        if key == 'formats':
+            value = [item for item in value.split(',') if item]
+        if group:
+            settings[group][key] = value
+        else:
+            settings[key] = value
+    return settings
+
+
+def split_list(value: Optional[str]) -> Optional[List[str]]:
+    if value is None:
+        return None
+    return [item for item in value.split(',') if item]
+
+
+def run_fetch(settings: Dict, args, profiler=None) -> Optional[List[Tuple[str, str]]]:
+    """认证并获取最终HTML，成功时返回下载过程中解析出的 (ChannelName, ChannelSDP)，失败时返回None"""
+    from http_transport import GZITVTransport
+    from iptv import GZITVHTMLFetcher
+    from redirect_chain import GZITVRedirectChain
+    from session_cache import GZITVSessionCache
+
+    output_dir = settings['output_dir']
+    debug_dir = os.environ.get('GZITV_DEBUG_DIR')
+    debug_store = None
+    if debug_dir:
+        from debug_store import GZITVDebugStore
+        debug_store = GZITVDebugStore(debug_dir)
+
+    session_cache = None
+    redirect_chain = None
+    if not args.no_cache:
+        session_cache = GZITVSessionCache(os.path.join(output_dir, 'iptv_session.json'))
+        redirect_chain = GZITVRedirectChain(os.path.join(output_dir, 'iptv_redirect_chain.json'))
+
+    fetcher = GZITVHTMLFetcher(config=settings['config'], hardware_params=settings['hardware_params'],
+                               output_dir=output_dir, session_cache=session_cache, debug_store=debug_store,
+                               transport=GZITVTransport(run_deadline=args.deadline or None),
+                               redirect_chain=redirect_chain, profiler=profiler)
+    try:
+        return fetcher.channels if fetcher.run() else None
+    finally:
+        fetcher.session.close()
+        if debug_store:
+            debug_store.close()
+
+
+def run_convert(settings: Dict, args, profiler=None, records: Optional[List[Tuple[str, str]]] = None) -> bool:
+    """生成播放列表；records 为获取步骤解析出的频道，没有时读取HTML文件"""
+    from playlist_render import DEFAULT_FCC
+    from To_M3U import GZIPTVM3UGenerator
+
+    output_dir = settings['output_dir']
+    html_file = args.html or os.path.join(output_dir, 'final_frameset_builder.html')
+    if args.html:
+        # 明确指定了HTML文件时以文件为准
+        records = None
+    if not records and not os.path.exists(html_file):
+        print(f"❌ 未找到 {html_file}，请先运行 fetch")
+        return False
+
+    channel_store = None
+    if args.history:
+        from channel_store import GZIPTVChannelStore
+        channel_store = GZIPTVChannelStore(os.path.join(output_dir, 'channel_history.db'))
+
+    prober = None
+    if args.probe:
+        from multicast_probe import GZIPTVMulticastProber
+        prober = GZIPTVMulticastProber(interface=args.probe_interface)
+
+    fcc = settings.get('fcc', DEFAULT_FCC)
+    if fcc in ('', 'none'):
+        fcc = None
+    fcc_selector = None
+    if args.fcc_candidates:
+        from fcc_selector import GZIPTVFCCSelector
+        fcc_selector = GZIPTVFCCSelector(split_list(args.fcc_candidates), strategy=args.fcc_mode,
+                                         cache_file=os.path.join(output_dir, 'fcc_latency.json'), fallback=fcc)
+
+    generator = GZIPTVM3UGenerator(html_file, channel_store=channel_store, profiler=profiler)
+    try:
+        return generator.run(settings.get('udpxy_url', DEFAULT_UDPXY_URL), incremental=args.incremental,
+                             formats=tuple(settings['formats']), compress=args.gzip,
+                             prober=prober, probe_mode=args.probe or 'flag', fcc_selector=fcc_selector,
+                             epg_url=args.epg_url, fcc=fcc, output_dir=output_dir, records=records)
+    finally:
+        if channel_store is not None:
+            channel_store.close()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='贵州电信IPTV 命令行工具（无交互）')
+
+    common_options = argparse.ArgumentParser(add_help=False)
+    common_options.add_argument('--config', help=f'配置文件（JSON），默认读取环境变量 GZITV_CONFIG 或 {DEFAULT_CONFIG_FILE}')
+    common_options.add_argument('--output-dir', help='HTML、缓存和播放列表的输出目录（GZITV_OUTPUT_DIR），默认当前目录')
+    common_options.add_argument('--profile', nargs='?', const='profile', metavar='DIR',
+                                help='分阶段性能分析，结果保存到该目录（相对于输出目录），默认 profile')
+
+    fetch_options = argparse.ArgumentParser(add_help=False)
+    fetch_options.add_argument('--deadline', type=float, default=90, help='获取流程的总时间预算（秒），0表示不限制')
+    fetch_options.add_argument('--no-cache', action='store_true', help='不使用会话缓存和学习到的重定向链')
+
+    convert_options = argparse.ArgumentParser(add_help=False)
+    convert_options.add_argument('--html', help='包含频道数据的HTML，默认为输出目录下的 final_frameset_builder.html')
+    convert_options.add_argument('--udpxy', help=f'UDPXY代理地址（GZITV_UDPXY），默认 {DEFAULT_UDPXY_URL}')
+    convert_options.add_argument('--fcc', help='FCC服务器 主机:端口（GZITV_FCC），none表示不加')
+    convert_options.add_argument('--fcc-candidates', help='按延迟选择FCC服务器的候选列表，逗号分隔')
+    convert_options.add_argument('--fcc-mode', default='best', choices=('best', 'weighted', 'group'))
+    convert_options.add_argument('--formats', help='输出格式，逗号分隔（GZITV_FORMATS）: m3u,details,json,txt,xspf')
+    convert_options.add_argument('--gzip', action='store_true', help='输出gzip压缩文件')
+    convert_options.add_argument('--incremental', action='store_true', help='频道没有变化时不重写输出文件')
+    convert_options.add_argument('--history', action='store_true', help='把频道写入历史库 channel_history.db')
+    convert_options.add_argument('--probe', choices=('flag', 'drop'), help='探测组播组，失效频道标记或删除')
+    convert_options.add_argument('--probe-interface', default='0.0.0.0', help='IPTV专网网卡的IP地址')
+    convert_options.add_argument('--epg-url', help='在M3U文件头引用的节目单地址')
+
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('fetch', parents=[common_options, fetch_options], help='认证并获取最终HTML')
+    subparsers.add_parser('convert', parents=[common_options, convert_options], help='从最终HTML生成播放列表')
+    subparsers.add_parser('both', parents=[common_options, fetch_options, convert_options],
+                          help='获取HTML后生成播放列表')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    start = time.perf_counter()
+
+    try:
+        settings = load_settings(args.config)
+    except (OSError, ValueError) as e:
+        print(f"❌ 读取配置失败: {e}")
+        return 2
+
+    # 命令行参数覆盖配置
+    if args.output_dir:
+        settings['output_dir'] = args.output_dir
+    settings.setdefault('output_dir', '.')
+    os.makedirs(settings['output_dir'], exist_ok=True)
+    if args.command != 'fetch':
+        if args.udpxy:
+            settings['udpxy_url'] = args.udpxy
+        if args.fcc is not None:
+            settings['fcc'] = args.fcc
+        if args.formats:
+            settings['formats'] = split_list(args.formats)
+        settings.setdefault('formats', ['m3u', 'details'])
+
+    profiler = None
+    if args.profile:
+        from stage_profiler import GZITVStageProfiler
+        profiler = GZITVStageProfiler(os.path.join(settings['output_dir'], args.profile))
+
+    success = True
+    records = None
+    try:
+        if args.command in ('fetch', 'both'):
+            # both: 获取时已经解析出的频道直接用于转换，不再重新读取HTML
+            records = run_fetch(settings, args, profiler)
+            success = records is not None
+        if success and args.command in ('convert', 'both'):
+            success = run_convert(settings, args, profiler, records)
+    finally:
+        if profiler is not None:
+            profiler.save()
+
+    print(f"\n{'✅' if success else '❌'} {args.command} {'完成' if success else '失败'}，"
+          f"用时 {time.perf_counter() - start:.2f}s")
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
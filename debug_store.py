@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - 调试文件存储
+按内容哈希去重、压缩保存每一步的原始响应字节，由后台线程写入，按总大小和保存时间淘汰。
+默认不启用；启用后不再在工作目录中生成中间HTML文件
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class GZITVDebugStore:
+    def __init__(self, root: str = 'debug_artifacts', max_bytes: int = 64 * 1024 * 1024,
+                 max_age_days: float = 7, compresslevel: int = 6):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.index_path = os.path.join(root, 'index.jsonl')
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.compresslevel = compresslevel
+        self.run_id = self.new_run_id()
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+        # 所有文件操作都在后台线程中执行，第一次保存时启动
+        self.queue: queue.Queue = queue.Queue()
+        self.writer: Optional[threading.Thread] = None
+        self.writer_lock = threading.Lock()
+
+    @staticmethod
+    def new_run_id() -> str:
+        now = time.time()
+        return time.strftime('%Y%m%d-%H%M%S', time.localtime(now)) + f"{int(now * 1000) % 1000:03d}-{os.getpid()}"
+
+    def begin_run(self):
+        """开始新的一次运行，之后保存的文件归入新的运行编号"""
+        self.run_id = self.new_run_id()
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.gz")
+
+    def put(self, name: str, raw: bytes, **meta):
+        """保存一个原始响应（只入队，压缩和写盘在后台线程完成）"""
+        entry = dict(meta, run=self.run_id, name=name, time=time.time(), size=len(raw))
+        self.submit('write', entry, raw)
+
+    def submit(self, action: str, *args):
+        with self.writer_lock:
+            if self.writer is None:
+                self.writer = threading.Thread(target=self.write_loop, name='gzitv-debug-store', daemon=True)
+                self.writer.start()
+        self.queue.put((action, args))
+
+    def write_loop(self):
+        while True:
+            action, args = self.queue.get()
+            try:
+                if action == 'write':
+                    self.write(*args)
+                elif action == 'evict':
+                    self.evict()
+                elif action == 'stop':
+                    return
+            except Exception as e:
+                print(f"  ⚠️ 调试文件保存失败: {e}", file=sys.stderr)
+            finally:
+                self.queue.task_done()
+
+    def write(self, entry: Dict, raw: bytes):
+        digest = hashlib.sha256(raw).hexdigest()
+        entry['sha256'] = digest
+        path = self.object_path(digest)
+
+        if os.path.exists(path):
+            # 内容相同的响应只保存一份，刷新时间避免被按时间淘汰
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(gzip.compress(raw, self.compresslevel, mtime=0))
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def flush(self):
+        """等待所有文件写完，并执行淘汰"""
+        if self.writer is None:
+            return
+        self.submit('evict')
+        self.queue.join()
+
+    def close(self):
+        if self.writer is None:
+            return
+        self.flush()
+        self.submit('stop')
+        self.writer.join()
+        self.writer = None
+
+    def evict(self):
+        """删除超过保存时间的文件，再按时间从旧到新删除直到总大小不超过上限"""
+        objects = []
+        for directory, _, files in os.walk(self.objects_dir):
+            for filename in files:
+                if filename.endswith('.gz'):
+                    path = os.path.join(directory, filename)
+                    stat = os.stat(path)
+                    objects.append((stat.st_mtime, stat.st_size, path))
+
+        now = time.time()
+        total = sum(size for _, size, _ in objects)
+        removed = set()
+        for mtime, size, path in sorted(objects):
+            if now - mtime <= self.max_age and total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            removed.add(os.path.basename(path)[:-3])
+
+        if removed:
+            self.rewrite_index(removed)
+
+    def rewrite_index(self, removed: set):
+        """从索引中去掉已删除的文件"""
+        entries = [entry for entry in self.entries() if entry.get('sha256') not in removed]
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.index_path)
+
+    def entries(self) -> List[Dict]:
+        """读取索引"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def read(self, digest: str) -> Optional[bytes]:
+        """按哈希读取原始字节"""
+        try:
+            with open(self.object_path(digest), 'rb') as f:
+                return gzip.decompress(f.read())
+        except FileNotFoundError:
+            return None
+
+
+def main():
+    """列出或导出调试文件
+
+    用法: python debug_store.py [目录] [--export 运行编号 输出目录]
+    """
+    args = sys.argv[1:]
+    root = args[0] if args and not args[0].startswith('--') else 'debug_artifacts'
+    store = GZITVDebugStore(root)
+
+    if '--export' in args:
+        position = args.index('--export')
+        run_id, output_dir = args[position + 1], args[position + 2]
+        os.makedirs(output_dir, exist_ok=True)
+        for entry in store.entries():
+            if entry['run'] != run_id:
+                continue
+            raw = store.read(entry['sha256'])
+            if raw is None:
+                continue
+            with open(os.path.join(output_dir, entry['name']), 'wb') as f:
+                f.write(raw)
+            print(f"📁 {entry['name']} ({len(raw)} 字节)")
+        return
+
+    for entry in store.entries():
+        print(f"{entry['run']}  {entry['name']:<40} {entry['size']:>9} 字节  {entry.get('note', '')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - 节目单获取
+用认证后的会话并发获取所有频道的节目单，按 频道/日期 缓存：缓存只保留滑动窗口内的日期，
+每次只获取缺少的日期；输出XMLTV格式的 xmltv.xml，由M3U文件头的 x-tvg-url 引用
+
+用法: python epg_fetcher.py [--past-days 1] [--future-days 2] [--workers 8]
+"""
+
+import argparse
+import html
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+from channel_stream import decode_span, sniff_span_encoding
+from channel_table import IGMP_PATTERN, Channel, pack_ipv4, unpack_ipv4
+from playlist_snapshot import atomic_open, atomic_write_text
+
+# 节目单页面地址，{base_url} 为EPG服务器地址（如 http://10.255.9.60:8080），{date} 为 YYYYMMDD
+PROGRAM_URL_TEMPLATE = "{base_url}/iptvepg/frame1081/datajsp/getchannelprog.jsp?channelid={channel_id}&date={date}"
+
+# 频道配置中的 ChannelID、ChannelName 和 ChannelSDP
+CHANNEL_ID_PATTERN_BYTES = re.compile(rb'ChannelID="([^"]+)"[^>]*?ChannelName="([^"]+)"[^>]*?ChannelSDP="([^"]+)"')
+
+# 节目单中的一条记录: {...} 内的 键:值 对（兼容JSON和JS对象字面量）
+RECORD_PATTERN = re.compile(r'\{[^{}]*\}')
+FIELD_PATTERN = re.compile(r'["\']?(\w+)["\']?\s*[:=]\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+TITLE_KEYS = ('programName', 'ProgramName', 'programname', 'name', 'title', 'Name')
+START_KEYS = ('startTime', 'StartTime', 'beginTime', 'BeginTime', 'starttime', 'begintime', 'start')
+STOP_KEYS = ('endTime', 'EndTime', 'endtime', 'stopTime', 'end', 'stop')
+DESC_KEYS = ('description', 'desc', 'programDesc', 'introduce')
+
+# XMLTV时间的时区
+TIMEZONE = '+0800'
+
+
+@dataclass
+class Programme:
+    """一个节目，时间格式为 YYYYMMDDHHMMSS（本地时间）"""
+    start: str
+    stop: str
+    title: str
+    desc: str = ''
+
+
+def normalize_time(value: str, day: str) -> Optional[str]:
+    """把节目单中的时间转为 YYYYMMDDHHMMSS；只有时分(秒)时使用节目单日期"""
+    digits = re.sub(r'\D', '', value)
+    if len(digits) >= 14:
+        return digits[:14]
+    if len(digits) == 12:
+        return digits + '00'
+    if len(digits) == 4:
+        return day + digits + '00'
+    if len(digits) == 6:
+        return day + digits
+    return None
+
+
+def first_value(record: Dict[str, str], keys: Tuple[str, ...]) -> str:
+    for key in keys:
+        value = record.get(key)
+        if value:
+            return value
+    return ''
+
+
+def parse_programmes(text: str, day: str) -> List[Programme]:
+    """解析节目单页面，缺少结束时间的节目以下一个节目的开始时间结束"""
+    parsed = []
+    for block in RECORD_PATTERN.findall(text):
+        record = {match.group(1): match.group(2) if match.group(2) is not None else match.group(3)
+                  for match in FIELD_PATTERN.finditer(block)}
+        title = first_value(record, TITLE_KEYS)
+        start = normalize_time(first_value(record, START_KEYS), day)
+        if not title or not start:
+            continue
+        stop = normalize_time(first_value(record, STOP_KEYS), day) or ''
+        parsed.append(Programme(start, stop, html.unescape(title).strip(),
+                                html.unescape(first_value(record, DESC_KEYS)).strip()))
+
+    parsed.sort(key=lambda programme: programme.start)
+    programmes = []
+    for i, programme in enumerate(parsed):
+        if not programme.stop or programme.stop <= programme.start:
+            if i + 1 >= len(parsed):
+                continue
+            programme.stop = parsed[i + 1].start
+        programmes.append(programme)
+    return programmes
+
+
+def sdp_multicast(sdp: str) -> Optional[str]:
+    """SDP中的组播地址 ip:端口，写法与 Channel.multicast 一致"""
+    match = IGMP_PATTERN.search(sdp)
+    if not match:
+        return None
+    address = pack_ipv4(match.group(1))
+    host = unpack_ipv4(address) if address is not None else match.group(1)
+    return f"{host}:{match.group(2)}"
+
+
+def channel_key(channel: Channel) -> Tuple[str, Optional[str]]:
+    """频道在 load_channel_ids 结果中的键: (频道原名称, 组播地址)；同名频道的不同线路分开"""
+    return channel.original_name, channel.multicast
+
+
+def load_channel_ids(html_file: str) -> Dict[Tuple[str, Optional[str]], str]:
+    """从最终HTML中读取 (频道原名称, 组播地址) -> ChannelID"""
+    with open(html_file, 'rb') as f:
+        spans = CHANNEL_ID_PATTERN_BYTES.findall(f.read())
+    encoding = sniff_span_encoding([name for _, name, _ in spans]) or 'utf-8'
+    channel_ids = {}
+    for channel_id, name, sdp in spans:
+        name = html.unescape(decode_span(name, encoding, 'replace'))
+        multicast = sdp_multicast(decode_span(sdp, encoding, 'replace'))
+        channel_ids[(name, multicast)] = decode_span(channel_id, encoding, 'replace')
+    return channel_ids
+
+
+class GZIPTVEPGFetcher:
+    def __init__(self, fetcher, cache_dir: str = 'epg_cache', past_days: int = 1, future_days: int = 2,
+                 max_workers: int = 8, url_template: str = PROGRAM_URL_TEMPLATE, timeout: float = 10):
+        # 已认证的 GZITVHTMLFetcher，节目单请求共用它的会话和Cookie
+        self.fetcher = fetcher
+        self.cache_dir = cache_dir
+        # 滑动窗口: 今天之前past_days天到今天之后future_days天
+        self.past_days = past_days
+        self.future_days = future_days
+        self.max_workers = max_workers
+        self.url_template = url_template
+        self.timeout = timeout
+
+        # 连接池大小不小于并发数，所有线程复用到EPG服务器的连接
+        transport = self.fetcher.transport
+        if transport.pool_maxsize < max_workers:
+            transport.pool_maxsize = max_workers
+            transport.mount(self.fetcher.session)
+
+    def window(self, today: Optional[date] = None) -> List[str]:
+        today = today or date.today()
+        return [(today + timedelta(days=offset)).strftime('%Y%m%d')
+                for offset in range(-self.past_days, self.future_days + 1)]
+
+    def cache_path(self, channel_id: str, day: str) -> str:
+        safe_id = re.sub(r'[^\w.-]', '_', channel_id)
+        return os.path.join(self.cache_dir, safe_id, f"{day}.json")
+
+    def load_day(self, channel_id: str, day: str) -> Optional[List[Programme]]:
+        """读取缓存的节目单，没有缓存或缓存为空时返回None"""
+        try:
+            with open(self.cache_path(channel_id, day), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            programmes = [Programme(**programme) for programme in data['programmes']]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        # 空节目单可能是服务器还没有发布，下次重新获取
+        return programmes or None
+
+    def save_day(self, channel_id: str, day: str, programmes: List[Programme]):
+        path = self.cache_path(channel_id, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = {'channel_id': channel_id, 'date': day, 'fetched_at': time.time(),
+                'programmes': [asdict(programme) for programme in programmes]}
+        atomic_write_text(path, json.dumps(data, ensure_ascii=False))
+
+    def evict(self, days: List[str]) -> int:
+        """删除窗口之外的缓存，返回删除的文件数"""
+        keep = {f"{day}.json" for day in days}
+        removed = 0
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_dir():
+                continue
+            for item in os.scandir(entry.path):
+                if item.name.endswith('.json') and item.name not in keep:
+                    os.remove(item.path)
+                    removed += 1
+            if not os.listdir(entry.path):
+                os.rmdir(entry.path)
+        return removed
+
+    def fetch_day(self, channel_id: str, day: str) -> List[Programme]:
+        url = self.url_template.format(base_url=self.fetcher.current_base_url, channel_id=channel_id, date=day)
+        resp = self.fetcher.send_request('GET', url, step='epg', timeout=self.timeout)
+        resp.raise_for_status()
+        return parse_programmes(self.fetcher.detect_and_fix_encoding(resp), day)
+
+    def update(self, channel_ids: List[str], today: Optional[date] = None) -> Dict[str, int]:
+        """获取窗口内缺少的节目单，返回统计"""
+        days = self.window(today)
+        stats = {'evicted': self.evict(days), 'cached': 0, 'fetched': 0, 'failed': 0}
+
+        missing = []
+        for channel_id in dict.fromkeys(channel_ids):
+            for day in days:
+                if self.load_day(channel_id, day) is None:
+                    missing.append((channel_id, day))
+                else:
+                    stats['cached'] += 1
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='epg') as executor:
+            futures = {executor.submit(self.fetch_day, channel_id, day): (channel_id, day)
+                       for channel_id, day in missing}
+            for future in as_completed(futures):
+                channel_id, day = futures[future]
+                try:
+                    programmes = future.result()
+                except Exception as e:
+                    stats['failed'] += 1
+                    print(f"  ⚠️ 获取节目单失败 {channel_id} {day}: {e}")
+                    continue
+                self.save_day(channel_id, day, programmes)
+                stats['fetched'] += 1
+        return stats
+
+    def programmes(self, channel_id: str, days: List[str]) -> Iterator[Programme]:
+        for day in days:
+            yield from self.load_day(channel_id, day) or []
+
+    def write_xmltv(self, channels: List[Tuple[str, Channel]], path: str = 'xmltv.xml',
+                    today: Optional[date] = None) -> int:
+        """逐个频道从缓存读取节目写入XMLTV文件，频道ID为ChannelID（与M3U的tvg-id一致），返回节目数"""
+        days = self.window(today)
+        unique: Dict[str, Channel] = {}
+        for channel_id, channel in channels:
+            unique.setdefault(channel_id, channel)
+
+        count = 0
+        with atomic_open(path) as out:
+            out.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                      '<!DOCTYPE tv SYSTEM "xmltv.dtd">\n'
+                      '<tv generator-info-name="GZIPTV">\n')
+            for channel_id, channel in unique.items():
+                out.write(f'  <channel id={quoteattr(channel_id)}>\n'
+                          f'    <display-name lang="zh">{escape(channel.name)}</display-name>\n'
+                          f'  </channel>\n')
+            for channel_id in unique:
+                xml_id = quoteattr(channel_id)
+                for programme in self.programmes(channel_id, days):
+                    out.write(f'  <programme start="{programme.start} {TIMEZONE}" '
+                              f'stop="{programme.stop} {TIMEZONE}" channel={xml_id}>\n'
+                              f'    <title lang="zh">{escape(programme.title)}</title>\n')
+                    if programme.desc:
+                        out.write(f'    <desc lang="zh">{escape(programme.desc)}</desc>\n')
+                    out.write('  </programme>\n')
+                    count += 1
+            out.write('</tv>\n')
+        return count
+
+    def run(self, channels: List[Channel], channel_ids: Dict[Tuple[str, Optional[str]], str],
+            path: str = 'xmltv.xml') -> bool:
+        """获取节目单并写出XMLTV文件；channel_ids 为 load_channel_ids 的结果"""
+        entries = [(channel_ids[channel_key(channel)], channel) for channel in channels
+                   if channel_key(channel) in channel_ids]
+        print(f"\n📅 获取节目单: {len(entries)} 个频道，{self.past_days + self.future_days + 1} 天 "
+              f"(并发 {self.max_workers})...")
+        if not entries:
+            print("❌ 没有找到频道ID")
+            return False
+
+        start = time.perf_counter()
+        today = date.today()
+        stats = self.update([channel_id for channel_id, _ in entries], today)
+        print(f"  缓存命中 {stats['cached']}，新获取 {stats['fetched']}，失败 {stats['failed']}，"
+              f"清理过期 {stats['evicted']} ({time.perf_counter() - start:.1f}s)")
+
+        count = self.write_xmltv(entries, path, today)
+        print(f"💾 节目单已保存: {path} ({count} 个节目)")
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='贵州电信IPTV 节目单获取')
+    parser.add_argument('--html', default='final_frameset_builder.html', help='包含频道数据的HTML文件')
+    parser.add_argument('--output', default='xmltv.xml', help='XMLTV输出文件')
+    parser.add_argument('--cache-dir', default='epg_cache', help='节目单缓存目录')
+    parser.add_argument('--past-days', type=int, default=1, help='保留今天之前的天数')
+    parser.add_argument('--future-days', type=int, default=2, help='获取今天之后的天数')
+    parser.add_argument('--workers', type=int, default=8, help='并发请求数')
+    parser.add_argument('--url-template', default=PROGRAM_URL_TEMPLATE,
+                        help='节目单地址模板，可用 {base_url} {channel_id} {date}')
+    args = parser.parse_args()
+
+    from iptv import GZITVHTMLFetcher
+    from redirect_chain import GZITVRedirectChain
+    from session_cache import GZITVSessionCache
+    from To_M3U import GZIPTVM3UGenerator
+
+    # 会话缓存有效时直接复用，否则完整认证；同时更新最终HTML
+    fetcher = GZITVHTMLFetcher(session_cache=GZITVSessionCache(), redirect_chain=GZITVRedirectChain())
+    if not fetcher.run():
+        sys.exit(1)
+
+    # 使用获取时已经解析出的频道，不再重新读取HTML
+    generator = GZIPTVM3UGenerator(args.html)
+    if not generator.parse_records(fetcher.channels):
+        sys.exit(1)
+
+    epg = GZIPTVEPGFetcher(fetcher, args.cache_dir, args.past_days, args.future_days, args.workers,
+                           args.url_template)
+    try:
+        success = epg.run(list(generator.channels), load_channel_ids(args.html), args.output)
+    finally:
+        fetcher.session.close()
+
+    if success:
+        print(f"\n📱 生成M3U时加上 --epg-url=<xmltv.xml的访问地址>，播放器即可显示节目单")
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - FCC服务器选择
+并发探测多个候选FCC服务器的响应延迟（向服务器地址发起TCP连接计时），
+结果按TTL缓存到文件；生成播放列表时选用延迟最低的服务器，
+也可以按分类或按频道在延迟相近的服务器之间按权重分配
+
+本地测试: python fcc_selector.py --stand-ins 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import time
+import zlib
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from channel_table import Channel
+from playlist_render import DEFAULT_FCC
+from playlist_snapshot import atomic_write_text
+
+# 可用的选择方式：全部用最快的服务器 / 按频道加权分配 / 按分类加权分配
+STRATEGIES = ('best', 'weighted', 'group')
+
+
+def parse_endpoint(text: str, default_protocol: str = 'tcp') -> Tuple[str, str, int]:
+    """解析候选地址，格式为 [udp://|tcp://]主机:端口，返回 (协议, 主机, 端口)
+
+    协议是FCC服务本身使用的协议，两种都用TCP连接探测，见 probe_once
+    """
+    protocol = default_protocol
+    if '://' in text:
+        protocol, text = text.split('://', 1)
+    host, _, port = text.rpartition(':')
+    if protocol not in ('udp', 'tcp') or not host or not port.isdigit():
+        raise ValueError(f"无效的FCC地址: {text}")
+    return protocol, host, int(port)
+
+
+@dataclass
+class FCCProbeResult:
+    """一个候选FCC服务器的探测结果"""
+    endpoint: str
+    protocol: str
+    alive: bool = False
+    latency_ms: Optional[float] = None
+    samples: List[float] = field(default_factory=list)
+    error: Optional[str] = None
+    checked_at: float = 0.0
+
+
+class GZIPTVFCCSelector:
+    def __init__(self, candidates: Sequence[str], strategy: str = 'best', timeout: float = 1.0,
+                 attempts: int = 3, ttl: float = 600, tolerance: float = 2.0, max_concurrency: int = 16,
+                 cache_file: Optional[str] = 'fcc_latency.json', fallback: Optional[str] = DEFAULT_FCC):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"未知的FCC选择方式: {strategy}（可用: {', '.join(STRATEGIES)}）")
+
+        # 候选地址 -> (协议, 主机, 端口)；写入播放地址的是不带协议前缀的 主机:端口
+        self.candidates: Dict[str, Tuple[str, str, int]] = {}
+        for text in candidates:
+            protocol, host, port = parse_endpoint(text)
+            self.candidates[f"{host}:{port}"] = (protocol, host, port)
+
+        self.strategy = strategy
+        # 每个候选探测attempts次取中位数
+        self.timeout = timeout
+        self.attempts = attempts
+        self.max_concurrency = max_concurrency
+        # 缓存的探测结果在ttl秒内有效
+        self.ttl = ttl
+        self.cache_file = cache_file
+        # 加权分配时只使用延迟不超过 最低延迟 × tolerance 的服务器
+        self.tolerance = tolerance
+        # 所有候选都不可用时使用的地址
+        self.fallback = fallback
+
+        self.results: Dict[str, FCCProbeResult] = {}
+        # plan() 的结果：最快的服务器、参与加权分配的服务器及权重、按分类的分配
+        self.best_endpoint: Optional[str] = None
+        self.planned_weights: Optional[List[Tuple[str, float]]] = None
+        self.group_assignment: Dict[str, str] = {}
+
+    def load_cache(self) -> Dict[str, FCCProbeResult]:
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {endpoint: FCCProbeResult(**result) for endpoint, result in data.items()}
+        except (OSError, ValueError, TypeError) as e:
+            print(f"⚠️ FCC延迟缓存无法读取，重新探测: {e}")
+            return {}
+
+    def save_cache(self):
+        if not self.cache_file:
+            return
+        # 保留其他候选列表写入的结果
+        cached = self.load_cache()
+        cached.update(self.results)
+        data = {endpoint: asdict(result) for endpoint, result in cached.items()}
+        atomic_write_text(self.cache_file, json.dumps(data, ensure_ascii=False, indent=1))
+
+    async def probe_once(self, protocol: str, host: str, port: int) -> float:
+        """向服务器发起一次TCP连接，返回延迟（毫秒）
+
+        FCC请求是运营商私有格式，无法构造服务器会回应的UDP探测包，所以只测量TCP握手的往返时间；
+        udp:// 的候选端口上通常没有TCP服务，服务器回复RST（连接被拒绝）同样说明主机可达，按回应计时
+        """
+        start = time.perf_counter()
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), self.timeout)
+        except ConnectionRefusedError:
+            if protocol != 'udp':
+                raise
+            return (time.perf_counter() - start) * 1000
+        latency = (time.perf_counter() - start) * 1000
+        writer.close()
+        return latency
+
+    async def probe_endpoint(self, endpoint: str, semaphore: asyncio.Semaphore) -> FCCProbeResult:
+        protocol, host, port = self.candidates[endpoint]
+        result = FCCProbeResult(endpoint, protocol)
+        async with semaphore:
+            for _ in range(self.attempts):
+                try:
+                    result.samples.append(round(await self.probe_once(protocol, host, port), 2))
+                except asyncio.TimeoutError:
+                    result.error = '超时'
+                except OSError as e:
+                    result.error = e.strerror or str(e)
+
+        result.alive = bool(result.samples)
+        if result.samples:
+            result.latency_ms = round(statistics.median(result.samples), 2)
+            result.error = None
+        result.checked_at = time.time()
+        return result
+
+    async def probe_all(self, endpoints: List[str]) -> List[FCCProbeResult]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await asyncio.gather(*(self.probe_endpoint(endpoint, semaphore) for endpoint in endpoints))
+
+    def measure(self, force: bool = False) -> Dict[str, FCCProbeResult]:
+        """探测候选服务器，TTL内的缓存结果直接使用；force=True 时全部重新探测"""
+        cached = {} if force else self.load_cache()
+        now = time.time()
+        self.results = {}
+        self.planned_weights = None
+        stale = []
+        for endpoint, (protocol, _, _) in self.candidates.items():
+            result = cached.get(endpoint)
+            if result is not None and result.protocol == protocol and now - result.checked_at < self.ttl:
+                self.results[endpoint] = result
+            else:
+                stale.append(endpoint)
+
+        if stale:
+            for result in asyncio.run(self.probe_all(stale)):
+                self.results[result.endpoint] = result
+            self.save_cache()
+        return self.results
+
+    def ranked(self) -> List[FCCProbeResult]:
+        """可用的服务器，按延迟从低到高"""
+        if not self.results:
+            self.measure()
+        alive = [result for result in self.results.values() if result.alive]
+        return sorted(alive, key=lambda result: (result.latency_ms, result.endpoint))
+
+    def best(self) -> Optional[str]:
+        ranked = self.ranked()
+        return ranked[0].endpoint if ranked else self.fallback
+
+    def weights(self, ranked: Optional[List[FCCProbeResult]] = None) -> List[Tuple[str, float]]:
+        """参与加权分配的服务器及权重（与延迟成反比）"""
+        ranked = self.ranked() if ranked is None else ranked
+        if not ranked:
+            return []
+        limit = max(ranked[0].latency_ms, 0.1) * self.tolerance
+        return [(result.endpoint, 1 / max(result.latency_ms, 0.1))
+                for result in ranked if result.latency_ms <= limit]
+
+    def plan(self, groups: List[Tuple[str, List[Channel]]]):
+        """生成播放列表前计算一次排名和权重，endpoint_for 直接使用结果；
+
+        按分类分配时，把分类依次分给 已分配频道数/权重 最小的服务器（频道多的分类先分配）
+        """
+        ranked = self.ranked()
+        self.best_endpoint = ranked[0].endpoint if ranked else self.fallback
+        self.planned_weights = self.weights(ranked)
+        self.group_assignment = {}
+        if self.strategy != 'group' or not self.planned_weights:
+            return
+        weights = self.planned_weights
+        load = {endpoint: 0 for endpoint, _ in weights}
+        for category, channels in sorted(groups, key=lambda group: (-len(group[1]), group[0])):
+            endpoint, _ = min(weights, key=lambda item: ((load[item[0]] + len(channels)) / item[1], item[0]))
+            load[endpoint] += len(channels)
+            self.group_assignment[category] = endpoint
+
+    def endpoint_for(self, channel: Channel) -> Optional[str]:
+        """频道使用的FCC服务器（没有调用 plan() 时先按没有分类计算一次）"""
+        if self.planned_weights is None:
+            self.plan([])
+
+        if self.strategy == 'group':
+            return self.group_assignment.get(channel.category) or self.best_endpoint
+
+        if self.strategy == 'weighted' and self.planned_weights:
+            # 按组播地址哈希，同一频道每次分到同一台服务器
+            weights = self.planned_weights
+            total = sum(weight for _, weight in weights)
+            point = zlib.crc32((channel.multicast or channel.name).encode('utf-8')) / 2 ** 32 * total
+            for endpoint, weight in weights:
+                point -= weight
+                if point < 0:
+                    return endpoint
+            return weights[-1][0]
+
+        return self.best_endpoint
+
+    def signature(self) -> str:
+        """选择结果的摘要，用于判断播放列表是否需要重写"""
+        if self.strategy == 'best':
+            return self.best() or ''
+        return f"{self.strategy}:" + ','.join(endpoint for endpoint, _ in self.weights())
+
+
+def print_results(results: Dict[str, FCCProbeResult]):
+    print(f"\n⚡ FCC服务器延迟:")
+    ordered = sorted(results.values(), key=lambda r: (not r.alive, r.latency_ms or 0, r.endpoint))
+    for result in ordered:
+        if result.alive:
+            print(f"  ✅ {result.protocol}://{result.endpoint}: {result.latency_ms:.1f}ms "
+                  f"({len(result.samples)} 次成功)")
+        else:
+            print(f"  ❌ {result.protocol}://{result.endpoint}: {result.error or '不可用'}")
+
+
+class FCCTestServer:
+    """本地FCC服务器替身
+
+    UDP: 只绑定UDP端口（FCC服务本身），TCP探测被拒绝，视为服务器有回应；
+    TCP: listening=True 时监听（延迟即本机建立连接的时间），否则端口不监听，连接被拒绝
+    """
+
+    def __init__(self, protocol: str = 'udp', listening: bool = True, host: str = '127.0.0.1'):
+        self.protocol = protocol
+        self.listening = listening
+        kind = socket.SOCK_DGRAM if protocol == 'udp' else socket.SOCK_STREAM
+        self.sock = socket.socket(socket.AF_INET, kind)
+        self.sock.bind((host, 0))
+        self.endpoint = f"{protocol}://{host}:{self.sock.getsockname()[1]}"
+
+    def start(self):
+        # 连接由系统在监听队列中完成，不需要accept
+        if self.protocol == 'tcp' and self.listening:
+            self.sock.listen(64)
+
+    def stop(self):
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='贵州电信IPTV FCC服务器延迟探测')
+    parser.add_argument('candidates', nargs='*', help='候选FCC服务器，格式 [udp://|tcp://]主机:端口')
+    parser.add_argument('--timeout', type=float, default=1.0, help='单次探测超时（秒）')
+    parser.add_argument('--attempts', type=int, default=3, help='每个服务器的探测次数')
+    parser.add_argument('--ttl', type=float, default=600, help='探测结果缓存时间（秒）')
+    parser.add_argument('--cache', default='fcc_latency.json', help='探测结果缓存文件')
+    parser.add_argument('--force', action='store_true', help='忽略缓存重新探测')
+    parser.add_argument('--stand-ins', type=int, metavar='N',
+                        help='本地测试：启动N个UDP/TCP替身服务器（最后一个TCP替身不监听）后探测')
+    args = parser.parse_args()
+
+    servers: List[FCCTestServer] = []
+    candidates = list(args.candidates)
+    if args.stand_ins:
+        for i in range(args.stand_ins):
+            protocol = 'tcp' if i % 2 or i == args.stand_ins - 1 else 'udp'
+            servers.append(FCCTestServer(protocol, listening=i != args.stand_ins - 1))
+        for server in servers:
+            server.start()
+        candidates += [server.endpoint for server in servers]
+    if not candidates:
+        candidates = [DEFAULT_FCC]
+
+    selector = GZIPTVFCCSelector(candidates, timeout=args.timeout, attempts=args.attempts, ttl=args.ttl,
+                                 cache_file=None if args.stand_ins else args.cache)
+    start = time.monotonic()
+    try:
+        results = selector.measure(force=args.force)
+    finally:
+        for server in servers:
+            server.stop()
+    print_results(results)
+    print(f"\n🏆 最快的FCC服务器: {selector.best()} (用时 {time.monotonic() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
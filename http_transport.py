@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - HTTP传输层
+在共享的 requests.Session 上提供：可配置大小的连接池、按幂等性区分的重试（指数退避加随机抖动），
+以及整个获取流程的总时间预算——预算按步骤权重分配给各步骤，每个请求和每次跳转的超时
+都不超过所在步骤剩余的时间，预算用完时立即失败而不是一直等待
+"""
+
+import random
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 各步骤占总时间预算的权重；步骤开始时按 本步骤权重 / 本步骤及之后步骤的权重和 分配剩余时间，
+# 前面的步骤提前完成时，剩下的时间留给后面的步骤
+STEP_WEIGHTS: Dict[str, float] = {
+    'step1': 0.15,
+    'step2': 0.35,
+    'step3': 0.15,
+    'step4': 0.35,
+}
+
+# 幂等的请求方法，任何可重试的错误都可以重发
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """获取流程的时间预算已用完"""
+
+
+@dataclass
+class RetryPolicy:
+    """重试策略
+
+    幂等请求在连接失败、超时和 retry_statuses 状态码时重试；
+    非幂等请求（POST表单）只在请求还没有发出（建立连接失败）时重试，避免重复提交
+    """
+    attempts: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 4.0
+    retry_statuses: Tuple[int, ...] = (502, 503, 504)
+
+    def backoff(self, attempt: int) -> float:
+        """第attempt次失败后的等待时间：[0, min(max, base * 2^(attempt-1))] 内均匀随机（full jitter）"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def should_retry_error(self, error: Exception, idempotent: bool) -> bool:
+        if isinstance(error, DeadlineExceeded):
+            return False
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        if isinstance(error, requests.exceptions.ConnectionError) and is_connect_failure(error):
+            return True
+        return idempotent and isinstance(error, (requests.exceptions.ConnectionError,
+                                                 requests.exceptions.Timeout,
+                                                 requests.exceptions.ChunkedEncodingError))
+
+    def should_retry_status(self, status: int, idempotent: bool) -> bool:
+        return idempotent and status in self.retry_statuses
+
+
+def is_connect_failure(error: Exception) -> bool:
+    """异常链中是否有建立连接失败（请求没有发出）"""
+    from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+    seen = set()
+    current: Optional[BaseException] = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        if isinstance(current, (NewConnectionError, ConnectTimeoutError)):
+            return True
+        reason = getattr(current, 'reason', None)
+        if isinstance(reason, BaseException):
+            current = reason
+        elif current.args and isinstance(current.args[0], BaseException):
+            current = current.args[0]
+        else:
+            current = current.__cause__ or current.__context__
+    return False
+
+
+class GZITVTransport:
+    def __init__(self, pool_connections: int = 4, pool_maxsize: int = 8, connect_timeout: float = 3.0,
+                 run_deadline: Optional[float] = 90.0, retry: Optional[RetryPolicy] = None,
+                 step_weights: Optional[Dict[str, float]] = None):
+        # 连接池：按主机缓存的连接池数量，以及每个主机保持的连接数
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        # 建立连接的超时较短，专网上丢掉一个SYN时很快重试，而不是等待整个读取超时
+        self.connect_timeout = connect_timeout
+        # 整个获取流程的时间预算（秒），None表示不限制
+        self.run_deadline = run_deadline
+        self.retry = retry or RetryPolicy()
+        self.step_weights = step_weights or STEP_WEIGHTS
+
+        self.deadline: Optional[float] = None
+        self.step: Optional[str] = None
+        self.step_deadline: Optional[float] = None
+
+        # 测试时替换为不实际等待的函数
+        self.sleep: Callable[[float], None] = time.sleep
+
+    def pool_kwargs(self) -> Dict[str, int]:
+        return {'pool_connections': self.pool_connections, 'pool_maxsize': self.pool_maxsize}
+
+    def mount(self, session: requests.Session, adapter: Optional[HTTPAdapter] = None):
+        """给会话挂上按配置大小的连接池；重试由本类处理，适配器本身不重试"""
+        adapter = adapter or HTTPAdapter(max_retries=0, **self.pool_kwargs())
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+    def start_run(self):
+        """开始一次获取流程，开始计算时间预算"""
+        self.deadline = time.monotonic() + self.run_deadline if self.run_deadline else None
+        self.step = None
+        self.step_deadline = None
+
+    def end_run(self):
+        """流程结束，之后的请求（如节目单）不受预算限制"""
+        self.deadline = None
+        self.step = None
+        self.step_deadline = None
+
+    def remaining(self) -> Optional[float]:
+        """当前步骤剩余的时间，没有预算时返回None"""
+        if self.deadline is None:
+            return None
+        deadline = self.step_deadline if self.step_deadline is not None else self.deadline
+        return deadline - time.monotonic()
+
+    def enter_step(self, step: Optional[str]):
+        """请求属于新的步骤时（step 形如 step2.redirect），为该步骤分配时间"""
+        name = step.split('.', 1)[0] if step else None
+        if self.deadline is None or name == self.step:
+            return
+        self.step = name
+        if name not in self.step_weights:
+            self.step_deadline = None
+            return
+
+        names = list(self.step_weights)
+        later = sum(self.step_weights[other] for other in names[names.index(name):])
+        share = self.step_weights[name] / later if later else 1.0
+        now = time.monotonic()
+        self.step_deadline = now + max(0.0, self.deadline - now) * share
+
+    def timeout_for(self, requested) -> Tuple[float, float]:
+        """单次请求的 (连接超时, 读取超时)，都不超过步骤剩余时间"""
+        if isinstance(requested, tuple):
+            connect, read = requested
+        else:
+            connect, read = min(self.connect_timeout, requested or self.connect_timeout), requested or 30
+
+        remaining = self.remaining()
+        if remaining is None:
+            return connect, read
+        if remaining <= 0:
+            raise DeadlineExceeded(f"时间预算已用完 ({self.step or '流程'})")
+        return min(connect, remaining), min(read, remaining)
+
+    def request(self, send: Callable[..., requests.Response], method: str, url: str, step: Optional[str] = None,
+                idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+        """通过 send(method, url, **kwargs) 发送请求，按策略重试"""
+        self.enter_step(step)
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        requested = kwargs.pop('timeout', None)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            kwargs['timeout'] = self.timeout_for(requested)
+            try:
+                resp = send(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                if attempt >= self.retry.attempts or not self.retry.should_retry_error(e, idempotent):
+                    raise
+                reason = type(e).__name__
+            else:
+                if attempt >= self.retry.attempts or not self.retry.should_retry_status(resp.status_code, idempotent):
+                    return resp
+                reason = f"HTTP {resp.status_code}"
+                resp.close()
+
+            delay = self.retry.backoff(attempt)
+            remaining = self.remaining()
+            if remaining is not None and delay >= remaining:
+                raise DeadlineExceeded(f"时间预算不足以重试 ({self.step or '流程'}, {reason})")
+            print(f"    🔁 {method} {url} 失败 ({reason})，{delay:.1f}s 后第 {attempt + 1} 次尝试")
+            self.sleep(delay)
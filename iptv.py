@@ -8,13 +8,80 @@ import requests
 import re
 import sys
 import time
-import html
-from typing import Dict, List, Optional, Tuple
+import os
+import codecs
+from typing import Callable, Dict, List, Optional, Tuple
 from urllib.parse import urljoin, urlparse
 
+from channel_stream import ChannelStreamParser, decode_span
+from debug_store import GZITVDebugStore
+from http_transport import GZITVTransport
+from redirect_chain import GZITVRedirectChain
+from page_analyzer import PageAnalysis, analyze_page
+from session_cache import GZITVSessionCache, dump_cookies, restore_cookies
+from stage_profiler import NULL_PROFILER, create_profiler, profile_dir_from_argv
+
+
+# 编码探测只检查响应体的前缀
+ENCODING_SNIFF_BYTES = 4096
+# 流式读取frameset_builder响应的块大小
+STREAM_CHUNK_BYTES = 16 * 1024
+HEADER_CHARSET_PATTERN = re.compile(r'charset=([^\s;]+)')
+META_CHARSET_PATTERN = re.compile(rb'<meta[^>]*charset=["\']?([^"\'>]+)', re.IGNORECASE)
+META_ENCODINGS = ['utf-8', 'gbk', 'gb18030', 'big5']
+SNIFF_ENCODINGS = ['utf-8', 'gbk', 'gb18030', 'big5']
+
+# 认证响应中表示Token有效期的配置项，值可以是秒数、时间戳或日期时间
+TOKEN_EXPIRY_KEY_PATTERN = re.compile(r'expire|validtime|lifetime', re.IGNORECASE)
+TOKEN_EXPIRY_FORMATS = ['%Y%m%d%H%M%S', '%Y-%m-%d %H:%M:%S', '%Y/%m/%d %H:%M:%S']
+# 携带认证状态的Cookie
+SESSION_COOKIES = ('UserToken', 'JSESSIONID')
+
+
+def parse_token_expiry(value: str, now: float) -> Optional[float]:
+    """解析有效期配置，返回过期时间戳；无法解析时返回None"""
+    value = value.strip()
+    for fmt in TOKEN_EXPIRY_FORMATS:
+        try:
+            return time.mktime(time.strptime(value, fmt))
+        except ValueError:
+            continue
+
+    if not value.isdigit():
+        return None
+    number = int(value)
+    if number > 10 ** 12:
+        # 毫秒时间戳
+        return number / 1000
+    if number > 10 ** 9:
+        return float(number)
+    if number > 0:
+        # 剩余秒数
+        return now + number
+    return None
+
+
+def normalize_encoding(name: str) -> Optional[str]:
+    """规范化编码名称，无法识别时返回None"""
+    encoding = name.strip().strip('"\'').lower()
+    if encoding == 'utf8':
+        encoding = 'utf-8'
+    elif encoding == 'gb2312':
+        encoding = 'gbk'
+
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        return None
+    return encoding
+
 
 class GZITVHTMLFetcher:
-    def __init__(self):
+    def __init__(self, config: Optional[Dict] = None, hardware_params: Optional[Dict] = None,
+                 output_dir: str = '.', session_cache: Optional[GZITVSessionCache] = None,
+                 debug_store: Optional[GZITVDebugStore] = None,
+                 transport: Optional[GZITVTransport] = None,
+                 redirect_chain: Optional[GZITVRedirectChain] = None, profiler=None):
         # 基础配置
         self.config = {
             'base_url': '认证服务器ip:port,自行抓包',
@@ -33,6 +100,14 @@ class GZITVHTMLFetcher:
             'stbmac': '机顶盒MAC'
         }
 
+        # 多账号/多机顶盒时由调用方传入各自的参数
+        self.config.update(config or {})
+        self.hardware_params.update(hardware_params or {})
+
+        # 所有输出文件写入该目录
+        self.output_dir = output_dir
+        os.makedirs(self.output_dir, exist_ok=True)
+
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Linux; Android 9; B860AV3.2-T Build/F6100699007048800000) (ztebw,1.0.1,ZTE,blink,7105)AppleWebKit/537.36 (KHTML, like Gecko) Chrome Safari/537.36',
@@ -41,98 +116,236 @@ class GZITVHTMLFetcher:
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
         })
 
+        # 传输层：连接池、重试和整个流程的时间预算
+        self.transport = transport or GZITVTransport()
+        self.transport.mount(self.session)
+
         self.current_token = None
+        self.token_expires_at: Optional[float] = None
         self.jsessionid = None
         self.current_base_url = None
+        self.epg_url = None
+        self.hw_page_url = None
+
+        # 会话缓存，有效时跳过步骤1-3
+        self.session_cache = session_cache
+
+        # 调试文件存储，默认不保存中间响应
+        self.debug_store = debug_store
+
+        # 学习到的步骤2重定向链，有记录时跳过不设置Cookie的跳转
+        self.redirect_chain = redirect_chain
+
+        # 分阶段性能分析（stage_profiler.GZITVStageProfiler），默认关闭
+        self.profiler = profiler or NULL_PROFILER
+
+        # 每次请求前调用的钩子 hook(method, url)，用于限速等
+        self.request_hooks: List[Callable[[str, str], None]] = []
+        # 每次收到响应后调用的钩子 hook(response)，用于录制等
+        self.response_hooks: List[Callable[[requests.Response], None]] = []
+        # 请求耗时跟踪器（GZITVRequestTracer.attach 设置）
+        self.tracer = None
+
+        # 每个EPG服务器路径返回的编码，后续响应跳过探测
+        self.encoding_cache: Dict[Tuple[str, str], str] = {}
+
+        # 最终HTML中解析出的频道 (ChannelName, ChannelSDP)，转换时直接交给 GZIPTVM3UGenerator.parse_records
+        self.channels: List[Tuple[str, str]] = []
+
+        # 最近一次页面分析结果 (页面文本, 分析结果)
+        self.page_analysis_cache: Tuple[Optional[str], Optional[PageAnalysis]] = (None, None)
 
         print("=" * 70)
         print("贵州电信IPTV HTML获取工具 - 简化版")
         print("=" * 70)
 
+    def sniff_encoding(self, url: str, content_type: str, prefix: bytes) -> Tuple[str, bool]:
+        """根据HTTP头、缓存和响应体前缀判断编码，返回 (编码, 是否可信)"""
+        # 方法1: 尝试从HTTP头获取编码
+        charset_match = HEADER_CHARSET_PATTERN.search(content_type.lower())
+        if charset_match:
+            encoding = normalize_encoding(charset_match.group(1))
+            if encoding:
+                return encoding, True
+            print(f"    ⚠️ HTTP头编码{charset_match.group(1)}无法识别，尝试其他编码")
+
+        # 方法2: 同一服务器路径之前探测过的编码
+        parsed = urlparse(url)
+        cache_key = (parsed.netloc, parsed.path)
+        if cache_key in self.encoding_cache:
+            return self.encoding_cache[cache_key], True
+
+        # 方法3: 在前缀字节中查找meta标签
+        charset_match = META_CHARSET_PATTERN.search(prefix)
+        if charset_match:
+            encoding = normalize_encoding(charset_match.group(1).decode('ascii', errors='ignore'))
+            if encoding in META_ENCODINGS:
+                self.encoding_cache[cache_key] = encoding
+                return encoding, True
+
+        # 方法4: 在前缀上尝试常见编码，检查是否有明显的中文字符
+        for encoding in SNIFF_ENCODINGS:
+            try:
+                # 增量解码，允许前缀末尾截断的多字节字符
+                decoded = codecs.getincrementaldecoder(encoding)('strict').decode(prefix, final=False)
+            except UnicodeDecodeError:
+                continue
+            chinese_chars = sum(1 for char in decoded[:2000] if '\u4e00' <= char <= '\u9fff')
+            if chinese_chars > 20:  # 至少有20个中文字符
+                print(f"    检测到编码: {encoding} (包含{chinese_chars}个中文字符)")
+                self.encoding_cache[cache_key] = encoding
+                return encoding, True
+
+        return 'utf-8', False
+
     def detect_and_fix_encoding(self, response) -> str:
         """检测并修复响应编码，返回正确解码的文本"""
-        # 保存原始内容
         content = response.content
+        encoding, confident = self.sniff_encoding(response.url or '',
+                                                  response.headers.get('content-type', ''),
+                                                  content[:ENCODING_SNIFF_BYTES])
+        if not confident:
+            print("    ⚠️ 无法确定编码，默认使用UTF-8")
+
+        # 只对整个响应体解码一次
+        start = time.perf_counter()
+        text = content.decode(encoding, errors='ignore')
+        if self.tracer:
+            self.tracer.record_decode(response, time.perf_counter() - start)
+        return text
+
+    def send_request(self, method: str, url: str, step: Optional[str] = None,
+                     hop: Optional[int] = None, idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+        """所有HTTP请求的统一入口，step/hop 标记请求所属的步骤和跳转序号
+
+        超时、重试和时间预算由传输层处理：timeout 是单次尝试的读取超时上限；
+        idempotent 默认按请求方法判断，非幂等请求只在连接失败时重试
+        """
+        def send(method: str, url: str, **kwargs) -> requests.Response:
+            return self.send_once(method, url, step=step, hop=hop, **kwargs)
+
+        return self.transport.request(send, method, url, step=step, idempotent=idempotent, **kwargs)
+
+    def send_once(self, method: str, url: str, step: Optional[str] = None,
+                  hop: Optional[int] = None, **kwargs) -> requests.Response:
+        """发送一次请求（不重试），每次尝试都经过钩子和耗时跟踪"""
+        for hook in self.request_hooks:
+            hook(method, url)
+        if self.tracer:
+            resp = self.tracer.request(self.session, method, url, step=step, hop=hop, **kwargs)
+        else:
+            resp = self.session.request(method, url, **kwargs)
+        for hook in self.response_hooks:
+            hook(resp)
+        return resp
+
+    def output_path(self, filename: str) -> str:
+        """输出文件的完整路径"""
+        return os.path.join(self.output_dir, filename)
+
+    def save_response(self, filename: str, resp: requests.Response, note: str = "",
+                      raw: Optional[bytes] = None):
+        """将原始响应保存到调试文件存储（未启用时不保存）；流式响应通过raw传入已读取的字节"""
+        if not self.debug_store:
+            return False
+
+        if raw is None:
+            raw = resp.content
+        self.debug_store.put(filename, raw, url=resp.url, status=resp.status_code, note=note)
+        msg = f"📁 {filename} ({len(raw)} 字节)"
+        if note:
+            msg += f" - {note}"
+        print(f"  {msg}")
+        return True
+
+    def stream_final_html(self, resp: requests.Response, filename: str = 'final_frameset_builder.html',
+                          require_channels: bool = False) -> bool:
+        """流式读取frameset_builder响应：增量解码写入最终HTML（UTF-8），同时解析频道
+
+        频道记录 (ChannelName, ChannelSDP) 在下载过程中追加到 self.channels，转换时不必重新读取文件；
+        无法解码的字节替换为U+FFFD（与文件中的内容一致），先写入临时文件，完成后再替换，失败时不覆盖上次的结果
+        """
+        path = self.output_path(filename)
+        tmp_path = path + '.part'
+        parser = ChannelStreamParser()
+        self.channels = []
+
+        prefix = b''
+        encoding = None
+        decoder = None
+        raw_chunks = [] if self.debug_store else None
+        received = 0
+        decode_time = 0.0
+        start = time.perf_counter()
 
-        # 方法1: 尝试从HTTP头获取编码
-        content_type = response.headers.get('content-type', '').lower()
-        if 'charset=' in content_type:
-            charset_match = re.search(r'charset=([^\s;]+)', content_type)
-            if charset_match:
-                encoding = charset_match.group(1).lower()
-                if encoding == 'utf8':
-                    encoding = 'utf-8'
-                elif encoding == 'gb2312':
-                    encoding = 'gbk'
-
-                try:
-                    return content.decode(encoding, errors='ignore')
-                except:
-                    print(f"    ⚠️ HTTP头编码{encoding}解码失败，尝试其他编码")
-
-        # 方法2: 尝试从HTML meta标签获取编码
         try:
-            # 先使用latin-1解码来查找meta标签
-            temp_text = content.decode('latin-1', errors='ignore')
-            charset_match = re.search(r'<meta[^>]*charset=["\']?([^"\'>]+)', temp_text, re.IGNORECASE)
-            if charset_match:
-                encoding = charset_match.group(1).lower()
-                if encoding == 'utf8':
-                    encoding = 'utf-8'
-                elif encoding == 'gb2312':
-                    encoding = 'gbk'
-
-                if encoding in ['utf-8', 'gbk', 'gb2312', 'gb18030', 'big5']:
-                    try:
-                        return content.decode(encoding, errors='ignore')
-                    except:
-                        print(f"    ⚠️ meta标签编码{encoding}解码失败")
-        except:
-            pass
-
-        # 方法3: 尝试常见编码
-        encodings_to_try = ['utf-8', 'gbk', 'gb2312', 'gb18030', 'big5', 'latin-1']
-
-        for encoding in encodings_to_try:
-            try:
-                # 尝试解码
-                decoded = content.decode(encoding, errors='strict')
-                # 检查是否有明显的中文字符
-                chinese_chars = sum(1 for char in decoded[:2000] if '\u4e00' <= char <= '\u9fff')
-                if chinese_chars > 20:  # 至少有20个中文字符
-                    print(f"    检测到编码: {encoding} (包含{chinese_chars}个中文字符)")
-                    return decoded
-            except:
-                continue
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                def process(data: bytes, final: bool = False):
+                    nonlocal decode_time
+                    decode_start = time.perf_counter()
+                    f.write(decoder.decode(data, final))
+                    for name, sdp in parser.feed(data):
+                        self.channels.append((decode_span(name, encoding, 'replace'),
+                                              decode_span(sdp, encoding, 'replace')))
+                    decode_time += time.perf_counter() - decode_start
+
+                for chunk in resp.iter_content(chunk_size=STREAM_CHUNK_BYTES):
+                    received += len(chunk)
+                    if raw_chunks is not None:
+                        raw_chunks.append(chunk)
+
+                    # 凑够前缀后确定编码
+                    if decoder is None:
+                        prefix += chunk
+                        if len(prefix) < ENCODING_SNIFF_BYTES:
+                            continue
+                        chunk, prefix = prefix, b''
+                        encoding = self.stream_encoding(resp, chunk)
+                        decoder = codecs.getincrementaldecoder(encoding)('replace')
+
+                    process(chunk)
+
+                if decoder is None:
+                    encoding = self.stream_encoding(resp, prefix)
+                    decoder = codecs.getincrementaldecoder(encoding)('replace')
+                    process(prefix, final=True)
+                else:
+                    process(b'', final=True)
+                parser.close()
 
-        # 方法4: 最后使用UTF-8并忽略错误
-        print("    ⚠️ 无法确定编码，默认使用UTF-8")
-        return content.decode('utf-8', errors='ignore')
+            if self.tracer:
+                self.tracer.record_download(resp, time.perf_counter() - start, received)
+                self.tracer.record_decode(resp, decode_time)
 
-    def save_response(self, filename: str, content: str, note: str = ""):
-        """保存响应内容为UTF-8编码文件"""
-        try:
-            with open(filename, 'w', encoding='utf-8', errors='ignore') as f:
-                f.write(content)
+            if raw_chunks is not None:
+                self.save_response(filename, resp, f"状态码: {resp.status_code}", raw=b''.join(raw_chunks))
 
-            # 同时保存一份原始二进制响应，以便调试
-            try:
-                # 如果是响应对象，保存原始内容
-                if hasattr(content, 'encode'):
-                    with open(filename.replace('.html', '.raw.bin'), 'wb') as f:
-                        f.write(content.encode('utf-8', errors='ignore'))
-            except:
-                pass
-
-            msg = f"📁 {filename} ({len(content)} 字符)"
-            if note:
-                msg += f" - {note}"
-            print(f"  {msg}")
+            print(f"    📺 解析到 {len(self.channels)} 个频道 ({received} 字节)")
+            if require_channels and not self.channels:
+                print("  ❌ 响应中没有频道数据，会话可能已失效")
+                os.remove(tmp_path)
+                return False
+
+            os.replace(tmp_path, path)
+            print(f"  📁 {path}")
             return True
+
         except Exception as e:
-            print(f"  ⚠️ 保存失败 {filename}: {e}")
+            print(f"  ⚠️ 保存失败 {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
             return False
 
+        finally:
+            resp.close()
+
+    def stream_encoding(self, resp: requests.Response, prefix: bytes) -> str:
+        """流式响应根据前缀确定编码"""
+        encoding, confident = self.sniff_encoding(resp.url or '', resp.headers.get('content-type', ''), prefix)
+        if not confident:
+            print("    ⚠️ 无法确定编码，默认使用UTF-8")
+        return encoding
+
     def step1_complete_authentication(self) -> Tuple[bool, Optional[str]]:
         """步骤1: 完整认证流程"""
         print("\n[1] 执行完整认证流程...")
@@ -143,9 +356,9 @@ class GZITVHTMLFetcher:
             auth_url = f"{self.config['base_url']}/gzitv-epg/ApiTerminal/BootAuth"
             params = {'UserID': self.config['user_id'], 'Action': 'Login'}
 
-            resp = self.session.get(auth_url, params=params, timeout=15)
+            resp = self.send_request('GET', auth_url, step='step1.boot_auth', params=params, timeout=15)
             resp_text = self.detect_and_fix_encoding(resp)
-            self.save_response('step1_1_auth_init.html', resp_text, f"状态码: {resp.status_code}")
+            self.save_response('step1_1_auth_init.html', resp, f"状态码: {resp.status_code}")
 
             # 1.2 提交Authenticator
             print("  1.2 提交Authenticator")
@@ -155,14 +368,14 @@ class GZITVHTMLFetcher:
                 'Authenticator': self.config['authenticator']
             }
 
-            resp = self.session.post(auth_url, data=data, timeout=15)
+            resp = self.send_request('POST', auth_url, step='step1.auth_info', data=data, timeout=15)
             resp_text = self.detect_and_fix_encoding(resp)
-            self.save_response('step1_2_auth_response.html', resp_text, f"状态码: {resp.status_code}")
+            self.save_response('step1_2_auth_response.html', resp, f"状态码: {resp.status_code}")
 
-            # 提取UserToken
-            token_match = re.search(r"CTCSetConfig\s*\(\s*['\"]UserToken['\"][^,]*,\s*['\"]([^'\"]+)['\"]", resp_text)
-            if token_match:
-                self.current_token = token_match.group(1)
+            # 提取UserToken和EPG配置
+            auth_config = self.analyze(resp_text).config
+            if auth_config.get('UserToken'):
+                self.current_token = auth_config['UserToken']
             elif 'UserToken' in self.session.cookies:
                 self.current_token = self.session.cookies['UserToken']
 
@@ -172,19 +385,14 @@ class GZITVHTMLFetcher:
 
             print(f"  ✅ 获得UserToken: {self.current_token[:30]}...")
 
-            # 提取EPG域名
-            epg_domain_match = re.search(r"CTCSetConfig\s*\(\s*['\"]EPGDomain['\"][^,]*,\s*['\"]([^'\"]+)['\"]",
-                                         resp_text)
-            epg_domain = epg_domain_match.group(
-                1) if epg_domain_match else 'http://10.255.9.60:8080/iptvepg/function/index.jsp'
-
-            user_group_match = re.search(r"CTCSetConfig\s*\(\s*['\"]UserGroupNMB['\"][^,]*,\s*['\"]([^'\"]+)['\"]",
-                                         resp_text)
-            user_group = user_group_match.group(1) if user_group_match else '1091'
+            self.token_expires_at = self.token_expiry(auth_config)
+            if self.token_expires_at:
+                expires = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.token_expires_at))
+                print(f"  ⏳ Token有效期至: {expires}")
 
-            epg_group_match = re.search(r"CTCSetConfig\s*\(\s*['\"]EPGGroupNMB['\"][^,]*,\s*['\"]([^'\"]+)['\"]",
-                                        resp_text)
-            epg_group = epg_group_match.group(1) if epg_group_match else '-1'
+            epg_domain = auth_config.get('EPGDomain') or 'http://10.255.9.60:8080/iptvepg/function/index.jsp'
+            user_group = auth_config.get('UserGroupNMB') or '1091'
+            epg_group = auth_config.get('EPGGroupNMB') or '-1'
 
             # 构建初始EPG URL
             initial_epg_url = (
@@ -204,23 +412,49 @@ class GZITVHTMLFetcher:
             traceback.print_exc()
             return False, None
 
+    def token_expiry(self, auth_config: Dict[str, str]) -> Optional[float]:
+        """从认证响应的配置项和Cookie过期时间推算Token的过期时间，取最早的一个"""
+        now = time.time()
+        candidates = []
+        for key, value in auth_config.items():
+            if TOKEN_EXPIRY_KEY_PATTERN.search(key):
+                expires_at = parse_token_expiry(value, now)
+                if expires_at and expires_at > now:
+                    candidates.append(expires_at)
+
+        for cookie in self.session.cookies:
+            if cookie.name in SESSION_COOKIES and cookie.expires and cookie.expires > now:
+                candidates.append(float(cookie.expires))
+
+        return min(candidates) if candidates else None
+
     def step2_navigate_to_hardware_page(self, start_url: str) -> Tuple[bool, Optional[str], Optional[str]]:
         """步骤2: 导航到硬件认证页面"""
         print("\n[2] 导航到硬件认证页面...")
 
+        if self.redirect_chain:
+            shortcut = self.navigate_by_learned_chain(start_url)
+            if shortcut:
+                return shortcut
+
         current_url = start_url
         redirect_count = 0
         max_redirects = 10
+        # 走过的跳转 (URL, 是否设置了Cookie)，成功后记录为重定向链
+        hops: List[Tuple[str, bool]] = []
 
         while redirect_count < max_redirects:
             redirect_count += 1
             print(f"  重定向 {redirect_count}: {current_url}")
 
             try:
-                resp = self.session.get(current_url, timeout=15, allow_redirects=False)
+                resp = self.send_request('GET', current_url, step='step2.redirect', hop=redirect_count,
+                                         timeout=15, allow_redirects=False)
+                hops.append((current_url, bool(resp.cookies)))
                 resp_text = self.detect_and_fix_encoding(resp)
-                self.save_response(f'step2_redirect_{redirect_count}.html', resp_text,
+                self.save_response(f'step2_redirect_{redirect_count}.html', resp,
                                    f"状态码: {resp.status_code}")
+                analysis = self.analyze(resp_text)
 
                 # 更新基础URL
                 parsed = urlparse(current_url)
@@ -232,8 +466,11 @@ class GZITVHTMLFetcher:
                     print(f"    ✅ JSESSIONID: {self.jsessionid}")
 
                 # 检查是否是硬件认证页面
-                if self.is_hardware_auth_page(resp_text):
+                if analysis.is_hardware_auth_page:
                     print(f"    ✅ 到达硬件认证页面")
+                    if self.redirect_chain:
+                        self.redirect_chain.learn(start_url, hops[:-1], current_url,
+                                                  self.current_token, self.config['user_id'])
                     return True, current_url, resp_text
 
                 # 检查重定向
@@ -247,7 +484,7 @@ class GZITVHTMLFetcher:
                         continue
 
                 # 查找JavaScript重定向
-                next_url = self.find_js_redirect(resp_text, current_url)
+                next_url = self.first_js_redirect(analysis, current_url)
                 if next_url:
                     print(f"    🔄 JavaScript重定向到: {next_url}")
                     current_url = next_url
@@ -262,59 +499,83 @@ class GZITVHTMLFetcher:
 
         return False, None, None
 
-    def is_hardware_auth_page(self, content: str) -> bool:
-        """判断是否是硬件认证页面"""
-        return ('funcportalauth.jsp' in content or
-                'stbinfo' in content or
-                'gotoEPG()' in content)
+    def navigate_by_learned_chain(self, start_url: str) -> Optional[Tuple[bool, str, str]]:
+        """按学习到的重定向链直接请求设置Cookie的跳转和硬件认证页面，验证失败时返回None"""
+        urls = self.redirect_chain.predict(start_url, self.current_token, self.config['user_id'])
+        if not urls:
+            return None
 
-    def find_js_redirect(self, content: str, base_url: str) -> Optional[str]:
-        """查找JavaScript重定向"""
-        patterns = [
-            r'document\.location\s*=\s*[\'"]([^\'"]+)[\'"]',
-            r'window\.location\.href\s*=\s*[\'"]([^\'"]+)[\'"]',
-            r'window\.location\s*=\s*[\'"]([^\'"]+)[\'"]',
-            r'top\.location\.href\s*=\s*[\'"]([^\'"]+)[\'"]',
-            r'top\.document\.location\s*=\s*[\'"]([^\'"]+)[\'"]'
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, content)
-            if match:
-                url = match.group(1)
-                if url.startswith('/'):
-                    # 相对路径，使用当前基础URL
-                    if self.current_base_url:
-                        return f"{self.current_base_url}{url}"
-                elif not url.startswith('http'):
-                    # 相对路径，使用当前页面URL的基础
-                    return urljoin(base_url, url)
-                else:
-                    return url
+        print(f"  ⚡ 使用学习到的重定向链: {len(urls)} 个请求（完整导航 {self.redirect_chain.hop_count()} 跳）")
+        for hop, url in enumerate(urls, 1):
+            print(f"  预测 {hop}: {url}")
+            try:
+                resp = self.send_request('GET', url, step='step2.shortcut', hop=hop,
+                                         timeout=15, allow_redirects=False)
+            except Exception as e:
+                print(f"    ⚠️ 请求异常: {e}，改为逐跳导航")
+                return None
 
-        return None
+            if resp.status_code >= 400:
+                print(f"    ⚠️ 状态码 {resp.status_code}，改为逐跳导航")
+                return None
 
-    def extract_form_data(self, content: str) -> Tuple[Optional[str], Optional[Dict]]:
-        """提取表单数据和action"""
-        # 查找form标签
-        form_pattern = r'<form[^>]*action=["\']([^"\']+)["\'][^>]*>([\s\S]*?)</form>'
-        form_match = re.search(form_pattern, content, re.IGNORECASE)
+            parsed = urlparse(url)
+            self.current_base_url = f"{parsed.scheme}://{parsed.netloc}"
+            if 'JSESSIONID' in resp.cookies:
+                self.jsessionid = resp.cookies['JSESSIONID']
+                print(f"    ✅ JSESSIONID: {self.jsessionid}")
 
-        if not form_match:
-            return None, None
+            if hop < len(urls):
+                continue
+
+            resp_text = self.detect_and_fix_encoding(resp)
+            self.save_response(f'step2_shortcut_{hop}.html', resp, f"状态码: {resp.status_code}")
+            if resp.status_code == 200 and self.analyze(resp_text).is_hardware_auth_page:
+                print(f"    ✅ 到达硬件认证页面")
+                return True, url, resp_text
 
-        action = form_match.group(1)
-        form_html = form_match.group(2)
+        print(f"    ⚠️ 预测的页面不是硬件认证页面，改为逐跳导航")
+        return None
 
-        # 提取所有input字段
-        input_pattern = r'<input[^>]*name=["\']([^"\']+)["\'][^>]*value=["\']([^"\']*)["\'][^>]*>'
-        input_matches = re.findall(input_pattern, form_html, re.IGNORECASE)
+    def analyze(self, content: str) -> PageAnalysis:
+        """分析页面；同一页面文本只扫描一次"""
+        cached_content, cached_analysis = self.page_analysis_cache
+        if content is cached_content:
+            return cached_analysis
 
-        form_data = {}
-        for name, value in input_matches:
-            form_data[name] = html.unescape(value)
+        analysis = analyze_page(content)
+        self.page_analysis_cache = (content, analysis)
+        return analysis
 
-        return action, form_data
+    def is_hardware_auth_page(self, content: str) -> bool:
+        """判断是否是硬件认证页面"""
+        return self.analyze(content).is_hardware_auth_page
+
+    def resolve_redirect(self, url: str, base_url: str) -> Optional[str]:
+        """补全重定向地址"""
+        if url.startswith('/'):
+            # 相对路径，使用当前基础URL
+            if self.current_base_url:
+                return f"{self.current_base_url}{url}"
+            return None
+        elif not url.startswith('http'):
+            # 相对路径，使用当前页面URL的基础
+            return urljoin(base_url, url)
+        return url
+
+    def first_js_redirect(self, analysis: PageAnalysis, base_url: str) -> Optional[str]:
+        """页面中第一个JavaScript重定向"""
+        if not analysis.redirects:
+            return None
+        return self.resolve_redirect(analysis.redirects[0], base_url)
+
+    def find_js_redirect(self, content: str, base_url: str) -> Optional[str]:
+        """查找JavaScript重定向"""
+        return self.first_js_redirect(self.analyze(content), base_url)
+
+    def extract_form_data(self, content: str) -> Tuple[Optional[str], Optional[Dict]]:
+        """提取表单数据和action"""
+        return self.analyze(content).first_form()
 
     def step3_submit_hardware_with_mac(self, page_url: str, page_content: str) -> Tuple[bool, Optional[str]]:
         """步骤3: 提交硬件信息"""
@@ -351,10 +612,10 @@ class GZITVHTMLFetcher:
 
             # 提交表单
             self.session.headers['Referer'] = page_url
-            resp = self.session.post(form_action, data=form_data, timeout=20)
+            resp = self.send_request('POST', form_action, step='step3.hardware', data=form_data, timeout=20)
             resp_text = self.detect_and_fix_encoding(resp)
 
-            self.save_response('step3_hardware_response.html', resp_text,
+            self.save_response('step3_hardware_response.html', resp,
                                f"状态码: {resp.status_code}")
 
             # 分析响应
@@ -370,36 +631,45 @@ class GZITVHTMLFetcher:
         """分析硬件认证响应"""
         print("  分析硬件认证响应...")
 
+        analysis = self.analyze(content)
+
         # 查找JavaScript重定向
-        redirect_url = self.find_js_redirect(content, referer_url)
+        redirect_url = self.first_js_redirect(analysis, referer_url)
         if redirect_url:
             print(f"  ✅ 发现重定向: {redirect_url}")
             return True, redirect_url
 
         # 检查是否直接包含setInfoForFatClient或skipFrame等函数
-        if 'skipFrame' in content or 'setInfoForFatClient' in content:
+        if analysis.needs_frame_redirect:
             print(f"  ✅ 需要继续重定向流程")
             # 从响应中提取新的重定向
-            if 'frame.jsp' in content:
+            if 'frame.jsp' in analysis.markers:
                 base_url = referer_url.rsplit('/', 1)[0]
                 return True, f"{base_url}/frame.jsp"
 
         print(f"  ⚠️ 需要进一步分析响应")
         return True, None
 
-    def step4_handle_redirect_chain(self) -> bool:
-        """步骤4: 处理重定向链并获取最终HTML"""
+    def step4_handle_redirect_chain(self, strict: bool = False) -> bool:
+        """步骤4: 处理重定向链并获取最终HTML
+
+        strict为True时（使用缓存会话），服务器拒绝会话即返回False
+        """
         print("\n[4] 处理重定向链并获取最终HTML...")
 
         try:
             # 1. 访问frame.jsp
             print("  1. 访问frame.jsp")
             frame_url = f"{self.current_base_url}/iptvepg/function/frame.jsp"
-            resp = self.session.get(frame_url, timeout=15)
+            resp = self.send_request('GET', frame_url, step='step4.frame', timeout=15)
             resp_text = self.detect_and_fix_encoding(resp)
-            self.save_response('step4_frame.jsp.html', resp_text,
+            self.save_response('step4_frame.jsp.html', resp,
                                f"状态码: {resp.status_code}")
 
+            if strict and (resp.status_code != 200 or not self.extract_form_data(resp_text)[0]):
+                print("  ❌ frame.jsp未返回预期页面，会话可能已失效")
+                return False
+
             # 2. 提取并提交表单到frameset_judger.jsp
             print("  2. 提交到frameset_judger.jsp")
             form_action, form_data = self.extract_form_data(resp_text)
@@ -408,16 +678,16 @@ class GZITVHTMLFetcher:
                     form_action = urljoin(frame_url, form_action)
 
                 print(f"    frameset_judger.jsp地址: {form_action}")
-                resp = self.session.post(form_action, data=form_data, timeout=15)
+                resp = self.send_request('POST', form_action, step='step4.frameset_judger', data=form_data, timeout=15)
                 resp_text = self.detect_and_fix_encoding(resp)
-                self.save_response('step4_frameset_judger.jsp.html', resp_text,
+                self.save_response('step4_frameset_judger.jsp.html', resp,
                                    f"状态码: {resp.status_code}")
             else:
                 print("  ⚠️ 无法提取frameset_judger.jsp表单，尝试直接访问")
                 frameset_judger_url = f"{self.current_base_url}/iptvepg/function/frameset_judger.jsp?picturetype=1,3,5"
-                resp = self.session.get(frameset_judger_url, timeout=15)
+                resp = self.send_request('GET', frameset_judger_url, step='step4.frameset_judger', timeout=15)
                 resp_text = self.detect_and_fix_encoding(resp)
-                self.save_response('step4_frameset_judger.jsp.html', resp_text,
+                self.save_response('step4_frameset_judger.jsp.html', resp,
                                    f"状态码: {resp.status_code}")
 
             # 3. 提取并提交表单到frameset_builder.jsp
@@ -426,60 +696,31 @@ class GZITVHTMLFetcher:
             if form_action and form_data:
                 if not form_action.startswith('http'):
                     form_action = urljoin(self.current_base_url + "/iptvepg/function/", form_action)
-
-                # 添加必要的参数
-                form_data.update({
-                    'MAIN_WIN_SRC': '/iptvepg/frame1081/portal.jsp',
-                    'NEED_UPDATE_STB': '1',
-                    'BUILD_ACTION': 'FRAMESET_BUILDER',
-                    'hdmistatus': ''
-                })
-
-                print(f"    frameset_builder.jsp地址: {form_action}")
-                resp = self.session.post(form_action, data=form_data, timeout=15)
-                resp_text = self.detect_and_fix_encoding(resp)
-
-                # 保存最终HTML
-                self.save_response('final_frameset_builder.html', resp_text,
-                                   f"状态码: {resp.status_code}")
-
-                # 同时尝试使用GBK编码保存一份，以便对比
-                try:
-                    with open('final_frameset_builder_gbk.html', 'w', encoding='gbk', errors='ignore') as f:
-                        f.write(resp.content.decode('gbk', errors='ignore'))
-                    print("    ✅ 已保存GBK编码版本用于对比: final_frameset_builder_gbk.html")
-                except:
-                    pass
-
-                print("  ✅ 已保存最终HTML: final_frameset_builder.html")
-                return True
             else:
                 print("  ⚠️ 无法提取frameset_builder.jsp表单，尝试直接访问")
                 # 尝试直接构造URL
-                frameset_builder_url = f"{self.current_base_url}/iptvepg/function/frameset_builder.jsp"
-                post_data = {
-                    'MAIN_WIN_SRC': '/iptvepg/frame1081/portal.jsp',
-                    'NEED_UPDATE_STB': '1',
-                    'BUILD_ACTION': 'FRAMESET_BUILDER',
-                    'hdmistatus': ''
-                }
-                resp = self.session.post(frameset_builder_url, data=post_data, timeout=15)
-                resp_text = self.detect_and_fix_encoding(resp)
+                form_action = f"{self.current_base_url}/iptvepg/function/frameset_builder.jsp"
+                form_data = {}
 
-                # 保存最终HTML
-                self.save_response('final_frameset_builder.html', resp_text,
-                                   f"状态码: {resp.status_code}")
+            # 添加必要的参数
+            form_data.update({
+                'MAIN_WIN_SRC': '/iptvepg/frame1081/portal.jsp',
+                'NEED_UPDATE_STB': '1',
+                'BUILD_ACTION': 'FRAMESET_BUILDER',
+                'hdmistatus': ''
+            })
 
-                # 同时尝试使用GBK编码保存一份，以便对比
-                try:
-                    with open('final_frameset_builder_gbk.html', 'w', encoding='gbk', errors='ignore') as f:
-                        f.write(resp.content.decode('gbk', errors='ignore'))
-                    print("    ✅ 已保存GBK编码版本用于对比: final_frameset_builder_gbk.html")
-                except:
-                    pass
+            print(f"    frameset_builder.jsp地址: {form_action}")
+            resp = self.send_request('POST', form_action, step='step4.frameset_builder', data=form_data,
+                                     timeout=15, stream=True)
 
-                print("  ✅ 已保存最终HTML: final_frameset_builder.html")
-                return True
+            # 边下载边解析频道并写入最终HTML
+            # 使用缓存会话时，没有频道数据说明会话已失效，不覆盖上次的结果
+            if not self.stream_final_html(resp, require_channels=strict):
+                return False
+
+            print("  ✅ 已保存最终HTML: final_frameset_builder.html")
+            return True
 
         except Exception as e:
             print(f"  ❌ 重定向链处理异常: {e}")
@@ -487,37 +728,128 @@ class GZITVHTMLFetcher:
             traceback.print_exc()
             return False
 
+    def export_session_state(self, authenticated_at: Optional[float] = None) -> Dict:
+        """导出当前会话，用于写入会话缓存"""
+        return {
+            'user_id': self.config['user_id'],
+            'auth_base_url': self.config['base_url'],
+            'token': self.current_token,
+            'expires_at': self.token_expires_at,
+            'jsessionid': self.jsessionid,
+            'current_base_url': self.current_base_url,
+            'epg_url': self.epg_url,
+            'hw_page_url': self.hw_page_url,
+            'cookies': dump_cookies(self.session.cookies),
+            'authenticated_at': authenticated_at or time.time(),
+        }
+
+    def restore_session_state(self, state: Dict):
+        """从会话缓存恢复Token、Cookie和EPG地址"""
+        self.current_token = state['token']
+        self.token_expires_at = state.get('expires_at')
+        self.jsessionid = state.get('jsessionid')
+        self.current_base_url = state['current_base_url']
+        self.epg_url = state.get('epg_url')
+        self.hw_page_url = state.get('hw_page_url')
+        restore_cookies(self.session.cookies, state['cookies'])
+
+    def reset_session_state(self):
+        """清除会话状态，准备重新认证"""
+        self.session.cookies.clear()
+        self.session.headers.pop('Referer', None)
+        self.current_token = None
+        self.token_expires_at = None
+        self.jsessionid = None
+        self.current_base_url = None
+        self.epg_url = None
+        self.hw_page_url = None
+
+    def try_warm_start(self) -> bool:
+        """使用缓存的会话直接执行步骤4，缓存不可用或被服务器拒绝时返回False"""
+        if not self.session_cache:
+            return False
+
+        state = self.session_cache.load(self.config['user_id'], self.config['base_url'])
+        if not state:
+            return False
+
+        print("\n" + "=" * 70)
+        print("热启动: 使用缓存的会话")
+        print("=" * 70)
+        print(f"  UserToken: {state['token'][:30]}...")
+
+        self.restore_session_state(state)
+        if self.step4_handle_redirect_chain(strict=True):
+            # Token有效期从认证时算起，只更新Cookie
+            self.session_cache.save(self.export_session_state(state['authenticated_at']))
+            return True
+
+        print("\n⚠️ 缓存的会话已被服务器拒绝，执行完整认证流程")
+        self.session_cache.clear()
+        self.reset_session_state()
+        return False
+
+    def print_summary(self):
+        """打印生成的文件和下一步说明"""
+        print("\n" + "=" * 70)
+        print("🎉 恭喜！最终HTML获取成功！")
+        print("=" * 70)
+        print("\n📁 生成的文件:")
+        print("  final_frameset_builder.html - 包含频道数据的最终HTML(UTF-8)")
+        if self.debug_store:
+            print(f"  {self.debug_store.root}/ - 各步骤的原始响应（压缩存储）")
+            print("\n⚠️ 注意:")
+            print("  如果final_frameset_builder.html仍有乱码，可导出原始响应对比:")
+            print(f"  python debug_store.py {self.debug_store.root} --export {self.debug_store.run_id} <目录>")
+        print("\n🔧 下一步:")
+        print("  请使用 To_M3U.py 从 final_frameset_builder.html 中提取频道数据")
+
     def run(self):
         """运行完整流程"""
         print("\n🚀 开始执行完整流程...")
+        if self.debug_store:
+            self.debug_store.begin_run()
+        self.transport.start_run()
 
         try:
+            # 会话缓存有效时直接获取最终HTML（热启动只执行步骤4，计入 redirect-chain 阶段）
+            with self.profiler.stage('redirect-chain'):
+                warm = self.try_warm_start()
+            if warm:
+                self.print_summary()
+                return True
+
             # 步骤1: 认证
             print("\n" + "=" * 70)
             print("步骤1: 认证")
             print("=" * 70)
 
-            auth_ok, epg_url = self.step1_complete_authentication()
+            with self.profiler.stage('auth'):
+                auth_ok, epg_url = self.step1_complete_authentication()
             if not auth_ok:
                 print("\n❌ 认证失败")
                 return False
+            self.epg_url = epg_url
 
             # 步骤2: 导航
             print("\n" + "=" * 70)
             print("步骤2: 导航")
             print("=" * 70)
 
-            nav_ok, hw_page_url, hw_page_content = self.step2_navigate_to_hardware_page(epg_url)
+            with self.profiler.stage('navigate'):
+                nav_ok, hw_page_url, hw_page_content = self.step2_navigate_to_hardware_page(epg_url)
             if not nav_ok:
                 print("\n❌ 导航失败")
                 return False
+            self.hw_page_url = hw_page_url
 
             # 步骤3: 硬件认证
             print("\n" + "=" * 70)
             print("步骤3: 硬件认证")
             print("=" * 70)
 
-            hw_ok, next_url = self.step3_submit_hardware_with_mac(hw_page_url, hw_page_content)
+            with self.profiler.stage('hardware'):
+                hw_ok, next_url = self.step3_submit_hardware_with_mac(hw_page_url, hw_page_content)
             if not hw_ok:
                 print("\n❌ 硬件认证失败")
                 return False
@@ -527,24 +859,17 @@ class GZITVHTMLFetcher:
             print("步骤4: 处理重定向链并获取最终HTML")
             print("=" * 70)
 
-            redirect_ok = self.step4_handle_redirect_chain()
+            with self.profiler.stage('redirect-chain'):
+                redirect_ok = self.step4_handle_redirect_chain()
             if not redirect_ok:
                 print("\n❌ 重定向链处理失败")
                 return False
 
-            print("\n" + "=" * 70)
-            print("🎉 恭喜！最终HTML获取成功！")
-            print("=" * 70)
-            print("\n📁 生成的文件:")
-            print("  1. final_frameset_builder.html - 包含频道数据的最终HTML(UTF-8)")
-            print("  2. final_frameset_builder_gbk.html - GBK编码版本用于对比")
-            print("  3. 其他步骤的HTML文件用于调试")
-            print("\n⚠️ 注意:")
-            print("  如果final_frameset_builder.html仍有乱码，请尝试使用")
-            print("  final_frameset_builder_gbk.html 进行提取")
-            print("\n🔧 下一步:")
-            print("  请使用单独的脚本从 final_frameset_builder.html 或")
-            print("  final_frameset_builder_gbk.html 中提取频道数据")
+            if self.session_cache:
+                with self.profiler.stage('save'):
+                    self.session_cache.save(self.export_session_state())
+
+            self.print_summary()
             return True
 
         except Exception as e:
@@ -553,6 +878,11 @@ class GZITVHTMLFetcher:
             traceback.print_exc()
             return False
 
+        finally:
+            self.transport.end_run()
+            if self.debug_store:
+                self.debug_store.flush()
+
 
 def main():
     print("\n⚠️ 重要提醒:")
@@ -560,25 +890,36 @@ def main():
     print("  2. 脚本使用真实MAC地址: 18:5e:0b:93:f4:4c")
     print("  3. 如果authenticator过期，请从最新抓包更新")
     print("  4. 此脚本只获取HTML，不提取频道数据")
-    print("  5. 会自动检测编码并生成UTF-8和GBK两个版本")
+    print("  5. 会自动检测编码并生成UTF-8版本")
+    print("  6. 设置环境变量 GZITV_DEBUG_DIR 可保存各步骤的原始响应用于调试")
+
+    debug_dir = os.environ.get('GZITV_DEBUG_DIR')
+    debug_store = GZITVDebugStore(debug_dir) if debug_dir else None
+
+    # --profile[=目录]: 分阶段性能分析，结果默认保存到 profile/
+    profiler = create_profiler(profile_dir_from_argv(sys.argv[1:]))
+
+    fetcher = GZITVHTMLFetcher(session_cache=GZITVSessionCache(), debug_store=debug_store,
+                               redirect_chain=GZITVRedirectChain(), profiler=profiler)
 
     print(f"\n📋 使用的参数:")
-    print(f"  用户ID: {GZITVHTMLFetcher().config['user_id']}")
-    print(f"  MAC地址: {GZITVHTMLFetcher().hardware_params['stbmac']}")
-    print(f"  机顶盒型号: {GZITVHTMLFetcher().hardware_params['stbtype']}")
+    print(f"  用户ID: {fetcher.config['user_id']}")
+    print(f"  MAC地址: {fetcher.hardware_params['stbmac']}")
+    print(f"  机顶盒型号: {fetcher.hardware_params['stbtype']}")
 
     input("\n按Enter键开始执行...")
 
-    fetcher = GZITVHTMLFetcher()
     success = fetcher.run()
+    if debug_store:
+        debug_store.close()
+    profiler.save()
 
     if success:
         print(f"\n✨ 任务完成！")
         print(f"   请在当前目录查看生成的 final_frameset_builder.html 文件")
-        print(f"   如果仍有乱码，请尝试 final_frameset_builder_gbk.html")
     else:
         print(f"\n❌ 任务失败，请检查错误信息")
-        print(f"   请查看保存的HTML文件以调试")
+        print(f"   设置 GZITV_DEBUG_DIR 后重新运行，可查看各步骤的原始响应")
 
     sys.exit(0 if success else 1)
 
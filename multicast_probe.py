@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - 组播存活探测
+加入频道的组播组，在限定并发和超时内检查是否收到RTP/TS数据并估算码率，
+结果写回频道表，失效频道可以标记或从播放列表中删除。
+所有套接字由一个selectors循环处理，探测数百个组播组的总耗时约为 组数/并发数 × 超时
+
+本地测试: python multicast_probe.py --send-test 20
+"""
+
+import argparse
+import json
+import selectors
+import socket
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from channel_table import Channel, ChannelTable
+
+TS_PACKET_SIZE = 188
+TS_SYNC_BYTE = 0x47
+# RTP负载类型33为MPEG-2 TS
+RTP_PAYLOAD_MP2T = 33
+RTP_HEADER_SIZE = 12
+
+RECV_BUFFER_BYTES = 2048
+
+# 失效频道被标记时移入的分类
+DEAD_CATEGORY = '失效'
+
+
+@dataclass
+class ProbeResult:
+    """一个组播组的探测结果"""
+    multicast: str
+    alive: bool = False
+    payload: Optional[str] = None
+    packets: int = 0
+    bytes: int = 0
+    bitrate_kbps: float = 0.0
+    first_packet_ms: Optional[float] = None
+    error: Optional[str] = None
+    checked_at: float = 0.0
+    # 是否已加入组播组；打开套接字或加入组失败时为False
+    joined: bool = False
+
+    @property
+    def dead(self) -> bool:
+        """加入组播组后超时内没有收到RTP/TS数据；出错的结果无法判断，不算失效"""
+        return self.joined and not self.alive and self.error is None
+
+
+def detect_payload(data: bytes) -> str:
+    """判断数据包格式: rtp（RTP封装的TS）、ts（裸UDP的TS）或 unknown"""
+    if len(data) >= TS_PACKET_SIZE and data[0] == TS_SYNC_BYTE and len(data) % TS_PACKET_SIZE == 0:
+        return 'ts'
+    if len(data) > RTP_HEADER_SIZE and data[0] >> 6 == 2:
+        # 跳过CSRC列表，负载应以TS同步字节开头
+        offset = RTP_HEADER_SIZE + (data[0] & 0x0F) * 4
+        if (data[1] & 0x7F) == RTP_PAYLOAD_MP2T or (offset < len(data) and data[offset] == TS_SYNC_BYTE):
+            return 'rtp'
+    return 'unknown'
+
+
+class ProbeState:
+    """一个正在探测的组播组"""
+
+    __slots__ = ('result', 'sock', 'started', 'first_packet', 'deadline')
+
+    def __init__(self, result: ProbeResult, sock: socket.socket, started: float, timeout: float):
+        self.result = result
+        self.sock = sock
+        self.started = started
+        self.first_packet: Optional[float] = None
+        self.deadline = started + timeout
+
+
+class GZIPTVMulticastProber:
+    def __init__(self, interface: str = '0.0.0.0', max_concurrency: int = 64,
+                 timeout: float = 2.0, sample_time: float = 1.0):
+        # 加入组播组使用的本机接口地址（IPTV专网网卡的IP）
+        self.interface = interface
+        self.max_concurrency = max_concurrency
+        # 等待第一个数据包的时间，以及收到后用于估算码率的采样时间
+        self.timeout = timeout
+        self.sample_time = sample_time
+
+    def open_socket(self, ip: str, port: int) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+            # 绑定组播地址只接收该组的数据（同一端口上的其他组不会混进来）；Windows只能绑定任意地址
+            sock.bind(('' if sys.platform == 'win32' else ip, port))
+            membership = socket.inet_aton(ip) + socket.inet_aton(self.interface)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+            sock.setblocking(False)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def finish(self, selector: selectors.BaseSelector, state: ProbeState, now: float):
+        result = state.result
+        if state.first_packet is not None:
+            result.first_packet_ms = round((state.first_packet - state.started) * 1000, 1)
+            elapsed = now - state.first_packet
+            if elapsed > 0 and result.packets > 1:
+                result.bitrate_kbps = round(result.bytes * 8 / elapsed / 1000, 1)
+        result.alive = result.packets > 0 and result.payload in ('rtp', 'ts')
+        result.checked_at = time.time()
+
+        selector.unregister(state.sock)
+        state.sock.close()
+
+    def probe_groups(self, groups: List[Tuple[str, int]]) -> Dict[str, ProbeResult]:
+        """探测组播组，返回 {ip:端口: 结果}"""
+        results: Dict[str, ProbeResult] = {}
+        queue = list(dict.fromkeys(groups))
+        queue.reverse()
+        selector = selectors.DefaultSelector()
+        active: Dict[socket.socket, ProbeState] = {}
+
+        try:
+            while queue or active:
+                # 补足并发
+                while queue and len(active) < self.max_concurrency:
+                    ip, port = queue.pop()
+                    result = ProbeResult(f"{ip}:{port}")
+                    results[result.multicast] = result
+                    try:
+                        sock = self.open_socket(ip, port)
+                    except OSError as e:
+                        result.error = str(e)
+                        result.checked_at = time.time()
+                        continue
+                    result.joined = True
+                    active[sock] = ProbeState(result, sock, time.monotonic(), self.timeout)
+                    selector.register(sock, selectors.EVENT_READ)
+
+                if not active:
+                    continue
+
+                now = time.monotonic()
+                wait = max(0.0, min(state.deadline for state in active.values()) - now)
+                for key, _ in selector.select(wait):
+                    state = active[key.fileobj]
+                    while True:
+                        try:
+                            data = state.sock.recv(RECV_BUFFER_BYTES)
+                        except (BlockingIOError, InterruptedError):
+                            break
+                        except OSError as e:
+                            state.result.error = str(e)
+                            break
+
+                        result = state.result
+                        if state.first_packet is None:
+                            state.first_packet = time.monotonic()
+                            state.deadline = state.first_packet + self.sample_time
+                            result.payload = detect_payload(data)
+                        else:
+                            # 码率从第一个包之后开始计算
+                            result.bytes += len(data)
+                        result.packets += 1
+
+                now = time.monotonic()
+                for sock, state in list(active.items()):
+                    if now >= state.deadline or state.result.error:
+                        self.finish(selector, state, now)
+                        del active[sock]
+        finally:
+            for state in active.values():
+                state.sock.close()
+            selector.close()
+
+        return results
+
+    def probe(self, channels: Iterable[Channel]) -> Dict[str, ProbeResult]:
+        """探测频道使用的所有组播组（相同的组只探测一次）"""
+        groups = [(channel.ip, channel.port) for channel in channels
+                  if channel.port is not None and channel.address is not None]
+        return self.probe_groups(groups)
+
+
+def apply_results(table: ChannelTable, results: Dict[str, ProbeResult], mode: str = 'flag',
+                  sort_key: Callable[[str, str], tuple] = lambda name, category: (name,)) -> Tuple[int, int]:
+    """把探测结果写回频道表，返回 (失效频道数, 无法判断的频道数)
+
+    mode='flag' 把失效频道移入"失效"分类（sort_key 重新计算排序键），mode='drop' 从表中删除；
+    只有加入组播组后超时内没有收到RTP/TS数据的频道算失效，探测出错（例如网卡地址不对、加入组失败）
+    和没有探测结果的频道保持不变
+    """
+    dead = []
+    unknown = 0
+    for channel in table:
+        result = results.get(channel.multicast or '')
+        if result is None:
+            continue
+        if not result.alive and not result.dead:
+            unknown += 1
+            continue
+        channel.alive = result.alive
+        if result.dead:
+            dead.append(channel)
+
+    if mode == 'drop':
+        table.remove_where(lambda channel: channel.alive is False)
+    else:
+        for channel in dead:
+            channel.category = DEAD_CATEGORY
+            channel.sort_key = sort_key(channel.name, DEAD_CATEGORY)
+        if dead:
+            table.invalidate()
+    return len(dead), unknown
+
+
+def save_results(results: Dict[str, ProbeResult], path: str = 'probe_results.json'):
+    from playlist_snapshot import atomic_write_text
+
+    data = {multicast: asdict(result) for multicast, result in results.items()}
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=1))
+
+
+def print_results(results: Dict[str, ProbeResult], elapsed: float):
+    alive = [result for result in results.values() if result.alive]
+    errors = [result for result in results.values() if not result.alive and not result.dead]
+    print(f"\n📡 探测 {len(results)} 个组播组，存活 {len(alive)} 个，无法判断 {len(errors)} 个，用时 {elapsed:.1f}s")
+    for result in sorted(results.values(), key=lambda r: (r.alive, r.multicast)):
+        if result.alive:
+            continue
+        if result.dead:
+            print(f"  ❌ {result.multicast}: {'格式未知' if result.packets else '无数据'}")
+        else:
+            print(f"  ❔ {result.multicast}: {result.error}")
+
+
+class MulticastTestSender:
+    """本地回环组播发送器：向给定的组播组循环发送RTP或裸UDP的TS包，用于测试探测器"""
+
+    def __init__(self, groups: List[Tuple[str, int]], payload: str = 'rtp', packets_per_second: int = 200,
+                 interface: str = '127.0.0.1'):
+        self.groups = groups
+        self.payload = payload
+        self.interval = 1 / packets_per_second
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 0)
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def packet(self, sequence: int) -> bytes:
+        ts = bytes([TS_SYNC_BYTE]) + bytes(TS_PACKET_SIZE - 1)
+        if self.payload == 'ts':
+            return ts * 7
+        header = bytes([0x80, RTP_PAYLOAD_MP2T]) + (sequence & 0xFFFF).to_bytes(2, 'big') + bytes(8)
+        return header + ts * 7
+
+    def send_loop(self):
+        sequence = 0
+        while not self.stop_event.is_set():
+            data = self.packet(sequence)
+            for group in self.groups:
+                self.sock.sendto(data, group)
+            sequence += 1
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.send_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='贵州电信IPTV 组播存活探测')
+    parser.add_argument('--html', default='final_frameset_builder.html', help='包含频道数据的HTML文件')
+    parser.add_argument('--interface', default='0.0.0.0', help='IPTV专网网卡的IP地址')
+    parser.add_argument('--concurrency', type=int, default=64, help='同时探测的组播组数')
+    parser.add_argument('--timeout', type=float, default=2.0, help='等待第一个数据包的时间（秒）')
+    parser.add_argument('--sample', type=float, default=1.0, help='估算码率的采样时间（秒）')
+    parser.add_argument('--output', default='probe_results.json', help='探测结果文件')
+    parser.add_argument('--send-test', type=int, metavar='N',
+                        help='本地测试：在回环接口上发送N个组播组（其中一半发送数据），然后探测')
+    args = parser.parse_args()
+
+    if args.send_test:
+        groups = [(f"239.255.{i // 250}.{i % 250 + 1}", 5000 + i) for i in range(args.send_test)]
+        sender = MulticastTestSender(groups[::2])
+        sender.start()
+        prober = GZIPTVMulticastProber('127.0.0.1', args.concurrency, args.timeout, args.sample)
+        start = time.monotonic()
+        try:
+            results = prober.probe_groups(groups)
+        finally:
+            sender.stop()
+        print_results(results, time.monotonic() - start)
+        return
+
+    from To_M3U import GZIPTVM3UGenerator
+
+    generator = GZIPTVM3UGenerator(args.html)
+    if not generator.parse_html():
+        sys.exit(1)
+
+    prober = GZIPTVMulticastProber(args.interface, args.concurrency, args.timeout, args.sample)
+    start = time.monotonic()
+    results = prober.probe(generator.channels)
+    print_results(results, time.monotonic() - start)
+    save_results(results, args.output)
+    print(f"💾 探测结果已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
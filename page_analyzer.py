@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - 页面分析
+对EPG页面做一次线性扫描，同时提取CTCSetConfig配置、表单及其输入项、JavaScript重定向和页面类型标记
+"""
+
+import html
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+# 页面类型标记
+PAGE_MARKERS = ('funcportalauth.jsp', 'stbinfo', 'gotoEPG()', 'skipFrame', 'setInfoForFatClient', 'frame.jsp')
+MARKER_ALTERNATION = '|'.join(re.escape(marker) for marker in PAGE_MARKERS)
+
+# 一个正则完成全部扫描：各分支互斥，finditer从左到右只走一遍页面
+TOKEN_PATTERN = re.compile(r'''
+    (?P<form_open>(?i:<form\b[^>]*>))
+  | (?P<form_close>(?i:</form\s*>))
+  | (?P<input>(?i:<input\b[^>]*>))
+  | CTCSetConfig\s*\(\s*['"](?P<config_key>\w+)['"][^,]*,\s*['"](?P<config_value>[^'"]*)['"]
+  | (?:top\.document|top|document|window)\.location(?:\.href)?\s*=\s*['"](?P<redirect>[^'"]+)['"]
+  | (?P<marker>''' + MARKER_ALTERNATION + ''')
+''', re.VERBOSE)
+
+# 标签、配置、重定向中也可能包含页面标记（如 <input name="stbinfo">）
+MARKER_PATTERN = re.compile(MARKER_ALTERNATION)
+
+ATTR_PATTERN = re.compile(r'''([\w:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))''')
+CHECKED_PATTERN = re.compile(r'\schecked\b', re.IGNORECASE)
+
+# 硬件认证页面的标记
+HARDWARE_AUTH_MARKERS = {'funcportalauth.jsp', 'stbinfo', 'gotoEPG()'}
+
+# 浏览器提交表单时不会包含的输入类型
+UNSUBMITTED_INPUT_TYPES = {'submit', 'button', 'reset', 'image', 'file'}
+
+
+@dataclass
+class FormInfo:
+    """页面中的一个表单"""
+    action: Optional[str]
+    method: str
+    inputs: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class PageAnalysis:
+    """页面分析结果"""
+    config: Dict[str, str] = field(default_factory=dict)
+    forms: List[FormInfo] = field(default_factory=list)
+    redirects: List[str] = field(default_factory=list)
+    markers: Set[str] = field(default_factory=set)
+
+    @property
+    def is_hardware_auth_page(self) -> bool:
+        return bool(self.markers & HARDWARE_AUTH_MARKERS)
+
+    @property
+    def needs_frame_redirect(self) -> bool:
+        """硬件认证响应中包含 skipFrame/setInfoForFatClient，需要继续访问frame.jsp"""
+        return 'skipFrame' in self.markers or 'setInfoForFatClient' in self.markers
+
+    def first_form(self) -> Tuple[Optional[str], Optional[Dict[str, str]]]:
+        """第一个带action的表单，返回 (action, 输入项)"""
+        for form in self.forms:
+            if form.action:
+                return form.action, dict(form.inputs)
+        return None, None
+
+
+def parse_attributes(tag: str) -> Dict[str, str]:
+    """解析标签属性，属性名转为小写，值做HTML解码"""
+    attributes = {}
+    for name, double_quoted, single_quoted, bare in ATTR_PATTERN.findall(tag):
+        name = name.lower()
+        if name not in attributes:
+            attributes[name] = html.unescape(double_quoted or single_quoted or bare)
+    return attributes
+
+
+def analyze_page(content: str) -> PageAnalysis:
+    """单次扫描页面，返回结构化结果"""
+    analysis = PageAnalysis()
+    current_form: Optional[FormInfo] = None
+
+    for match in TOKEN_PATTERN.finditer(content):
+        kind = match.lastgroup
+
+        if kind == 'marker':
+            analysis.markers.add(match.group('marker'))
+            continue
+
+        analysis.markers.update(MARKER_PATTERN.findall(match.group(0)))
+
+        if kind == 'form_open':
+            attributes = parse_attributes(match.group('form_open')[5:])
+            current_form = FormInfo(action=attributes.get('action') or None,
+                                    method=attributes.get('method', 'get').lower())
+            analysis.forms.append(current_form)
+
+        elif kind == 'form_close':
+            current_form = None
+
+        elif kind == 'input':
+            if current_form is None:
+                continue
+            attributes = parse_attributes(match.group('input')[6:])
+            name = attributes.get('name')
+            input_type = attributes.get('type', 'text').lower()
+            if not name or input_type in UNSUBMITTED_INPUT_TYPES:
+                continue
+            if input_type in ('checkbox', 'radio'):
+                if not CHECKED_PATTERN.search(match.group('input')):
+                    continue
+                current_form.inputs[name] = attributes.get('value', 'on')
+            else:
+                current_form.inputs[name] = attributes.get('value', '')
+
+        elif kind == 'config_value':
+            # 同一配置项出现多次时取第一个非空值（页面常先用空值占位再赋值）
+            value = match.group('config_value')
+            if value:
+                analysis.config.setdefault(match.group('config_key'), value)
+
+        elif kind == 'redirect':
+            analysis.redirects.append(match.group('redirect'))
+
+    return analysis
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - 拼音首字母表
+覆盖CJK统一表意文字区（U+4E00–U+9FFF）的每个汉字，数据文件中每个字占一个字节，
+按码位直接下标查找；首次使用时加载，之后所有排序共用同一份表
+
+重新生成数据文件（需要 pypinyin）: python pinyin_table.py --generate
+"""
+
+import os
+import sys
+from typing import Optional
+
+CJK_START = 0x4E00
+CJK_END = 0x9FFF
+
+TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pinyin_initials.dat')
+
+# 没有拼音的字在表中记为 '?'
+UNKNOWN = ord('?')
+
+# 多音字在频道名和地名中的读音，覆盖 pypinyin 的默认读音
+OVERRIDES = {
+    '重': 'C',  # 重庆、重温经典
+    '长': 'C',  # 长沙、长春、长治
+    '厦': 'X',  # 厦门
+    '藏': 'Z',  # 西藏、藏语
+    '番': 'P',  # 番禺
+    '蔚': 'Y',  # 蔚县
+    '尉': 'Y',  # 尉氏
+    '浚': 'X',  # 浚县
+    '莘': 'S',  # 莘县
+    '铅': 'Y',  # 铅山
+    '六': 'L',  # 六盘水、六安
+    '乐': 'L',  # 乐山
+}
+
+_table: Optional[bytes] = None
+
+
+def load_table() -> bytes:
+    global _table
+    if _table is None:
+        with open(TABLE_FILE, 'rb') as f:
+            table = f.read()
+        if len(table) != CJK_END - CJK_START + 1:
+            raise ValueError(f"拼音首字母表长度不正确: {TABLE_FILE}")
+        _table = table
+    return _table
+
+
+def pinyin_initial(char: str) -> Optional[str]:
+    """汉字的拼音首字母（大写），不在表中或没有拼音时返回None"""
+    code = ord(char) - CJK_START
+    if code < 0 or code > CJK_END - CJK_START:
+        return None
+    initial = (_table or load_table())[code]
+    if initial == UNKNOWN:
+        return None
+    return chr(initial)
+
+
+def generate(path: str = TABLE_FILE):
+    """用 pypinyin 逐字生成数据文件"""
+    from pypinyin import Style, lazy_pinyin
+
+    table = bytearray()
+    for code in range(CJK_START, CJK_END + 1):
+        char = chr(code)
+        initial = OVERRIDES.get(char)
+        if initial is None:
+            letters = lazy_pinyin(char, style=Style.FIRST_LETTER, errors=lambda _: ['?'])
+            initial = letters[0][:1].upper() if letters else '?'
+        table.append(ord(initial) if 'A' <= initial <= 'Z' else UNKNOWN)
+
+    with open(path, 'wb') as f:
+        f.write(bytes(table))
+    missing = table.count(UNKNOWN)
+    print(f"💾 拼音首字母表已保存: {path} ({len(table)} 字，{missing} 个无拼音)")
+
+
+if __name__ == "__main__":
+    if '--generate' in sys.argv[1:]:
+        generate()
+    else:
+        for text in sys.argv[1:]:
+            print(f"  {text} -> {''.join(pinyin_initial(char) or char for char in text)}")
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - 播放列表渲染
+按分类顺序遍历一次排好序的频道，同时写入多个输出格式（M3U、详细信息、JSON、DIYP/TXT、XSPF），
+播放地址每个频道只计算一次；输出带缓冲逐条写入，可选gzip压缩，写完后原子替换
+"""
+
+import gzip
+import io
+import json
+import os
+from contextlib import ExitStack, contextmanager
+from typing import IO, Dict, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from channel_table import Channel
+from playlist_snapshot import atomic_open
+
+# 输出文件的写缓冲大小
+WRITE_BUFFER_BYTES = 64 * 1024
+
+# 默认FCC服务器地址
+DEFAULT_FCC = '10.255.5.32:8027'
+
+
+def escape(text: str) -> str:
+    """XML文本转义（xml.sax.saxutils 会连带导入 urllib.request，启动时较慢）"""
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+class PlaylistSink:
+    """输出格式的基类：渲染器依次调用 begin / category / channel / end
+
+    play_url 为None表示该频道没有有效的组播地址，只有详细信息会列出这样的频道
+    """
+
+    name = ''
+    default_filename = ''
+    description = ''
+
+    def __init__(self, filename: Optional[str] = None, compress: bool = False):
+        self.filename = filename or self.default_filename
+        self.compress = compress
+        if compress and not self.filename.endswith('.gz'):
+            self.filename += '.gz'
+
+    def begin(self, out: TextIO, renderer: 'GZIPTVPlaylistRenderer'):
+        pass
+
+    def category(self, out: TextIO, category: str, channels: List[Channel]):
+        pass
+
+    def channel(self, out: TextIO, index: int, channel: Channel, play_url: Optional[str],
+                catchup_source: Optional[str]):
+        pass
+
+    def end(self, out: TextIO):
+        pass
+
+
+class M3USink(PlaylistSink):
+    name = 'm3u'
+    default_filename = 'iptv_channels.m3u'
+    description = 'M3U播放列表'
+
+    def begin(self, out, renderer):
+        # 有节目单时在文件头引用XMLTV文件，频道用tvg-id关联节目单中的频道
+        self.epg = bool(renderer.epg_url)
+        self.renderer = renderer
+        if self.epg:
+            out.write(f'#EXTM3U x-tvg-url="{renderer.epg_url}"')
+        else:
+            out.write('#EXTM3U')
+
+    def category(self, out, category, channels):
+        self.group = category
+        out.write(f'\n\n# 分类: {category}')
+
+    def channel(self, out, index, channel, play_url, catchup_source):
+        if play_url is None:
+            return
+
+        extinf_parts = [
+            f'#EXTINF:-1',
+            f'tvg-name="{channel.name}"',
+            f'category="贵州电信iptv"',
+            f'group-title="{self.group}"'
+        ]
+        if self.epg:
+            extinf_parts.insert(1, f'tvg-id="{self.renderer.tvg_id(channel)}"')
+
+        # 如果有rtsp链接，添加时移信息
+        if catchup_source:
+            extinf_parts.append(f'catchup="default"')
+            extinf_parts.append(f'catchup-source="{catchup_source}"')
+
+        out.write('\n' + ' '.join(extinf_parts) + f',{channel.name}\n{play_url}')
+
+
+class DetailsSink(PlaylistSink):
+    name = 'details'
+    default_filename = 'channels_detail.txt'
+    description = '频道详细信息'
+
+    def begin(self, out, renderer):
+        out.write("贵州电信IPTV频道列表\n")
+        out.write("=" * 70 + "\n\n")
+
+    def category(self, out, category, channels):
+        out.write(f"\n【{category}】({len(channels)}个)\n")
+        out.write("-" * 70 + "\n")
+
+    def channel(self, out, index, channel, play_url, catchup_source):
+        out.write(f"{index + 1:3d}. {channel.name}\n")
+        out.write(f"     原名称: {channel.original_name}\n")
+        out.write(f"     组播地址: {channel.igmp_url}\n")
+        if channel.rtsp_url:
+            out.write(f"     时移地址: {channel.rtsp_url}\n")
+        out.write("\n")
+
+
+class JSONSink(PlaylistSink):
+    name = 'json'
+    default_filename = 'iptv_channels.json'
+    description = 'JSON频道列表'
+
+    def begin(self, out, renderer):
+        self.first = True
+        out.write('{"udpxy_url": ' + json.dumps(renderer.udpxy_url, ensure_ascii=False) + ', "channels": [')
+
+    def channel(self, out, index, channel, play_url, catchup_source):
+        if play_url is None:
+            return
+        record = {
+            'name': channel.name,
+            'category': channel.category,
+            'url': play_url,
+            'igmp_url': channel.igmp_url,
+            'rtsp_url': channel.rtsp_url,
+            'catchup_source': catchup_source,
+        }
+        out.write(('\n  ' if self.first else ',\n  ') + json.dumps(record, ensure_ascii=False))
+        self.first = False
+
+    def end(self, out):
+        out.write('\n]}\n')
+
+
+class DIYPSink(PlaylistSink):
+    """DIYP/TXT格式: 分类,#genre# 后跟 名称,地址"""
+
+    name = 'txt'
+    default_filename = 'iptv_channels.txt'
+    description = 'DIYP/TXT播放列表'
+
+    def category(self, out, category, channels):
+        out.write(f"{category},#genre#\n")
+
+    def channel(self, out, index, channel, play_url, catchup_source):
+        if play_url is not None:
+            out.write(f"{channel.name},{play_url}\n")
+
+
+class XSPFSink(PlaylistSink):
+    name = 'xspf'
+    default_filename = 'iptv_channels.xspf'
+    description = 'XSPF播放列表'
+
+    def begin(self, out, renderer):
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                  '<playlist version="1" xmlns="http://xspf.org/ns/0/">\n'
+                  '  <title>贵州电信IPTV</title>\n'
+                  '  <trackList>\n')
+
+    def category(self, out, category, channels):
+        self.album = escape(category)
+
+    def channel(self, out, index, channel, play_url, catchup_source):
+        if play_url is None:
+            return
+        out.write(f'    <track>\n'
+                  f'      <location>{escape(play_url)}</location>\n'
+                  f'      <title>{escape(channel.name)}</title>\n'
+                  f'      <album>{self.album}</album>\n'
+                  f'    </track>\n')
+
+    def end(self, out):
+        out.write('  </trackList>\n</playlist>\n')
+
+
+# 可用的输出格式
+SINK_TYPES: Dict[str, type] = {sink.name: sink for sink in (M3USink, DetailsSink, JSONSink, DIYPSink, XSPFSink)}
+
+DEFAULT_FORMATS = ('m3u', 'details')
+
+
+def create_sinks(formats: Sequence[str], compress: bool = False, output_dir: str = '') -> List[PlaylistSink]:
+    """按格式名创建输出，文件写入 output_dir（默认当前目录）"""
+    sinks = []
+    for name in formats:
+        sink_type = SINK_TYPES.get(name)
+        if sink_type is None:
+            raise ValueError(f"未知的输出格式: {name}（可用: {', '.join(SINK_TYPES)}）")
+        sinks.append(sink_type(os.path.join(output_dir, sink_type.default_filename), compress=compress))
+    return sinks
+
+
+@contextmanager
+def open_output(filename: str, compress: bool = False,
+                deferred: Optional[List[Tuple[str, str]]] = None) -> Iterator[TextIO]:
+    """带缓冲的原子写入，compress=True 时写入gzip；deferred 的含义同 atomic_open"""
+    if not compress:
+        with atomic_open(filename, buffering=WRITE_BUFFER_BYTES, deferred=deferred) as f:
+            yield f
+        return
+
+    with atomic_open(filename, binary=True, buffering=WRITE_BUFFER_BYTES, deferred=deferred) as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as compressed:
+            with io.TextIOWrapper(compressed, encoding='utf-8') as f:
+                yield f
+
+
+class GZIPTVPlaylistRenderer:
+    def __init__(self, udpxy_url: str = "http://192.168.1.44:5140/rtp", fcc: Optional[str] = DEFAULT_FCC,
+                 fcc_selector=None, epg_url: Optional[str] = None,
+                 epg_ids: Optional[Dict[Tuple[str, Optional[str]], str]] = None):
+        self.udpxy_url = udpxy_url
+        self.fcc = fcc
+        # 节目单（XMLTV）的访问地址，写入M3U文件头的 x-tvg-url
+        self.epg_url = epg_url
+        # (频道原名称, 组播地址) -> ChannelID（epg_fetcher.load_channel_ids），即节目单中的频道ID
+        self.epg_ids = epg_ids or {}
+        # 指定 fcc_selector（fcc_selector.GZIPTVFCCSelector）时每个频道的FCC服务器由它选择
+        self.fcc_selector = fcc_selector
+
+    def play_url(self, channel: Channel) -> Optional[str]:
+        """UDPXY播放地址，没有有效组播地址时返回None"""
+        multicast = channel.multicast
+        if multicast is None:
+            return None
+        fcc = self.fcc_selector.endpoint_for(channel) if self.fcc_selector else self.fcc
+        if fcc:
+            return f"{self.udpxy_url}/{multicast}?fcc={fcc}"
+        return f"{self.udpxy_url}/{multicast}"
+
+    def tvg_id(self, channel: Channel) -> str:
+        """关联节目单的tvg-id，没有ChannelID时使用频道名称"""
+        return self.epg_ids.get((channel.original_name, channel.multicast), channel.name)
+
+    def catchup_source(self, channel: Channel) -> Optional[str]:
+        if not channel.rtsp_url:
+            return None
+        # 移除URL末尾的斜杠（如果有）
+        rtsp_url = channel.rtsp_url.rstrip('/')
+        return f"{rtsp_url}/?playseek=${{(b)yyyyMMddHHmmss}}-${{(e)yyyyMMddHHmmss}}"
+
+    def render_streams(self, groups: List[Tuple[str, List[Channel]]], outputs: List[Tuple[PlaylistSink, IO]]):
+        """遍历一次分组后的频道，同时写入所有输出"""
+        if self.fcc_selector:
+            self.fcc_selector.plan(groups)
+
+        for sink, out in outputs:
+            sink.begin(out, self)
+
+        for category, channels in groups:
+            for sink, out in outputs:
+                sink.category(out, category, channels)
+
+            for index, channel in enumerate(channels):
+                play_url = self.play_url(channel)
+                catchup_source = self.catchup_source(channel)
+                for sink, out in outputs:
+                    sink.channel(out, index, channel, play_url, catchup_source)
+
+        for sink, out in outputs:
+            sink.end(out)
+
+    def render(self, groups: List[Tuple[str, List[Channel]]], sinks: List[PlaylistSink]) -> List[str]:
+        """渲染到各输出文件的临时文件，全部写完后才依次替换目标文件，返回文件名；
+        任何一个输出失败时删除全部临时文件，目标文件都保持上一次的内容
+        """
+        written: List[Tuple[str, str]] = []
+        try:
+            with ExitStack() as stack:
+                outputs = [(sink, stack.enter_context(open_output(sink.filename, sink.compress, written)))
+                           for sink in sinks]
+                self.render_streams(groups, outputs)
+        except BaseException:
+            # 先关闭的输出可能已经写完，它们的临时文件也要删除
+            for tmp_path, _ in written:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+            raise
+
+        for tmp_path, path in written:
+            os.replace(tmp_path, path)
+        return [sink.filename for sink in sinks]
+
+    def render_text(self, groups: List[Tuple[str, List[Channel]]], sink: PlaylistSink) -> str:
+        """渲染为字符串"""
+        out = io.StringIO()
+        self.render_streams(groups, [(sink, out)])
+        return out.getvalue()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - 播放列表HTTP服务
+用内存中的频道表按请求参数渲染播放列表：?udpxy=代理地址&fcc=FCC服务器（fcc为空表示不加），
+渲染结果按 (格式, 参数, 频道集合版本) 放入LRU缓存，支持强ETag/If-None-Match和gzip，
+客户端轮询时绝大多数请求只需一次缓存查找
+
+用法: python playlist_server.py [--port 8081] [--html final_frameset_builder.html]
+访问: http://服务器:8081/playlist.m3u?udpxy=http://192.168.1.44:5140/rtp
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from channel_table import ChannelTable
+from playlist_render import DEFAULT_FCC, SINK_TYPES, GZIPTVPlaylistRenderer
+
+# 路径 -> (输出格式, Content-Type)
+ROUTES = {
+    '/playlist.m3u': ('m3u', 'audio/x-mpegurl; charset=utf-8'),
+    '/playlist.m3u8': ('m3u', 'application/vnd.apple.mpegurl; charset=utf-8'),
+    '/playlist.txt': ('txt', 'text/plain; charset=utf-8'),
+    '/playlist.json': ('json', 'application/json; charset=utf-8'),
+    '/playlist.xspf': ('xspf', 'application/xspf+xml; charset=utf-8'),
+    '/channels_detail.txt': ('details', 'text/plain; charset=utf-8'),
+}
+
+UDPXY_PATTERN = re.compile(r'https?://[^\s"\'<>?#]+')
+FCC_PATTERN = re.compile(r'[\w.-]+:\d{1,5}')
+MAX_PARAM_LENGTH = 256
+
+# 请求头大小上限和空闲连接超时
+MAX_HEADER_BYTES = 16 * 1024
+IDLE_TIMEOUT = 30
+
+STATUS_REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+                  405: 'Method Not Allowed', 503: 'Service Unavailable'}
+
+
+@dataclass
+class RenderedPlaylist:
+    """缓存的渲染结果，gzip压缩版本在第一次需要时生成"""
+    body: bytes
+    etag: str
+    content_type: str
+    gzip_body: Optional[bytes] = None
+
+    @property
+    def gzip_etag(self) -> str:
+        return self.etag[:-1] + '-gz"'
+
+    def compressed(self) -> bytes:
+        if self.gzip_body is None:
+            self.gzip_body = gzip.compress(self.body, 6, mtime=0)
+        return self.gzip_body
+
+
+class GZIPTVPlaylistServer:
+    def __init__(self, html_file: str = 'final_frameset_builder.html', host: str = '0.0.0.0', port: int = 8081,
+                 udpxy_url: str = "http://192.168.1.44:5140/rtp", fcc: Optional[str] = DEFAULT_FCC,
+                 cache_size: int = 256, reload_interval: float = 5):
+        self.html_file = html_file
+        self.host = host
+        self.port = port
+        self.default_udpxy = udpxy_url
+        self.default_fcc = fcc
+        self.cache_size = cache_size
+        self.reload_interval = reload_interval
+
+        self.channels = ChannelTable()
+        self.categories_order = []
+        # 频道集合版本：频道内容的摘要，内容相同的频道表版本相同
+        self.version = ''
+        self.loaded_mtime: Optional[float] = None
+
+        self.cache: 'OrderedDict[Tuple, RenderedPlaylist]' = OrderedDict()
+        # 正在渲染的请求，相同的并发请求共用一次渲染
+        self.pending: Dict[Tuple, asyncio.Future] = {}
+        self.stats = {'requests': 0, 'hits': 0, 'renders': 0, 'not_modified': 0}
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    def channels_version(self, channels: ChannelTable, categories_order) -> str:
+        """频道内容的摘要，作为频道集合版本"""
+        digest = hashlib.sha256()
+        for category, group in channels.ordered(categories_order):
+            for channel in group:
+                digest.update(f"{category}\0{channel.name}\0{channel.original_name}\0"
+                              f"{channel.igmp_url}\0{channel.rtsp_url}\n".encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    def set_channels(self, channels: ChannelTable, categories_order, version: Optional[str] = None):
+        """替换频道表（例如由刷新进程直接传入），版本变化后旧的缓存不再命中；需要在事件循环中调用"""
+        if version is None:
+            version = self.channels_version(channels, categories_order)
+        self.channels = channels
+        self.categories_order = list(categories_order)
+        if version != self.version:
+            self.version = version
+            self.cache.clear()
+
+    def read_html(self) -> Optional[Tuple[float, ChannelTable, List[str], str]]:
+        """HTML文件有变化时提取频道，返回 (修改时间, 频道表, 分类顺序, 版本)；在线程池中运行，不修改服务状态"""
+        try:
+            mtime = os.stat(self.html_file).st_mtime
+        except FileNotFoundError:
+            return None
+        if mtime == self.loaded_mtime:
+            return None
+
+        from To_M3U import GZIPTVM3UGenerator
+
+        generator = GZIPTVM3UGenerator(self.html_file)
+        if not generator.parse_html():
+            # 提取失败时保留当前频道表
+            print(f"⚠️ 加载 {self.html_file} 失败，继续使用版本 {self.version or '-'}")
+            return None
+        return (mtime, generator.channels, generator.categories_order,
+                self.channels_version(generator.channels, generator.categories_order))
+
+    async def load_html(self) -> bool:
+        """在线程池中解析HTML，解析结果回到事件循环中替换频道表"""
+        loop = asyncio.get_running_loop()
+        loaded = await loop.run_in_executor(None, self.read_html)
+        if loaded is None:
+            return False
+        mtime, channels, categories_order, version = loaded
+        self.set_channels(channels, categories_order, version)
+        self.loaded_mtime = mtime
+        print(f"📺 已加载 {len(self.channels)} 个频道 (版本 {self.version})")
+        return True
+
+    async def watch_html(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await self.load_html()
+
+    def render(self, fmt: str, content_type: str, udpxy_url: str, fcc: Optional[str]) -> RenderedPlaylist:
+        renderer = GZIPTVPlaylistRenderer(udpxy_url, fcc)
+        body = renderer.render_text(self.channels.ordered(self.categories_order), SINK_TYPES[fmt]()).encode('utf-8')
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        return RenderedPlaylist(body, etag, content_type)
+
+    async def get_playlist(self, fmt: str, content_type: str, udpxy_url: str,
+                           fcc: Optional[str]) -> RenderedPlaylist:
+        key = (fmt, udpxy_url, fcc, self.version)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.cache.move_to_end(key)
+            self.stats['hits'] += 1
+            return cached
+
+        future = self.pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(None, self.render, fmt, content_type, udpxy_url, fcc)
+            self.pending[key] = future
+            self.stats['renders'] += 1
+            try:
+                rendered = await future
+            finally:
+                del self.pending[key]
+
+            # 渲染期间频道表可能已更新，只缓存仍是当前版本的结果
+            if key[3] == self.version:
+                self.cache[key] = rendered
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+            return rendered
+
+        return await future
+
+    def parse_params(self, query: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """解析 udpxy/fcc 参数，返回 (udpxy地址, fcc, 错误信息)"""
+        params = parse_qs(query, keep_blank_values=True)
+        udpxy_url = params.get('udpxy', [self.default_udpxy])[-1].rstrip('/')
+        fcc = params.get('fcc', [self.default_fcc])[-1]
+
+        if len(udpxy_url) > MAX_PARAM_LENGTH or not UDPXY_PATTERN.fullmatch(udpxy_url):
+            return None, None, 'invalid udpxy'
+        if fcc in ('', 'none', None):
+            fcc = None
+        elif len(fcc) > MAX_PARAM_LENGTH or not FCC_PATTERN.fullmatch(fcc):
+            return None, None, 'invalid fcc'
+        return udpxy_url, fcc, None
+
+    async def handle_request(self, method: str, target: str, headers: Dict[str, str]) -> Tuple[int, Dict, bytes]:
+        self.stats['requests'] += 1
+        if method not in ('GET', 'HEAD'):
+            return 405, {'Allow': 'GET, HEAD'}, b''
+
+        url = urlsplit(target)
+        if url.path == '/status':
+            status = dict(self.stats, version=self.version, channels=len(self.channels), cached=len(self.cache))
+            return 200, {'Content-Type': 'application/json', 'Cache-Control': 'no-store'}, \
+                json.dumps(status).encode('utf-8')
+
+        route = ROUTES.get(url.path)
+        if route is None:
+            return 404, {'Content-Type': 'text/plain'}, b'not found'
+        if not self.version:
+            return 503, {'Content-Type': 'text/plain', 'Retry-After': '10'}, b'no channels loaded'
+
+        udpxy_url, fcc, error = self.parse_params(url.query)
+        if error:
+            return 400, {'Content-Type': 'text/plain'}, error.encode('ascii')
+
+        playlist = await self.get_playlist(route[0], route[1], udpxy_url, fcc)
+
+        use_gzip = 'gzip' in headers.get('accept-encoding', '')
+        etag = playlist.gzip_etag if use_gzip else playlist.etag
+        response_headers = {
+            'Content-Type': playlist.content_type,
+            'ETag': etag,
+            'Cache-Control': 'no-cache',
+            'Vary': 'Accept-Encoding',
+        }
+
+        if_none_match = headers.get('if-none-match')
+        if if_none_match:
+            tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+            # 只与本次返回的变体（原始或gzip）的ETag比较
+            if '*' in tags or etag in tags:
+                self.stats['not_modified'] += 1
+                return 304, response_headers, b''
+
+        if use_gzip:
+            response_headers['Content-Encoding'] = 'gzip'
+            return 200, response_headers, playlist.compressed()
+        return 200, response_headers, playlist.body
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), IDLE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError,
+                        ConnectionError):
+                    return
+
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ')
+                except ValueError:
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    name, sep, value = line.partition(':')
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+
+                status, response_headers, body = await self.handle_request(method, target, headers)
+
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' and (version == 'HTTP/1.1' or connection == 'keep-alive')
+
+                response = [f"HTTP/1.1 {status} {STATUS_REASONS.get(status, '')}"]
+                response += [f"{name}: {value}" for name, value in response_headers.items()]
+                response.append(f"Content-Length: {len(body)}")
+                response.append('Connection: keep-alive' if keep_alive else 'Connection: close')
+                writer.write(('\r\n'.join(response) + '\r\n\r\n').encode('latin-1'))
+                if method != 'HEAD' and status != 304:
+                    writer.write(body)
+                await writer.drain()
+
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+
+    async def start(self):
+        await self.load_html()
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port,
+                                                 limit=MAX_HEADER_BYTES)
+        self.port = self.server.sockets[0].getsockname()[1]
+        if self.html_file and self.reload_interval > 0:
+            asyncio.create_task(self.watch_html())
+        print(f"🌐 播放列表服务: http://{self.host}:{self.port}/playlist.m3u")
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='贵州电信IPTV 播放列表HTTP服务')
+    parser.add_argument('--html', default='final_frameset_builder.html', help='包含频道数据的HTML文件')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--udpxy', default="http://192.168.1.44:5140/rtp", help='未指定udpxy参数时的代理地址')
+    parser.add_argument('--fcc', default=DEFAULT_FCC, help='未指定fcc参数时的FCC服务器，空字符串表示不加')
+    parser.add_argument('--cache-size', type=int, default=256, help='缓存的渲染结果数量')
+    parser.add_argument('--reload-interval', type=float, default=5, help='检查HTML文件更新的间隔（秒）')
+    args = parser.parse_args()
+
+    server = GZIPTVPlaylistServer(args.html, args.host, args.port, args.udpxy, args.fcc or None,
+                                  args.cache_size, args.reload_interval)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
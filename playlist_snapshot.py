@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - 频道快照与增量更新
+保存上一次生成时的频道集合（以组播地址+名称为键），计算新增/删除/变化的频道，
+只有频道或生成参数变化时才重写输出文件；所有输出都先写临时文件再原子替换
+"""
+
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from channel_table import Channel
+
+# 参与比较的频道字段
+SNAPSHOT_FIELDS = ('name', 'original_name', 'igmp_url', 'rtsp_url', 'category')
+
+
+@contextmanager
+def atomic_open(path: str, encoding: str = 'utf-8', binary: bool = False,
+                buffering: int = -1, deferred: Optional[List[Tuple[str, str]]] = None) -> Iterator[IO]:
+    """写入同目录下的临时文件，成功后替换目标文件；失败时目标文件保持不变
+
+    指定 deferred 时写完不替换，而是把 (临时文件, 目标文件) 追加到 deferred，由调用方统一替换
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    try:
+        with (os.fdopen(fd, 'wb', buffering=buffering) if binary
+              else os.fdopen(fd, 'w', buffering=buffering, encoding=encoding)) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        if deferred is None:
+            os.replace(tmp_path, path)
+        else:
+            deferred.append((tmp_path, path))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def atomic_write_text(path: str, content: str, encoding: str = 'utf-8'):
+    with atomic_open(path, encoding) as f:
+        f.write(content)
+
+
+def channel_key(channel: Channel) -> str:
+    """频道的键：组播地址 + 名称"""
+    return f"{channel.igmp_url}|{channel.name}"
+
+
+def key_channels(channels: Iterable[Channel]) -> Dict[str, Dict]:
+    """按键索引频道；同一键重复出现时追加序号，保证重复频道的增减也能被发现"""
+    keyed = {}
+    for channel in channels:
+        key = channel_key(channel)
+        if key in keyed:
+            index = 2
+            while f"{key}#{index}" in keyed:
+                index += 1
+            key = f"{key}#{index}"
+        keyed[key] = {field: getattr(channel, field) for field in SNAPSHOT_FIELDS}
+    return keyed
+
+
+def diff_channels(old: Dict[str, Dict], new: Dict[str, Dict]) -> Dict[str, List]:
+    """比较两个频道集合"""
+    added = [new[key] for key in new if key not in old]
+    removed = [old[key] for key in old if key not in new]
+    changed = [{'key': key, 'before': old[key], 'after': new[key]}
+               for key in new if key in old and old[key] != new[key]]
+    return {'added': added, 'removed': removed, 'changed': changed}
+
+
+class GZIPTVChannelSnapshot:
+    # 快照格式版本
+    VERSION = 1
+
+    def __init__(self, path: str = 'channels_snapshot.json'):
+        self.path = path
+
+    def load(self) -> Optional[Dict]:
+        """读取上一次的快照，不存在或格式不正确时返回None"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"  ⚠️ 频道快照读取失败: {e}")
+            return None
+
+        if not isinstance(data, dict) or data.get('version') != self.VERSION:
+            return None
+        return data
+
+    def save(self, channels: Dict[str, Dict], render_key: str):
+        """保存快照；render_key 记录影响输出内容的生成参数（如UDPXY地址）"""
+        data = {
+            'version': self.VERSION,
+            'saved_at': time.time(),
+            'render_key': render_key,
+            'channels': channels,
+        }
+        atomic_write_text(self.path, json.dumps(data, ensure_ascii=False, indent=1))
+
+    def compare(self, channels: Iterable[Channel], render_key: str) -> Dict:
+        """与上一次的快照比较，返回变化报告"""
+        previous = self.load()
+        current = key_channels(channels)
+
+        if previous is None:
+            changes = diff_channels({}, current)
+            render_changed = True
+        else:
+            changes = diff_channels(previous.get('channels', {}), current)
+            render_changed = previous.get('render_key') != render_key
+
+        return {
+            'generated_at': time.time(),
+            'first_run': previous is None,
+            'render_changed': render_changed,
+            # 频道是否有任何变化；'changed' 是修改过的频道列表（来自 diff_channels）
+            'has_changes': bool(changes['added'] or changes['removed'] or changes['changed']),
+            'counts': {
+                'total': len(current),
+                'added': len(changes['added']),
+                'removed': len(changes['removed']),
+                'changed': len(changes['changed']),
+            },
+            **changes,
+            'keyed_channels': current,
+        }
+
+
+def save_change_report(report: Dict, path: str = 'channels_changes.json'):
+    """写出机器可读的变化报告"""
+    report = {key: value for key, value in report.items() if key != 'keyed_channels'}
+    atomic_write_text(path, json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - 步骤2重定向链学习
+记录步骤2走过的重定向链（URL中的Token和用户ID替换为占位符），
+下次运行时直接请求设置Cookie的跳转和预测的硬件认证页面，页面验证失败时再逐跳导航
+"""
+
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from playlist_snapshot import atomic_write_text
+
+# URL中原样出现和URL编码后出现的值使用不同的占位符，填回时保持原来的写法
+TOKEN_PLACEHOLDER = '{token}'
+TOKEN_QUOTED_PLACEHOLDER = '{token_q}'
+USER_ID_PLACEHOLDER = '{user_id}'
+USER_ID_QUOTED_PLACEHOLDER = '{user_id_q}'
+
+
+def placeholder_values(token: Optional[str], user_id: Optional[str]) -> Dict[str, str]:
+    """占位符 -> 填入的值"""
+    return {
+        TOKEN_PLACEHOLDER: token or '',
+        TOKEN_QUOTED_PLACEHOLDER: quote(token or '', safe=''),
+        USER_ID_PLACEHOLDER: user_id or '',
+        USER_ID_QUOTED_PLACEHOLDER: quote(user_id or '', safe=''),
+    }
+
+
+def template_url(url: str, token: Optional[str], user_id: Optional[str]) -> str:
+    """把URL中的Token和用户ID替换为占位符，原样出现的和URL编码后出现的分别记录"""
+    replacements = {}
+    for placeholder, value in placeholder_values(token, user_id).items():
+        # 编码前后相同时只用原样的占位符
+        if value and value not in replacements:
+            replacements[value] = placeholder
+    if not replacements:
+        return url
+    # 一次替换：较长的值优先，避免用户ID恰好是Token的一部分时被拆开
+    pattern = re.compile('|'.join(re.escape(value) for value in sorted(replacements, key=len, reverse=True)))
+    return pattern.sub(lambda match: replacements[match.group(0)], url)
+
+
+def fill_url(template: str, token: Optional[str], user_id: Optional[str]) -> str:
+    values = placeholder_values(token, user_id)
+    return re.sub('|'.join(re.escape(placeholder) for placeholder in values),
+                  lambda match: values[match.group(0)], template)
+
+
+class GZITVRedirectChain:
+    # 文件格式版本，格式变化时旧记录直接失效（2: 区分原样和URL编码的占位符）
+    VERSION = 2
+
+    def __init__(self, path: str = 'iptv_redirect_chain.json'):
+        self.path = path
+
+    def load(self) -> Optional[Dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get('version') != self.VERSION:
+            return None
+        return data
+
+    def learn(self, start_url: str, hops: List[Tuple[str, bool]], final_url: str,
+              token: Optional[str], user_id: Optional[str]) -> bool:
+        """记录一次成功的导航；hops 为 (跳转URL, 是否设置了Cookie)，不含最终的硬件认证页面"""
+        data = {
+            'version': self.VERSION,
+            'start': template_url(start_url, token, user_id),
+            'hops': [{'url': template_url(url, token, user_id), 'sets_cookies': sets_cookies}
+                     for url, sets_cookies in hops],
+            'final': template_url(final_url, token, user_id),
+            'learned_at': time.time(),
+        }
+        try:
+            atomic_write_text(self.path, json.dumps(data, ensure_ascii=False, indent=2))
+            return True
+        except OSError as e:
+            print(f"    ⚠️ 保存重定向链失败: {e}")
+            return False
+
+    def predict(self, start_url: str, token: Optional[str], user_id: Optional[str]) -> Optional[List[str]]:
+        """预测需要请求的URL：设置Cookie的跳转加上硬件认证页面；起始地址与记录不符时返回None"""
+        data = self.load()
+        if not data or data['start'] != template_url(start_url, token, user_id):
+            return None
+        urls = [fill_url(hop['url'], token, user_id) for hop in data['hops'] if hop['sets_cookies']]
+        urls.append(fill_url(data['final'], token, user_id))
+        return urls
+
+    def hop_count(self) -> int:
+        data = self.load()
+        return len(data['hops']) + 1 if data else 0
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
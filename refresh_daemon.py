@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - 定时刷新守护进程
+按计划执行 GZITVHTMLFetcher 和 GZIPTVM3UGenerator：Token有效期内复用缓存的会话，
+在服务器给出的过期时间之前重新认证；认证失败时按指数退避加随机抖动重试；
+频道没有变化时不重写播放列表；用文件锁防止多个刷新同时运行
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from typing import List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+from async_fetcher import FetchProfile, load_profiles
+from debug_store import GZITVDebugStore
+from http_transport import GZITVTransport
+from iptv import GZITVHTMLFetcher
+from playlist_render import DEFAULT_FORMATS
+from redirect_chain import GZITVRedirectChain
+from session_cache import GZITVSessionCache
+from To_M3U import GZIPTVM3UGenerator
+
+
+def log(message: str):
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+
+class RefreshLock:
+    """非阻塞的进程间文件锁，已被其他进程持有时 acquire() 返回False
+
+    使用 flock（Windows 上为 msvcrt.locking），进程崩溃时锁由系统释放，残留的锁文件不影响下次运行；
+    两者都没有的平台以独占方式创建锁文件，超过 stale_after 秒的锁文件视为崩溃残留
+    """
+
+    def __init__(self, path: str = 'iptv_refresh.lock', stale_after: float = 3600):
+        self.path = path
+        self.stale_after = stale_after
+        self.fd: Optional[int] = None
+
+    def acquire(self) -> bool:
+        if fcntl is None and msvcrt is None:
+            fd = self._create_exclusive()
+            if fd is None:
+                return False
+        else:
+            fd = os.open(self.path, os.O_CREAT | os.O_WRONLY, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            except OSError:
+                os.close(fd)
+                return False
+
+        self.fd = fd
+        os.write(fd, f"{os.getpid()}\n".encode('ascii'))
+        os.ftruncate(fd, os.lseek(fd, 0, os.SEEK_CUR))
+        return True
+
+    def _create_exclusive(self) -> Optional[int]:
+        try:
+            return os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            pass
+        try:
+            age = time.time() - os.path.getmtime(self.path)
+        except OSError:
+            return None
+        if age < self.stale_after:
+            return None
+        log(f"🧹 锁文件 {self.path} 已存在 {age:.0f}s，视为崩溃残留并删除")
+        try:
+            os.remove(self.path)
+            return os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except OSError:
+            return None
+
+    def release(self):
+        if self.fd is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+        elif msvcrt is not None:
+            os.lseek(self.fd, 0, os.SEEK_SET)
+            msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+            os.close(self.fd)
+        else:
+            os.close(self.fd)
+            os.remove(self.path)
+        self.fd = None
+
+
+class GZITVRefreshDaemon:
+    def __init__(self, profile: Optional[FetchProfile] = None, udpxy_url: str = "http://192.168.1.44:5140/rtp",
+                 formats: Tuple[str, ...] = DEFAULT_FORMATS, compress: bool = False,
+                 interval: float = 1800, min_interval: float = 60, refresh_margin: float = 120,
+                 backoff_base: float = 30, backoff_max: float = 1800,
+                 session_ttl: float = 6 * 3600, lock_path: str = 'iptv_refresh.lock',
+                 channel_store=None, debug_store: Optional[GZITVDebugStore] = None,
+                 run_deadline: Optional[float] = 90):
+        self.profile = profile or FetchProfile(name='default')
+        self.udpxy_url = udpxy_url
+        self.formats = formats
+        self.compress = compress
+
+        # 正常刷新间隔、两次刷新的最短间隔、Token过期前提前多少秒重新认证
+        self.interval = interval
+        self.min_interval = min_interval
+        self.refresh_margin = refresh_margin
+
+        # 失败后的退避：第n次连续失败等待 [上限/2, 上限] 内的随机时间，上限为 base * 2^(n-1)，不超过max
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failures = 0
+
+        # 服务器没有给出过期时间时，会话缓存最长使用session_ttl秒；给出时提前refresh_margin秒失效
+        self.session_cache = GZITVSessionCache(os.path.join(self.profile.output_dir or '.', 'iptv_session.json'),
+                                               ttl=session_ttl, expiry_margin=refresh_margin)
+        self.lock = RefreshLock(lock_path)
+        self.channel_store = channel_store
+        self.debug_store = debug_store
+        # 每次获取的总时间预算（秒），超时的刷新按失败处理并退避
+        self.run_deadline = run_deadline
+
+        # 上一次获取时流式提取的频道记录 (ChannelName, SDP)
+        self.records: List[Tuple[str, str]] = []
+        # 上一次生成播放列表时频道记录的摘要，内容相同时跳过转换
+        self.last_digest: Optional[str] = None
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def fetch(self) -> Tuple[bool, Optional[float]]:
+        """获取最终HTML并保存获取过程中提取的频道记录，返回 (是否成功, Token过期时间)"""
+        output_dir = self.profile.output_dir or '.'
+        fetcher = GZITVHTMLFetcher(config=self.profile.config,
+                                   hardware_params=self.profile.hardware_params,
+                                   output_dir=output_dir,
+                                   session_cache=self.session_cache,
+                                   debug_store=self.debug_store,
+                                   transport=GZITVTransport(run_deadline=self.run_deadline),
+                                   redirect_chain=GZITVRedirectChain(
+                                       os.path.join(output_dir, 'iptv_redirect_chain.json')))
+        try:
+            success = fetcher.run()
+        finally:
+            fetcher.session.close()
+        self.records = fetcher.channels if success else []
+        return success, fetcher.token_expires_at
+
+    def convert(self) -> bool:
+        """频道有变化时增量生成播放列表；使用获取时流式提取的频道记录，没有记录时读取最终HTML"""
+        html_file = os.path.join(self.profile.output_dir or '.', 'final_frameset_builder.html')
+        digest = hashlib.sha256()
+        if self.records:
+            for name, sdp in self.records:
+                digest.update(f"{name}\0{sdp}\n".encode('utf-8'))
+        else:
+            with open(html_file, 'rb') as f:
+                digest.update(f.read())
+        digest = digest.hexdigest()
+        if digest == self.last_digest:
+            log("📺 频道没有变化，跳过转换")
+            return True
+
+        generator = GZIPTVM3UGenerator(html_file, channel_store=self.channel_store)
+        if not generator.run(self.udpxy_url, incremental=True, formats=self.formats, compress=self.compress,
+                             records=self.records or None):
+            return False
+        self.last_digest = digest
+        return True
+
+    def refresh_once(self) -> Tuple[Optional[bool], Optional[float]]:
+        """执行一次刷新，返回 (是否成功, Token过期时间)；其他进程正在刷新时返回 (None, None)"""
+        if not self.lock.acquire():
+            log("⏸️ 其他刷新正在进行，跳过本次")
+            return None, None
+
+        try:
+            success, expires_at = self.fetch()
+            if success:
+                success = self.convert()
+            return success, expires_at
+        except Exception as e:
+            log(f"❌ 刷新异常: {e}")
+            return False, None
+        finally:
+            self.lock.release()
+
+    def next_delay(self, success: Optional[bool], expires_at: Optional[float]) -> float:
+        """计算到下一次刷新的等待时间"""
+        if success is None:
+            return self.min_interval
+
+        if not success:
+            self.failures += 1
+            ceiling = min(self.backoff_max, self.backoff_base * 2 ** (self.failures - 1))
+            return random.uniform(ceiling / 2, ceiling)
+
+        self.failures = 0
+        delay = self.interval
+        if expires_at:
+            # 在Token过期之前刷新，下一次会重新认证
+            delay = min(delay, expires_at - self.refresh_margin - time.time())
+        return max(delay, self.min_interval)
+
+    def run_forever(self):
+        log(f"🔁 刷新守护进程启动 (间隔 {self.interval:.0f}s，提前 {self.refresh_margin:.0f}s 重新认证)")
+        while not self.stop_event.is_set():
+            success, expires_at = self.refresh_once()
+            delay = self.next_delay(success, expires_at)
+
+            if success:
+                log(f"✅ 刷新完成，{delay:.0f}s 后再次刷新")
+            elif success is False:
+                log(f"❌ 刷新失败（连续 {self.failures} 次），{delay:.0f}s 后重试")
+
+            self.stop_event.wait(delay)
+        log("👋 刷新守护进程已停止")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='贵州电信IPTV 定时刷新守护进程')
+    parser.add_argument('udpxy_url', nargs='?', default="http://192.168.1.44:5140/rtp")
+    parser.add_argument('--profiles', help='账号配置文件（格式同 async_fetcher.py），使用其中第一个账号')
+    parser.add_argument('--workdir', default='.', help='工作目录，会话缓存和输出文件都写入该目录')
+    parser.add_argument('--interval', type=float, default=1800, help='正常刷新间隔（秒）')
+    parser.add_argument('--min-interval', type=float, default=60, help='两次刷新的最短间隔（秒）')
+    parser.add_argument('--refresh-margin', type=float, default=120, help='Token过期前提前多少秒重新认证')
+    parser.add_argument('--backoff-base', type=float, default=30, help='失败退避的初始等待（秒）')
+    parser.add_argument('--backoff-max', type=float, default=1800, help='失败退避的最长等待（秒）')
+    parser.add_argument('--deadline', type=float, default=90, help='每次获取的总时间预算（秒），0表示不限制')
+    parser.add_argument('--formats', default=','.join(DEFAULT_FORMATS), help='输出格式，逗号分隔')
+    parser.add_argument('--gzip', action='store_true', help='输出gzip压缩文件')
+    parser.add_argument('--history', action='store_true', help='把频道写入历史库 channel_history.db')
+    parser.add_argument('--once', action='store_true', help='只刷新一次（用于cron），与守护进程共用锁')
+    args = parser.parse_args()
+
+    profile = load_profiles(args.profiles)[0] if args.profiles else None
+    os.chdir(args.workdir)
+
+    channel_store = None
+    if args.history:
+        from channel_store import GZIPTVChannelStore
+        channel_store = GZIPTVChannelStore()
+
+    debug_dir = os.environ.get('GZITV_DEBUG_DIR')
+    debug_store = GZITVDebugStore(debug_dir) if debug_dir else None
+
+    daemon = GZITVRefreshDaemon(profile, args.udpxy_url,
+                                formats=tuple(name for name in args.formats.split(',') if name),
+                                compress=args.gzip, interval=args.interval, min_interval=args.min_interval,
+                                refresh_margin=args.refresh_margin, backoff_base=args.backoff_base,
+                                backoff_max=args.backoff_max, channel_store=channel_store,
+                                debug_store=debug_store, run_deadline=args.deadline or None)
+
+    try:
+        if args.once:
+            success, _ = daemon.refresh_once()
+            sys.exit(0 if success is not False else 1)
+
+        signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+        signal.signal(signal.SIGINT, lambda *_: daemon.stop())
+        daemon.run_forever()
+    finally:
+        if debug_store:
+            debug_store.close()
+
+
+if __name__ == "__main__":
+    main()
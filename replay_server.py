@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - 录制/回放
+录制认证流程中的完整HTTP交互（状态码、响应头、Cookie、重定向），
+并在本地启动替身服务器按录制内容回放，可配置延迟和抖动，用于离线测试和性能对比
+"""
+
+import argparse
+import base64
+import json
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from session_cache import dump_cookies
+
+# 回放时由替身服务器重新生成的响应头
+SKIPPED_HEADERS = {'content-length', 'transfer-encoding', 'connection', 'keep-alive',
+                   'content-encoding', 'set-cookie'}
+
+
+class GZITVRecorder:
+    # 录制文件格式版本
+    VERSION = 1
+
+    def __init__(self, path: str = 'iptv_cassette.json'):
+        self.path = path
+        self.exchanges: List[Dict] = []
+        self.meta: Dict = {}
+        self.lock = threading.Lock()
+
+    def attach(self, fetcher):
+        """挂到获取器上，录制之后的每一次请求"""
+        self.meta = {
+            'auth_base_url': fetcher.config['base_url'],
+            'user_id': fetcher.config['user_id'],
+        }
+        fetcher.response_hooks.append(self.record)
+
+    def record(self, resp):
+        """录制响应，包括requests自动跟随的重定向"""
+        with self.lock:
+            for r in list(resp.history) + [resp]:
+                self.exchanges.append(self.capture(r))
+
+    def capture(self, resp) -> Dict:
+        request = resp.request
+        body = request.body
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        return {
+            'method': request.method,
+            'url': request.url,
+            'request_body': base64.b64encode(body or b'').decode('ascii'),
+            'status': resp.status_code,
+            'reason': resp.reason,
+            'headers': [[name, value] for name, value in resp.headers.items()
+                        if name.lower() not in SKIPPED_HEADERS],
+            'cookies': dump_cookies(resp.cookies),
+            'body': base64.b64encode(resp.content).decode('ascii'),
+            'elapsed': resp.elapsed.total_seconds(),
+        }
+
+    def save(self) -> bool:
+        """保存录制文件"""
+        data = dict(self.meta, version=self.VERSION, recorded_at=time.time(),
+                    exchanges=self.exchanges)
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            print(f"📼 已录制 {len(self.exchanges)} 个请求: {self.path}")
+            return True
+        except OSError as e:
+            print(f"❌ 保存录制文件失败: {e}")
+            return False
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # 响应头和响应体分开写出，关闭Nagle避免与延迟ACK叠加出额外的40ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.replay.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self.replay()
+
+    def do_POST(self):
+        self.replay()
+
+    def do_HEAD(self):
+        self.replay()
+
+    def replay(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+
+        replay = self.server.replay
+        replay.delay()
+
+        exchange = replay.lookup(self.command, self.path)
+        if exchange is None:
+            body = f"no recorded response for {self.command} {self.path}".encode('utf-8')
+            self.send_response(404)
+            self.send_header('Content-Type', 'text/plain; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        body = replay.rewrite(base64.b64decode(exchange['body']))
+        self.send_response(exchange['status'], exchange.get('reason'))
+        for name, value in exchange['headers']:
+            if name.lower() == 'location':
+                value = replay.rewrite_url(value)
+            self.send_header(name, value)
+        for cookie in exchange['cookies']:
+            self.send_header('Set-Cookie', f"{cookie['name']}={cookie['value']}; Path={cookie.get('path') or '/'}")
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+
+class GZITVReplayServer:
+    def __init__(self, cassette_path: str, host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0, verbose: bool = False):
+        with open(cassette_path, 'r', encoding='utf-8') as f:
+            self.cassette = json.load(f)
+
+        self.latency = latency
+        self.jitter = jitter
+        self.verbose = verbose
+
+        # (方法, 路径, 查询) 精确匹配，(方法, 路径) 作为兜底；同一地址多次请求按录制顺序循环
+        self.exact: Dict[Tuple[str, str], List[Dict]] = defaultdict(list)
+        self.by_path: Dict[Tuple[str, str], List[Dict]] = defaultdict(list)
+        netlocs = {urlparse(self.cassette.get('auth_base_url', '')).netloc}
+        for exchange in self.cassette['exchanges']:
+            parsed = urlparse(exchange['url'])
+            path_qs = parsed.path + (f"?{parsed.query}" if parsed.query else '')
+            self.exact[(exchange['method'], path_qs)].append(exchange)
+            self.by_path[(exchange['method'], parsed.path)].append(exchange)
+            netlocs.add(parsed.netloc)
+        # 先替换较长的地址，避免 ip 替换掉 ip:port 的前缀
+        self.recorded_netlocs = sorted((n for n in netlocs if n), key=len, reverse=True)
+
+        self.counters: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.counter_lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), ReplayHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.replay = self
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def origin(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def netloc(self) -> str:
+        return urlparse(self.origin).netloc
+
+    def rewrite(self, data: bytes) -> bytes:
+        """将录制时的服务器地址替换为替身服务器地址"""
+        local = self.netloc.encode('ascii')
+        for netloc in self.recorded_netlocs:
+            data = data.replace(netloc.encode('ascii'), local)
+        return data
+
+    def rewrite_url(self, url: str) -> str:
+        return self.rewrite(url.encode('utf-8')).decode('utf-8')
+
+    def delay(self):
+        """模拟网络延迟和抖动"""
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def lookup(self, method: str, path_qs: str) -> Optional[Dict]:
+        for index, key in ((self.exact, (method, path_qs)),
+                           (self.by_path, (method, urlparse(path_qs).path))):
+            candidates = index.get(key)
+            if candidates:
+                with self.counter_lock:
+                    position = self.counters[key]
+                    self.counters[key] += 1
+                return candidates[position % len(candidates)]
+        return None
+
+    def reset(self):
+        """重置回放顺序，每次完整运行前调用"""
+        with self.counter_lock:
+            self.counters.clear()
+
+    def start(self) -> str:
+        """在后台线程启动，返回替身服务器地址"""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self.origin
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def record(cassette_path: str) -> bool:
+    """连接真实服务器执行一次完整流程并录制"""
+    from iptv import GZITVHTMLFetcher
+
+    fetcher = GZITVHTMLFetcher()
+    recorder = GZITVRecorder(cassette_path)
+    recorder.attach(fetcher)
+
+    success = fetcher.run()
+    recorder.save()
+    return success
+
+
+def main():
+    parser = argparse.ArgumentParser(description='贵州电信IPTV 录制/回放替身服务器')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help='录制一次完整的认证流程')
+    record_parser.add_argument('cassette', nargs='?', default='iptv_cassette.json')
+
+    serve_parser = subparsers.add_parser('serve', help='启动回放替身服务器')
+    serve_parser.add_argument('cassette')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8080)
+    serve_parser.add_argument('--latency', type=float, default=0.0, help='每个请求的延迟（秒）')
+    serve_parser.add_argument('--jitter', type=float, default=0.0, help='延迟抖动范围（秒）')
+
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        sys.exit(0 if record(args.cassette) else 1)
+
+    server = GZITVReplayServer(args.cassette, args.host, args.port,
+                               args.latency, args.jitter, verbose=True)
+    print(f"🔁 回放服务器: {server.origin}")
+    print(f"   认证地址: {server.rewrite_url(server.cassette.get('auth_base_url', ''))}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - 请求耗时跟踪
+记录认证链中每个请求的连接、首字节、下载、解码耗时和字节数，以及所属步骤/跳转序号，
+导出为JSON（可选Chrome trace格式，用 chrome://tracing 或 Perfetto 打开）
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# 当前线程中建立连接的累计耗时
+_connect_state = threading.local()
+
+
+def _add_connect_time(seconds: float):
+    _connect_state.total = getattr(_connect_state, 'total', 0.0) + seconds
+
+
+def _take_connect_time() -> float:
+    total = getattr(_connect_state, 'total', 0.0)
+    _connect_state.total = 0.0
+    return total
+
+
+def _fmt_ms(value: Optional[float]) -> str:
+    return f"{value:.1f}" if value is not None else '-'
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _add_connect_time(time.perf_counter() - start)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _add_connect_time(time.perf_counter() - start)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TracingHTTPAdapter(HTTPAdapter):
+    """连接池使用可计时的连接类，其他行为与HTTPAdapter一致"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+
+class GZITVRequestTracer:
+    def __init__(self, path: str = 'iptv_trace.json', chrome_path: Optional[str] = None):
+        self.path = path
+        self.chrome_path = chrome_path
+        self.events: List[Dict] = []
+        self.started_at = time.time()
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def attach(self, fetcher):
+        """挂到获取器上：替换连接池适配器，并让获取器把请求交给跟踪器执行"""
+        fetcher.transport.mount(fetcher.session, TracingHTTPAdapter(max_retries=0, **fetcher.transport.pool_kwargs()))
+        fetcher.tracer = self
+
+    def offset_ms(self, moment: float) -> float:
+        return (moment - self.origin) * 1000
+
+    def request(self, session, method: str, url: str, step: Optional[str] = None,
+                hop: Optional[int] = None, **kwargs):
+        """执行请求并记录各阶段耗时
+
+        未指定stream时先只读取响应头，再单独计时读取响应体，以区分首字节和下载时间；
+        调用方指定stream=True时由调用方读取响应体，下载时间记录为None
+        """
+        caller_streams = kwargs.pop('stream', False)
+        event = {
+            'step': step,
+            'hop': hop,
+            'method': method,
+            'url': url,
+            'status': None,
+            'redirects': 0,
+            'bytes': None,
+            'start_ms': None,
+            'connect_ms': None,
+            'ttfb_ms': None,
+            'download_ms': None,
+            'decode_ms': None,
+            'total_ms': None,
+            'error': None,
+            'thread': threading.get_ident(),
+        }
+
+        resp = None
+        _take_connect_time()
+        start = time.perf_counter()
+        event['start_ms'] = round(self.offset_ms(start), 3)
+        try:
+            resp = session.request(method, url, stream=True, **kwargs)
+            headers_at = time.perf_counter()
+            connect = _take_connect_time()
+            event['status'] = resp.status_code
+            event['redirects'] = len(resp.history)
+            event['connect_ms'] = round(connect * 1000, 3)
+            event['ttfb_ms'] = round((headers_at - start - connect) * 1000, 3)
+
+            if not caller_streams:
+                content = resp.content
+                event['bytes'] = len(content)
+                event['download_ms'] = round((time.perf_counter() - headers_at) * 1000, 3)
+            return resp
+        except Exception as e:
+            event['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            event['total_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            with self.lock:
+                self.events.append(event)
+            if resp is not None:
+                resp.trace_event = event
+
+    def record_download(self, resp, seconds: float, nbytes: int):
+        """记录由调用方流式读取的响应体的下载耗时和字节数"""
+        event = getattr(resp, 'trace_event', None)
+        if event is not None:
+            event['download_ms'] = round(seconds * 1000, 3)
+            event['bytes'] = nbytes
+            event['total_ms'] = round((event['total_ms'] or 0) + seconds * 1000, 3)
+
+    def record_decode(self, resp, seconds: float):
+        """记录响应解码耗时"""
+        event = getattr(resp, 'trace_event', None)
+        if event is not None:
+            event['decode_ms'] = round(seconds * 1000, 3)
+
+    def to_dict(self) -> Dict:
+        return {
+            'started_at': self.started_at,
+            'total_ms': round(sum(event['total_ms'] or 0 for event in self.events), 3),
+            'events': self.events,
+        }
+
+    def to_chrome_trace(self) -> Dict:
+        """转换为Chrome trace事件格式（时间单位为微秒）"""
+        trace_events = []
+        for event in self.events:
+            name = event['step'] or event['url']
+            if event['hop'] is not None:
+                name += f" #{event['hop']}"
+            start_us = event['start_ms'] * 1000
+            trace_events.append({
+                'name': name, 'cat': 'request', 'ph': 'X', 'pid': 1, 'tid': event['thread'],
+                'ts': start_us, 'dur': (event['total_ms'] or 0) * 1000,
+                'args': {key: event[key] for key in ('method', 'url', 'status', 'bytes', 'redirects', 'error')},
+            })
+
+            # 按顺序排列各阶段
+            phase_start = start_us
+            for phase in ('connect', 'ttfb', 'download', 'decode'):
+                duration = event[f'{phase}_ms']
+                if not duration:
+                    continue
+                trace_events.append({
+                    'name': phase, 'cat': 'phase', 'ph': 'X', 'pid': 1, 'tid': event['thread'],
+                    'ts': phase_start, 'dur': duration * 1000,
+                })
+                phase_start += duration * 1000
+
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def save(self) -> bool:
+        """导出跟踪文件"""
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+            print(f"⏱️ 请求跟踪已保存: {self.path}")
+
+            if self.chrome_path:
+                with open(self.chrome_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.to_chrome_trace(), f, ensure_ascii=False)
+                print(f"⏱️ Chrome trace已保存: {self.chrome_path}")
+            return True
+        except OSError as e:
+            print(f"⚠️ 保存请求跟踪失败: {e}")
+            return False
+
+    def print_summary(self, limit: int = 10):
+        """按耗时从高到低打印最慢的请求"""
+        print(f"\n⏱️ 最慢的 {min(limit, len(self.events))} 个请求:")
+        print(f"  {'步骤':<26}{'状态':>6}{'连接':>9}{'首字节':>9}{'下载':>9}{'解码':>9}{'总计(ms)':>10}")
+        for event in sorted(self.events, key=lambda e: e['total_ms'] or 0, reverse=True)[:limit]:
+            name = event['step'] or '-'
+            if event['hop'] is not None:
+                name += f" #{event['hop']}"
+            print(f"  {name:<28}{event['status'] or '-':>6}{_fmt_ms(event['connect_ms']):>9}"
+                  f"{_fmt_ms(event['ttfb_ms']):>9}{_fmt_ms(event['download_ms']):>9}"
+                  f"{_fmt_ms(event['decode_ms']):>9}{_fmt_ms(event['total_ms']):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='贵州电信IPTV 认证链请求耗时跟踪')
+    parser.add_argument('output', nargs='?', default='iptv_trace.json', help='JSON跟踪文件')
+    parser.add_argument('--chrome', help='同时导出Chrome trace格式文件')
+    args = parser.parse_args()
+
+    from iptv import GZITVHTMLFetcher
+
+    fetcher = GZITVHTMLFetcher()
+    tracer = GZITVRequestTracer(args.output, args.chrome)
+    tracer.attach(fetcher)
+
+    success = fetcher.run()
+    tracer.print_summary()
+    tracer.save()
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
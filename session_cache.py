@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - 会话缓存
+保存认证后的UserToken、Cookie和EPG地址，后续刷新可以跳过重新认证
+"""
+
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+
+class GZITVSessionCache:
+    # 缓存格式版本，格式变化时旧缓存直接失效
+    VERSION = 1
+
+    # 恢复会话必需的字段
+    REQUIRED_FIELDS = ('user_id', 'auth_base_url', 'token', 'current_base_url', 'cookies')
+
+    def __init__(self, path: str = 'iptv_session.json', ttl: int = 1800, expiry_margin: float = 60):
+        self.path = path
+        self.ttl = ttl
+        # 服务器给出Token过期时间时，提前这么多秒视为过期
+        self.expiry_margin = expiry_margin
+
+    def load(self, user_id: str, auth_base_url: str) -> Optional[Dict]:
+        """读取缓存，过期、账号不符或格式不正确时返回None"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"  ⚠️ 会话缓存读取失败: {e}")
+            return None
+
+        if not isinstance(state, dict) or state.get('version') != self.VERSION:
+            print("  ⚠️ 会话缓存版本不匹配，忽略")
+            return None
+
+        if (any(field not in state for field in self.REQUIRED_FIELDS)
+                or not state['token'] or not state['current_base_url']):
+            print("  ⚠️ 会话缓存缺少必要字段，忽略")
+            return None
+
+        if state['user_id'] != user_id or state['auth_base_url'] != auth_base_url:
+            print("  ⚠️ 会话缓存属于其他账号或认证服务器，忽略")
+            return None
+
+        age = time.time() - state.get('authenticated_at', 0)
+        if age < 0 or age > self.ttl:
+            print(f"  ⚠️ 会话缓存已过期 ({int(age)}秒)")
+            return None
+
+        expires_at = state.get('expires_at')
+        if expires_at and time.time() > expires_at - self.expiry_margin:
+            print("  ⚠️ 缓存的UserToken即将过期")
+            return None
+
+        return state
+
+    def save(self, state: Dict) -> bool:
+        """原子写入缓存文件（仅当前用户可读）"""
+        state = dict(state, version=self.VERSION, saved_at=time.time())
+        state.setdefault('authenticated_at', state['saved_at'])
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix='.session-', dir=directory)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, ensure_ascii=False, indent=2)
+                os.chmod(tmp_path, 0o600)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            return True
+        except OSError as e:
+            print(f"  ⚠️ 会话缓存保存失败: {e}")
+            return False
+
+    def clear(self):
+        """删除缓存文件"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"  ⚠️ 会话缓存删除失败: {e}")
+
+
+def dump_cookies(jar) -> List[Dict]:
+    """将requests的CookieJar转换为可序列化的列表"""
+    return [{
+        'name': cookie.name,
+        'value': cookie.value,
+        'domain': cookie.domain,
+        'path': cookie.path,
+        'expires': cookie.expires,
+        'secure': cookie.secure,
+    } for cookie in jar]
+
+
+def restore_cookies(jar, cookies: List[Dict]):
+    """将缓存的Cookie写回CookieJar，跳过已过期的Cookie"""
+    now = time.time()
+    for cookie in cookies:
+        if cookie.get('expires') and cookie['expires'] < now:
+            continue
+        jar.set(cookie['name'], cookie['value'],
+                domain=cookie.get('domain', ''),
+                path=cookie.get('path', '/'),
+                expires=cookie.get('expires'),
+                secure=cookie.get('secure', False))
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+贵州电信IPTV - 分阶段性能分析
+获取和转换流程的每个命名阶段（auth/navigate/hardware/redirect-chain/load/extract/sort/render/save）
+各用一个 cProfile 分析器，结束后每个阶段保存一个 pstats 文件，并输出汇总表和
+flamegraph.pl / speedscope 可读的折叠栈（collapsed stacks）
+
+未开启时使用 NULL_PROFILER，stage() 返回同一个空上下文，不产生额外开销
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import time
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Tuple, Union
+
+# 汇总中阶段的顺序（流程顺序），其他阶段排在后面
+STAGE_ORDER = ('auth', 'navigate', 'hardware', 'redirect-chain', 'load', 'extract', 'probe', 'fcc', 'sort',
+               'render', 'save')
+
+# pstats 中函数的键: (文件, 行号, 函数名)
+FunctionKey = Tuple[str, int, str]
+
+# 折叠栈的深度上限和最小时间（微秒），避免调用图很大时输出爆炸
+MAX_STACK_DEPTH = 64
+MIN_STACK_MICROSECONDS = 1
+
+# 分析器自身的调用（disable 和本模块的 __exit__）不计入结果
+IGNORED_FUNCTIONS = ("<method 'disable' of '_lsprof.Profiler' objects>",)
+
+_NULL_STAGE = nullcontext()
+
+
+class NullStageProfiler:
+    """关闭性能分析时使用"""
+    enabled = False
+
+    def stage(self, name: str):
+        return _NULL_STAGE
+
+    def save(self) -> List[str]:
+        return []
+
+
+NULL_PROFILER = NullStageProfiler()
+
+
+class ProfiledStage:
+    """一个阶段的上下文：进入时开启该阶段的分析器，退出时关闭并累计耗时"""
+
+    def __init__(self, profiler: 'GZITVStageProfiler', name: str):
+        self.profiler = profiler
+        self.name = name
+        self.profile: Optional[cProfile.Profile] = None
+        self.start = 0.0
+
+    def __enter__(self):
+        # cProfile 同一时间只能有一个分析器：嵌套的阶段计入外层阶段
+        if self.profiler.active is not None:
+            return self
+        self.profiler.active = self.name
+        self.profile = self.profiler.profiles.setdefault(self.name, cProfile.Profile())
+        self.start = time.perf_counter()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.profile is None:
+            return False
+        self.profile.disable()
+        elapsed = time.perf_counter() - self.start
+        self.profiler.wall[self.name] = self.profiler.wall.get(self.name, 0.0) + elapsed
+        self.profiler.entries[self.name] = self.profiler.entries.get(self.name, 0) + 1
+        self.profiler.active = None
+        return False
+
+
+def function_label(func: FunctionKey) -> str:
+    filename, line, name = func
+    if filename == '~':
+        label = name
+    else:
+        label = f"{name} ({os.path.basename(filename)}:{line})"
+    # 折叠栈用 ; 分隔栈帧，用最后一个空格分隔数值
+    return label.replace(';', ',')
+
+
+def is_ignored(func: FunctionKey) -> bool:
+    return func[2] in IGNORED_FUNCTIONS or os.path.basename(func[0]) == 'stage_profiler.py'
+
+
+def collapse_stats(stats: Dict, root: str) -> Dict[str, int]:
+    """把 pstats 的调用关系展开为折叠栈 {栈: 微秒}
+
+    cProfile 只记录 调用者->被调用者 的汇总，函数在某条调用路径上的时间按该路径上
+    调用边的累计时间占比分摊；递归调用只展开一层
+    """
+    callees: Dict[FunctionKey, List[Tuple[FunctionKey, float]]] = {}
+    roots = []
+    for func, (_, _, _, _, callers) in stats.items():
+        if is_ignored(func):
+            continue
+        known_callers = [caller for caller in callers if caller in stats and not is_ignored(caller)]
+        if not known_callers:
+            roots.append(func)
+        for caller in known_callers:
+            callees.setdefault(caller, []).append((func, callers[caller][3]))
+
+    stacks: Dict[str, int] = {}
+
+    def visit(func: FunctionKey, path: List[str], seen: set, fraction: float):
+        _, _, own_time, total_time, _ = stats[func]
+        path = path + [function_label(func)]
+        value = int(own_time * fraction * 1e6)
+        if value >= MIN_STACK_MICROSECONDS:
+            stack = ';'.join(path)
+            stacks[stack] = stacks.get(stack, 0) + value
+        if len(path) >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_time in callees.get(func, []):
+            if callee in seen:
+                continue
+            callee_total = stats[callee][3]
+            if callee_total <= 0:
+                continue
+            share = fraction * edge_time / callee_total
+            if share * callee_total * 1e6 < MIN_STACK_MICROSECONDS:
+                continue
+            visit(callee, path, seen | {callee}, share)
+
+    for func in roots:
+        visit(func, [root], {func}, 1.0)
+    return stacks
+
+
+class GZITVStageProfiler:
+    """按阶段收集 cProfile 数据；只分析调用 stage() 的线程"""
+    enabled = True
+
+    def __init__(self, output_dir: str = 'profile', top: int = 15):
+        self.output_dir = output_dir
+        # 汇总文件中每个阶段列出的函数数
+        self.top = top
+
+        self.profiles: Dict[str, cProfile.Profile] = {}
+        self.wall: Dict[str, float] = {}
+        self.entries: Dict[str, int] = {}
+        self.active: Optional[str] = None
+
+    def stage(self, name: str) -> ProfiledStage:
+        return ProfiledStage(self, name)
+
+    def stage_names(self) -> List[str]:
+        order = {name: index for index, name in enumerate(STAGE_ORDER)}
+        return sorted(self.profiles, key=lambda name: order.get(name, len(order)))
+
+    def stats(self, name: str) -> Optional[pstats.Stats]:
+        profile = self.profiles.get(name)
+        if profile is None:
+            return None
+        try:
+            return pstats.Stats(profile, stream=io.StringIO())
+        except TypeError:
+            # 阶段内没有记录到任何调用
+            return None
+
+    def summary_rows(self) -> List[Dict]:
+        rows = []
+        for name in self.stage_names():
+            stats = self.stats(name)
+            calls = primitive_calls = 0
+            hottest = ''
+            if stats is not None:
+                entries = {func: value for func, value in stats.stats.items() if not is_ignored(func)}
+                calls = sum(value[1] for value in entries.values())
+                primitive_calls = sum(value[0] for value in entries.values())
+                if entries:
+                    hottest = function_label(max(entries, key=lambda func: entries[func][2]))
+            rows.append({'stage': name, 'entries': self.entries.get(name, 0),
+                         'wall_ms': self.wall.get(name, 0.0) * 1000,
+                         'calls': calls, 'primitive_calls': primitive_calls, 'hottest': hottest})
+        return rows
+
+    def format_summary(self, rows: List[Dict]) -> str:
+        lines = [f"{'阶段':<16}{'次数':>6}{'耗时(ms)':>12}{'函数调用':>12}  自身耗时最多的函数",
+                 "-" * 90]
+        for row in rows:
+            lines.append(f"{row['stage']:<18}{row['entries']:>6}{row['wall_ms']:>12.1f}"
+                         f"{row['calls']:>14}  {row['hottest']}")
+        return '\n'.join(lines)
+
+    def save(self) -> List[str]:
+        """保存每个阶段的 pstats、汇总 summary.txt 和折叠栈 stacks.collapsed，返回写出的文件"""
+        if not self.profiles:
+            return []
+        os.makedirs(self.output_dir, exist_ok=True)
+        written = []
+
+        rows = self.summary_rows()
+        summary = io.StringIO()
+        summary.write(self.format_summary(rows) + '\n')
+        stacks: Dict[str, int] = {}
+
+        for name in self.stage_names():
+            stats = self.stats(name)
+            if stats is None:
+                continue
+            path = os.path.join(self.output_dir, f"{name}.pstats")
+            stats.dump_stats(path)
+            written.append(path)
+
+            summary.write(f"\n{'=' * 90}\n{name}: 按累计耗时排序的前 {self.top} 个函数\n")
+            stats.stream = summary
+            stats.sort_stats('cumulative').print_stats(self.top)
+
+            for stack, value in collapse_stats(stats.stats, name).items():
+                stacks[stack] = stacks.get(stack, 0) + value
+
+        path = os.path.join(self.output_dir, 'summary.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(summary.getvalue())
+        written.append(path)
+
+        # 折叠栈的数值单位为微秒
+        path = os.path.join(self.output_dir, 'stacks.collapsed')
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack in sorted(stacks):
+                f.write(f"{stack} {stacks[stack]}\n")
+        written.append(path)
+
+        print(f"\n📈 分阶段性能分析:")
+        print(self.format_summary(rows))
+        print(f"\n💾 分析结果已保存到 {self.output_dir}/（各阶段 .pstats、summary.txt、stacks.collapsed）")
+        print(f"   查看: python -m pstats {os.path.join(self.output_dir, '<阶段>.pstats')}；"
+              f"火焰图: flamegraph.pl {path} > flame.svg")
+        return written
+
+
+def create_profiler(output_dir: Optional[str]) -> Union[GZITVStageProfiler, NullStageProfiler]:
+    """output_dir 为None时返回不做任何事的 NULL_PROFILER"""
+    return GZITVStageProfiler(output_dir) if output_dir else NULL_PROFILER
+
+
+def profile_dir_from_argv(argv: List[str], default: str = 'profile') -> Optional[str]:
+    """解析 --profile / --profile=目录 参数"""
+    profile_dir = None
+    for arg in argv:
+        if arg == '--profile':
+            profile_dir = default
+        elif arg.startswith('--profile='):
+            profile_dir = arg.split('=', 1)[1] or default
+    return profile_dir
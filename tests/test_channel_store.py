@@ -0,0 +1,55 @@
+import sqlite3
+
+from channel_store import GZIPTVChannelStore
+from channel_table import Channel
+
+
+def make_channel(name, igmp, rtsp='rtsp://10.0.0.1/a.smil'):
+    return Channel(name, name, igmp, rtsp, '卫视', ('H', name))
+
+
+def test_parallel_lines_are_kept_separately(tmp_path):
+    with GZIPTVChannelStore(str(tmp_path / 'history.db')) as store:
+        store.record_run([make_channel('湖南卫视', 'igmp://239.1.1.1:8000'),
+                          make_channel('湖南卫视', 'igmp://239.1.1.2:8000')], seen_at=100)
+        store.record_run([make_channel('湖南卫视', 'igmp://239.1.1.1:8000'),
+                          make_channel('湖南卫视', 'igmp://239.1.1.2:8000')], seen_at=200)
+
+        current = store.current_channels()
+        assert sorted(row['igmp_url'] for row in current) == ['igmp://239.1.1.1:8000', 'igmp://239.1.1.2:8000']
+        assert [(row['line'], row['igmp_url']) for row in store.channel_history('湖南卫视')] == [
+            (1, 'igmp://239.1.1.1:8000'), (2, 'igmp://239.1.1.2:8000')]
+        # 并行的线路不是地址变化
+        assert store.multicast_moves() == []
+
+
+def test_multicast_move_is_reported_once(tmp_path):
+    with GZIPTVChannelStore(str(tmp_path / 'history.db')) as store:
+        store.record_run([make_channel('CCTV-1', 'igmp://239.1.1.1:8000')], seen_at=100)
+        store.record_run([make_channel('CCTV1', 'igmp://239.1.1.1:8000')], seen_at=200)
+        store.record_run([make_channel('CCTV-1', 'igmp://239.1.1.9:8000', rtsp='')], seen_at=300)
+
+        moves = store.multicast_moves()
+        assert [(row['previous_igmp_url'], row['igmp_url']) for row in moves] == [
+            ('igmp://239.1.1.1:8000', 'igmp://239.1.1.9:8000')]
+        assert len(store.lost_catchup()) == 1
+
+
+def test_old_database_is_migrated(tmp_path):
+    path = str(tmp_path / 'history.db')
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE runs (id INTEGER PRIMARY KEY, started_at REAL NOT NULL, channel_count INTEGER NOT NULL);
+        CREATE TABLE channels (id INTEGER PRIMARY KEY, norm_name TEXT NOT NULL UNIQUE, name TEXT NOT NULL,
+                               igmp_url TEXT NOT NULL, category TEXT NOT NULL, first_seen REAL NOT NULL,
+                               last_seen REAL NOT NULL, last_run INTEGER NOT NULL);
+        INSERT INTO runs VALUES (1, 100, 1);
+        INSERT INTO channels VALUES (7, '湖南卫视', '湖南卫视', 'igmp://239.1.1.1:8000', '卫视', 100, 100, 1);
+    ''')
+    conn.close()
+
+    with GZIPTVChannelStore(path) as store:
+        assert [(row['id'], row['line']) for row in store.current_channels()] == [(7, 1)]
+        store.record_run([make_channel('湖南卫视', 'igmp://239.1.1.1:8000'),
+                          make_channel('湖南卫视', 'igmp://239.1.1.2:8000')], seen_at=200)
+        assert len(store.current_channels()) == 2
@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+
+from channel_stream import CHANNEL_PATTERN_BYTES, ChannelStreamParser, decode_span, sniff_span_encoding
+from test_incremental import make_html
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_parser_matches_whole_file_for_any_chunk_size():
+    data = make_html(50).replace('\n', '\r\n').encode('gbk')
+    expected = CHANNEL_PATTERN_BYTES.findall(data)
+    for size in (1, 7, 64, 4096):
+        parser = ChannelStreamParser()
+        spans = []
+        for offset in range(0, len(data), size):
+            spans += parser.feed(data[offset:offset + size])
+        parser.close()
+        assert spans == expected and parser.count == 50
+
+    encoding = sniff_span_encoding([name for name, _ in expected])
+    assert encoding == 'gbk' and decode_span(expected[3][0], encoding) == '测试频道3'
+
+
+def test_fetch_path_does_not_import_generator():
+    # 获取脚本只需要频道提取，不应加载M3U生成器及其依赖
+    code = ("import sys, iptv; heavy = {'To_M3U', 'playlist_render', 'multicast_probe', 'channel_classifier', "
+            "'pinyin_table'} & set(sys.modules); print(sorted(heavy))")
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == '[]'
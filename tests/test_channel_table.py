@@ -0,0 +1,67 @@
+from channel_table import Channel, ChannelTable
+
+
+def make_channel(name, category, sort_key):
+    return Channel(name, name, f"igmp://239.1.1.{sort_key}:8000", '', category, (sort_key,))
+
+
+def names(ordered):
+    return [(category, [channel.name for channel in channels]) for category, channels in ordered]
+
+
+def make_table():
+    return ChannelTable([make_channel('卫视B', '卫视', 2), make_channel('CCTV1', '央视', 1),
+                         make_channel('卫视A', '卫视', 1)])
+
+
+def test_ordered_result_is_cached_until_table_changes():
+    table = make_table()
+    first = table.ordered(['央视', '卫视'])
+    assert names(first) == [('央视', ['CCTV1']), ('卫视', ['卫视A', '卫视B'])]
+    assert table.ordered(['央视', '卫视']) is first
+
+
+def test_append_and_remove_drop_cached_ordering():
+    table = make_table()
+    table.ordered(['央视', '卫视'])
+
+    extra = make_channel('卫视0', '卫视', 0)
+    table.append(extra)
+    assert names(table.ordered(['央视', '卫视']))[1] == ('卫视', ['卫视0', '卫视A', '卫视B'])
+
+    table.remove(extra)
+    assert names(table.ordered(['央视', '卫视']))[1] == ('卫视', ['卫视A', '卫视B'])
+
+    assert table.remove_where(lambda channel: channel.category == '央视') == 1
+    assert names(table.ordered(['央视', '卫视'])) == [('卫视', ['卫视A', '卫视B'])]
+    assert list(table.grouped()) == ['卫视']
+
+
+def test_in_place_changes_need_invalidate():
+    table = make_table()
+    table.ordered(['央视', '卫视', '失效'])
+    channel = table[0]
+    channel.category = '失效'
+    channel.sort_key = (0,)
+
+    # 直接修改频道不会使缓存失效
+    assert names(table.ordered(['央视', '卫视', '失效']))[1] == ('卫视', ['卫视A', '卫视B'])
+    table.invalidate()
+    assert names(table.ordered(['央视', '卫视', '失效'])) == \
+        [('央视', ['CCTV1']), ('卫视', ['卫视A']), ('失效', ['卫视B'])]
+
+
+def test_ordered_follows_changed_category_order():
+    table = make_table()
+    assert [category for category, _ in table.ordered(['央视', '卫视'])] == ['央视', '卫视']
+    assert [category for category, _ in table.ordered(['卫视', '央视'])] == ['卫视', '央视']
+    # 不在顺序中的分类不输出
+    assert [category for category, _ in table.ordered(['卫视'])] == ['卫视']
+    assert [category for category, _ in table.ordered(['央视', '卫视'])] == ['央视', '卫视']
+
+
+def test_clear_empties_cached_groups():
+    table = make_table()
+    table.grouped()
+    table.clear()
+    assert table.grouped() == {} and table.ordered(['央视', '卫视']) == []
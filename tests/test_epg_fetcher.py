@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+
+from epg_fetcher import GZIPTVEPGFetcher, Programme, load_channel_ids
+from To_M3U import GZIPTVM3UGenerator
+
+# 两个同名频道（不同线路、不同ChannelID）
+HTML = '\n'.join([
+    "<html><head><meta charset=\"UTF-8\"></head><body><script>",
+    "Authentication.CTCSetConfig('Channel','ChannelID=\"101\",ChannelName=\"贵州卫视\","
+    "ChannelSDP=\"igmp://239.1.1.1:8000|rtsp://10.0.0.1/101.smil\"');",
+    "Authentication.CTCSetConfig('Channel','ChannelID=\"202\",ChannelName=\"贵州卫视\","
+    "ChannelSDP=\"igmp://239.1.1.2:8000|rtsp://10.0.0.1/202.smil\"');",
+    "</script></body></html>",
+])
+
+
+def make_fetcher(tmp_path):
+    fetcher = SimpleNamespace(transport=SimpleNamespace(pool_maxsize=8))
+    return GZIPTVEPGFetcher(fetcher, str(tmp_path / 'epg_cache'), past_days=0, future_days=0, max_workers=1)
+
+
+def test_channels_sharing_a_name_keep_their_own_guide(tmp_path):
+    html_file = tmp_path / 'final_frameset_builder.html'
+    html_file.write_text(HTML, encoding='utf-8')
+    channel_ids = load_channel_ids(str(html_file))
+    assert channel_ids == {('贵州卫视', '239.1.1.1:8000'): '101', ('贵州卫视', '239.1.1.2:8000'): '202'}
+
+    generator = GZIPTVM3UGenerator(str(html_file))
+    assert generator.parse_html()
+    epg = make_fetcher(tmp_path)
+    day = epg.window()[0]
+    epg.save_day('101', day, [Programme(day + '080000', day + '090000', '新闻联播')])
+    epg.save_day('202', day, [Programme(day + '080000', day + '090000', '天气预报')])
+
+    entries = [(channel_ids[(channel.original_name, channel.multicast)], channel) for channel in generator.channels]
+    xmltv = tmp_path / 'xmltv.xml'
+    assert epg.write_xmltv(entries, str(xmltv)) == 2
+    text = xmltv.read_text(encoding='utf-8')
+    assert '<channel id="101">' in text and '<channel id="202">' in text
+    assert 'channel="202">\n    <title lang="zh">天气预报' in text
+
+    # M3U的tvg-id与节目单的频道ID一致
+    assert generator.run('http://127.0.0.1:4022/rtp', formats=('m3u',), epg_url='http://127.0.0.1/xmltv.xml',
+                         output_dir=str(tmp_path))
+    m3u = (tmp_path / 'iptv_channels.m3u').read_text(encoding='utf-8')
+    assert 'tvg-id="101"' in m3u and 'tvg-id="202"' in m3u
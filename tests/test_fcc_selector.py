@@ -0,0 +1,69 @@
+import pytest
+
+from channel_table import Channel
+from fcc_selector import FCCProbeResult, FCCTestServer, GZIPTVFCCSelector, parse_endpoint
+
+
+@pytest.fixture
+def stand_ins():
+    servers = [FCCTestServer('udp'), FCCTestServer('tcp'), FCCTestServer('tcp', listening=False)]
+    for server in servers:
+        server.start()
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+def make_channel(index, category='其他'):
+    return Channel(f"频道{index}", f"频道{index}", f"igmp://239.1.1.{index}:8000", '', category, (index,))
+
+
+def test_parse_endpoint_defaults_to_tcp():
+    assert parse_endpoint('10.0.0.1:8027') == ('tcp', '10.0.0.1', 8027)
+    assert parse_endpoint('udp://10.0.0.1:8027') == ('udp', '10.0.0.1', 8027)
+    with pytest.raises(ValueError):
+        parse_endpoint('http://10.0.0.1:8027')
+
+
+def test_measure_against_local_stand_ins(stand_ins):
+    udp, tcp, closed = stand_ins
+    selector = GZIPTVFCCSelector([server.endpoint for server in stand_ins], timeout=0.5, attempts=2,
+                                 cache_file=None)
+    results = selector.measure()
+
+    def result(server):
+        return results[server.endpoint.split('://', 1)[1]]
+
+    # UDP服务端口拒绝TCP连接说明主机有回应；TCP服务不监听时不可用
+    assert result(udp).alive and len(result(udp).samples) == 2
+    assert result(tcp).alive and result(tcp).latency_ms is not None
+    assert not result(closed).alive and result(closed).error
+    assert selector.best() in (result(udp).endpoint, result(tcp).endpoint)
+
+
+def test_plan_ranks_once_for_all_channels(monkeypatch):
+    selector = GZIPTVFCCSelector(['10.0.0.1:1', '10.0.0.2:1', '10.0.0.3:1'], strategy='weighted',
+                                 cache_file=None)
+    selector.results = {
+        '10.0.0.1:1': FCCProbeResult('10.0.0.1:1', 'tcp', alive=True, latency_ms=2.0),
+        '10.0.0.2:1': FCCProbeResult('10.0.0.2:1', 'tcp', alive=True, latency_ms=3.0),
+        '10.0.0.3:1': FCCProbeResult('10.0.0.3:1', 'tcp', alive=True, latency_ms=50.0),
+    }
+    calls = []
+    ranked = selector.ranked
+    monkeypatch.setattr(selector, 'ranked', lambda: calls.append(1) or ranked())
+
+    channels = [make_channel(i) for i in range(200)]
+    selector.plan([('其他', channels)])
+    endpoints = [selector.endpoint_for(channel) for channel in channels]
+    assert len(calls) == 1
+    # 延迟超过 最低延迟 × tolerance 的服务器不参与分配
+    assert set(endpoints) == {'10.0.0.1:1', '10.0.0.2:1'}
+    assert endpoints == [selector.endpoint_for(channel) for channel in channels]
+
+
+def test_group_strategy_falls_back_without_alive_servers():
+    selector = GZIPTVFCCSelector(['10.0.0.1:1'], strategy='group', cache_file=None, fallback='10.9.9.9:15970')
+    selector.results = {'10.0.0.1:1': FCCProbeResult('10.0.0.1:1', 'tcp', error='超时')}
+    selector.plan([('央视', [make_channel(1, '央视')])])
+    assert selector.endpoint_for(make_channel(1, '央视')) == '10.9.9.9:15970'
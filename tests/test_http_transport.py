@@ -0,0 +1,117 @@
+import pytest
+import requests
+
+import http_transport
+from http_transport import DeadlineExceeded, GZITVTransport, RetryPolicy
+
+
+class FakeClock:
+    """替换 time.monotonic 和 transport.sleep，等待只推进时间"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(http_transport.time, 'monotonic', clock.monotonic)
+    # 退避取上限，结果可预测
+    monkeypatch.setattr(http_transport.random, 'uniform', lambda low, high: high)
+    return clock
+
+
+def make_transport(clock, **kwargs):
+    transport = GZITVTransport(retry=RetryPolicy(attempts=3, backoff_base=0.5, backoff_max=4.0), **kwargs)
+    transport.sleep = clock.sleep
+    return transport
+
+
+def make_send(outcomes, clock=None, elapsed=0.0):
+    calls = []
+
+    def send(method, url, **kwargs):
+        calls.append(kwargs['timeout'])
+        if clock is not None:
+            clock.now += elapsed
+        outcome = outcomes[len(calls) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return send, calls
+
+
+def test_idempotent_request_retries_status_with_backoff(clock):
+    transport = make_transport(clock, run_deadline=None)
+    first, second, last = FakeResponse(503), FakeResponse(502), FakeResponse(200)
+    send, calls = make_send([first, second, last])
+
+    assert transport.request(send, 'GET', 'http://epg/', step='step1') is last
+    assert len(calls) == 3 and clock.sleeps == [0.5, 1.0]
+    assert first.closed and second.closed and not last.closed
+
+
+def test_post_retries_only_before_the_request_is_sent(clock):
+    transport = make_transport(clock, run_deadline=None)
+    send, calls = make_send([requests.exceptions.ConnectTimeout(), FakeResponse(200)])
+    assert transport.request(send, 'POST', 'http://epg/', step='step3').status_code == 200
+    assert len(calls) == 2
+
+    send, calls = make_send([requests.exceptions.ReadTimeout(), FakeResponse(200)])
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        transport.request(send, 'POST', 'http://epg/', step='step3')
+    assert len(calls) == 1
+    # 状态码重试也只对幂等请求
+    send, calls = make_send([FakeResponse(503), FakeResponse(200)])
+    assert transport.request(send, 'POST', 'http://epg/', step='step3').status_code == 503
+
+
+def test_timeouts_are_capped_by_step_budget(clock):
+    transport = make_transport(clock, run_deadline=10.0, connect_timeout=3.0)
+    transport.start_run()
+    send, calls = make_send([FakeResponse(200)])
+    transport.request(send, 'GET', 'http://epg/', step='step1.auth', timeout=15)
+    # step1 分到 10 × 0.15 = 1.5 秒
+    assert calls == [(1.5, 1.5)]
+
+
+def test_retry_is_abandoned_when_budget_cannot_cover_backoff(clock):
+    transport = make_transport(clock, run_deadline=10.0)
+    transport.start_run()
+    send, calls = make_send([requests.exceptions.ReadTimeout()] * 3, clock, elapsed=1.2)
+    with pytest.raises(DeadlineExceeded):
+        transport.request(send, 'GET', 'http://epg/', step='step1')
+    # 第一次失败后剩余 0.3 秒，不够等待 0.5 秒的退避
+    assert len(calls) == 1 and clock.sleeps == []
+
+
+def test_request_fails_immediately_after_budget_is_spent(clock):
+    transport = make_transport(clock, run_deadline=10.0)
+    transport.start_run()
+    clock.now += 11
+    send, calls = make_send([FakeResponse(200)])
+    with pytest.raises(DeadlineExceeded):
+        transport.request(send, 'GET', 'http://epg/', step='step4')
+    assert calls == []
+
+    # 流程结束后不再受预算限制
+    transport.end_run()
+    assert transport.request(send, 'GET', 'http://epg/', step='epg').status_code == 200
@@ -0,0 +1,47 @@
+from channel_table import Channel
+from playlist_snapshot import GZIPTVChannelSnapshot
+from To_M3U import GZIPTVM3UGenerator
+
+
+def make_html(count):
+    lines = ["<html><head><meta charset=\"UTF-8\"></head><body><script>"]
+    for index in range(count):
+        lines.append(f"Authentication.CTCSetConfig('Channel','ChannelID=\"{index}\",ChannelName=\"测试频道{index}\","
+                     f"ChannelSDP=\"igmp://239.1.1.{index}:8000|rtsp://10.0.0.1/{index}.smil?AuthInfo=x\"');")
+    lines.append("</script></body></html>")
+    return '\n'.join(lines)
+
+
+def make_channel(index):
+    return Channel(f"频道{index}", f"频道{index}", f"igmp://239.1.1.{index}:8000", '', '其他', ('P', index))
+
+
+def run_incremental(tmp_path, count):
+    html_file = tmp_path / 'final_frameset_builder.html'
+    html_file.write_text(make_html(count), encoding='utf-8')
+    generator = GZIPTVM3UGenerator(str(html_file))
+    assert generator.run('http://127.0.0.1:4022/rtp', incremental=True, formats=('m3u',),
+                         output_dir=str(tmp_path))
+    return (tmp_path / 'iptv_channels.m3u').read_text(encoding='utf-8').count('#EXTINF')
+
+
+def test_compare_reports_added_and_removed_channels(tmp_path):
+    snapshot = GZIPTVChannelSnapshot(str(tmp_path / 'snapshot.json'))
+    report = snapshot.compare([make_channel(i) for i in range(3)], 'key')
+    snapshot.save(report['keyed_channels'], 'key')
+
+    report = snapshot.compare([make_channel(i) for i in range(4)], 'key')
+    assert report['has_changes'] and report['counts']['added'] == 1 and report['changed'] == []
+
+    report = snapshot.compare([make_channel(i) for i in range(2)], 'key')
+    assert report['has_changes'] and report['counts']['removed'] == 1
+
+    report = snapshot.compare([make_channel(i) for i in range(3)], 'key')
+    assert not report['has_changes']
+
+
+def test_incremental_run_rewrites_when_channels_are_added_or_removed(tmp_path):
+    assert run_incremental(tmp_path, 20) == 20
+    assert run_incremental(tmp_path, 25) == 25
+    assert run_incremental(tmp_path, 10) == 10
+    assert run_incremental(tmp_path, 10) == 10
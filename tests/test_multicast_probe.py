@@ -0,0 +1,78 @@
+import time
+
+from channel_table import Channel, ChannelTable
+from multicast_probe import (DEAD_CATEGORY, RTP_PAYLOAD_MP2T, TS_PACKET_SIZE, TS_SYNC_BYTE, GZIPTVMulticastProber,
+                             MulticastTestSender, ProbeResult, apply_results, detect_payload)
+
+
+def make_table(count):
+    return ChannelTable(Channel(f"频道{i}", f"频道{i}", f"igmp://239.255.0.{i + 1}:5000", '', '其他', (i,))
+                        for i in range(count))
+
+
+def test_errored_results_leave_channels_unchanged():
+    table = make_table(3)
+    results = {
+        '239.255.0.1:5000': ProbeResult('239.255.0.1:5000', alive=True, payload='rtp', packets=10, joined=True),
+        '239.255.0.2:5000': ProbeResult('239.255.0.2:5000', joined=True),
+        '239.255.0.3:5000': ProbeResult('239.255.0.3:5000', error='[Errno 19] No such device'),
+    }
+    assert apply_results(table, results, 'drop') == (1, 1)
+    assert [channel.name for channel in table] == ['频道0', '频道2']
+    assert table.channels[1].alive is None
+
+
+def test_flag_marks_only_joined_groups_without_data():
+    table = make_table(2)
+    results = {
+        '239.255.0.1:5000': ProbeResult('239.255.0.1:5000', joined=True),
+        '239.255.0.2:5000': ProbeResult('239.255.0.2:5000', joined=True, error='[Errno 111] Connection refused'),
+    }
+    assert apply_results(table, results, 'flag') == (1, 1)
+    assert [channel.category for channel in table] == [DEAD_CATEGORY, '其他']
+
+
+def test_wrong_interface_is_reported_as_error_not_dead():
+    # 不是本机地址的网卡：加入组播组失败，不能判断频道是否失效
+    table = make_table(2)
+    results = GZIPTVMulticastProber('10.254.254.1', timeout=0.1).probe(table)
+    assert all(result.error and not result.joined and not result.dead for result in results.values())
+    assert apply_results(table, results, 'drop') == (0, 2)
+    assert len(table) == 2
+
+
+def test_detect_payload():
+    ts = bytes([TS_SYNC_BYTE]) + bytes(TS_PACKET_SIZE - 1)
+    assert detect_payload(ts * 7) == 'ts'
+    assert detect_payload(bytes([0x80, RTP_PAYLOAD_MP2T]) + bytes(10) + ts) == 'rtp'
+    # 负载类型不是33，但负载以TS同步字节开头
+    assert detect_payload(bytes([0x80, 96]) + bytes(10) + ts) == 'rtp'
+    assert detect_payload(b'hello world, not a stream') == 'unknown'
+
+
+def test_loopback_probe_detects_rtp_ts_and_silent_groups():
+    groups = [(f"239.255.77.{i + 1}", 47000 + i) for i in range(6)]
+    rtp_groups, ts_groups, silent = groups[:2], groups[2:4], groups[4:]
+    senders = [MulticastTestSender(rtp_groups, 'rtp'), MulticastTestSender(ts_groups, 'ts')]
+    for sender in senders:
+        sender.start()
+
+    prober = GZIPTVMulticastProber('127.0.0.1', max_concurrency=16, timeout=0.5, sample_time=0.3)
+    start = time.monotonic()
+    try:
+        results = prober.probe_groups(groups)
+    finally:
+        for sender in senders:
+            sender.stop()
+    elapsed = time.monotonic() - start
+
+    for groups_, payload in ((rtp_groups, 'rtp'), (ts_groups, 'ts')):
+        for ip, port in groups_:
+            result = results[f"{ip}:{port}"]
+            assert result.alive and result.payload == payload
+            assert result.packets > 1 and result.bitrate_kbps > 0 and result.first_packet_ms is not None
+    for ip, port in silent:
+        result = results[f"{ip}:{port}"]
+        assert result.dead and result.packets == 0 and result.error is None
+    # 所有组并发探测，总耗时约为一个超时
+    assert elapsed < prober.timeout + 0.5
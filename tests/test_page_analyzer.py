@@ -0,0 +1,17 @@
+from page_analyzer import analyze_page
+
+
+def test_empty_config_value_does_not_hide_later_value():
+    page = """
+    <script>
+    Authentication.CTCSetConfig('UserToken','');
+    Authentication.CTCSetConfig('UserToken','abc123');
+    Authentication.CTCSetConfig('UserToken','later');
+    </script>
+    """
+    assert analyze_page(page).config['UserToken'] == 'abc123'
+
+
+def test_only_empty_values_are_not_stored():
+    page = "Authentication.CTCSetConfig('EPGDomain','');"
+    assert 'EPGDomain' not in analyze_page(page).config
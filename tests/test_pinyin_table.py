@@ -0,0 +1,51 @@
+import pytest
+
+from pinyin_table import pinyin_initial
+from To_M3U import GZIPTVM3UGenerator
+
+# 原 get_sort_key 中的常见频道首字母映射（中 同时列在C和Z下，现在按读音归入Z）
+OLD_PINYIN_MAP = {
+    'C': ['重', '川'],
+    'A': ['安', '澳'],
+    'B': ['北', '百', '八'],
+    'D': ['大', '东', '都'],
+    'E': ['二', '鄂'],
+    'F': ['福', '方'],
+    'G': ['贵', '广', '甘'],
+    'H': ['湖', '河', '海', '黑'],
+    'J': ['江', '吉', '九'],
+    'K': ['康', '卡'],
+    'L': ['六', '辽', '龙'],
+    'M': ['民', '美'],
+    'N': ['宁', '南', '农'],
+    'Q': ['青', '七', '黔'],
+    'R': ['人', '日'],
+    'S': ['三', '上', '四', '山', '陕'],
+    'T': ['天', '台'],
+    'W': ['五', '卫', '晚'],
+    'X': ['西', '新', '湘', '厦'],
+    'Y': ['一', '央', '云', '延', '宜'],
+    'Z': ['藏', '浙'],
+}
+
+
+@pytest.mark.parametrize('char,initial', [(char, initial) for initial, chars in OLD_PINYIN_MAP.items()
+                                          for char in chars])
+def test_table_agrees_with_old_map(char, initial):
+    assert pinyin_initial(char) == initial
+
+
+@pytest.mark.parametrize('name,initial', [
+    ('厦门卫视', 'X'), ('西藏卫视', 'X'), ('藏语卫视', 'Z'), ('长沙新闻', 'C'), ('长春综合', 'C'),
+    ('重庆卫视', 'C'), ('中国教育1', 'Z'), ('番禺台', 'P'), ('六盘水新闻', 'L'),
+])
+def test_sort_key_uses_place_name_readings(name, initial):
+    generator = GZIPTVM3UGenerator()
+    assert generator.get_sort_key(name, '其他') == (initial, name)
+
+
+def test_place_names_sort_in_alphabetical_order():
+    generator = GZIPTVM3UGenerator()
+    names = ['浙江卫视', '厦门卫视', '长沙新闻', '四川卫视', '藏语卫视']
+    assert sorted(names, key=lambda name: generator.get_sort_key(name, '卫视')) == \
+        ['长沙新闻', '四川卫视', '厦门卫视', '浙江卫视', '藏语卫视']
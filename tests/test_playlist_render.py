@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from channel_table import Channel
+from playlist_render import GZIPTVPlaylistRenderer, JSONSink, M3USink
+
+
+class FailingSink(M3USink):
+    default_filename = 'failing.m3u'
+
+    def end(self, out):
+        raise OSError('disk full')
+
+
+def make_groups():
+    channel = Channel('CCTV-1', 'CCTV-1', 'igmp://239.1.1.1:8000', '', '央视', (0, 1, 'CCTV-1'))
+    return [('央视', [channel])]
+
+
+def test_render_replaces_all_outputs(tmp_path):
+    sinks = [M3USink(str(tmp_path / 'a.m3u')), JSONSink(str(tmp_path / 'a.json'))]
+    GZIPTVPlaylistRenderer().render(make_groups(), sinks)
+    assert 'CCTV-1' in (tmp_path / 'a.m3u').read_text(encoding='utf-8')
+    assert 'CCTV-1' in (tmp_path / 'a.json').read_text(encoding='utf-8')
+    assert sorted(os.listdir(tmp_path)) == ['a.json', 'a.m3u']
+
+
+@pytest.mark.parametrize('failing_first', [True, False])
+def test_failed_render_keeps_every_previous_output(tmp_path, failing_first):
+    (tmp_path / 'a.m3u').write_text('old m3u', encoding='utf-8')
+    (tmp_path / 'a.json').write_text('old json', encoding='utf-8')
+    sinks = [M3USink(str(tmp_path / 'a.m3u')), JSONSink(str(tmp_path / 'a.json'))]
+    failing = FailingSink(str(tmp_path / 'failing.m3u'))
+    sinks.insert(0 if failing_first else len(sinks), failing)
+
+    with pytest.raises(OSError):
+        GZIPTVPlaylistRenderer().render(make_groups(), sinks)
+
+    assert (tmp_path / 'a.m3u').read_text(encoding='utf-8') == 'old m3u'
+    assert (tmp_path / 'a.json').read_text(encoding='utf-8') == 'old json'
+    assert sorted(os.listdir(tmp_path)) == ['a.json', 'a.m3u']
+
+
+def test_failure_while_closing_a_later_output_keeps_earlier_ones(tmp_path, monkeypatch):
+    (tmp_path / 'a.m3u').write_text('old m3u', encoding='utf-8')
+    (tmp_path / 'a.json').write_text('old json', encoding='utf-8')
+    sinks = [M3USink(str(tmp_path / 'a.m3u')), JSONSink(str(tmp_path / 'a.json'))]
+
+    # 输出按相反顺序关闭：第一个关闭的写完，第二个在 fsync 时失败
+    real_fsync = os.fsync
+    calls = []
+
+    def flaky_fsync(fd):
+        calls.append(fd)
+        if len(calls) == 2:
+            raise OSError('I/O error')
+        real_fsync(fd)
+
+    monkeypatch.setattr('playlist_snapshot.os.fsync', flaky_fsync)
+    with pytest.raises(OSError):
+        GZIPTVPlaylistRenderer().render(make_groups(), sinks)
+
+    assert (tmp_path / 'a.m3u').read_text(encoding='utf-8') == 'old m3u'
+    assert (tmp_path / 'a.json').read_text(encoding='utf-8') == 'old json'
+    assert sorted(os.listdir(tmp_path)) == ['a.json', 'a.m3u']
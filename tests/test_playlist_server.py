@@ -0,0 +1,58 @@
+import asyncio
+import threading
+
+from playlist_server import GZIPTVPlaylistServer
+from test_incremental import make_html
+
+
+def test_load_html_applies_channels_on_event_loop(tmp_path, monkeypatch):
+    html_file = tmp_path / 'final_frameset_builder.html'
+    html_file.write_text(make_html(5), encoding='utf-8')
+    server = GZIPTVPlaylistServer(str(html_file))
+
+    threads = []
+    set_channels = server.set_channels
+    monkeypatch.setattr(server, 'set_channels', lambda *args: threads.append(threading.get_ident()) or
+                        set_channels(*args))
+
+    assert asyncio.run(server.load_html())
+    assert threads == [threading.get_ident()]
+    assert len(server.channels) == 5 and server.version
+    # 文件没有变化时不重新加载
+    assert not asyncio.run(server.load_html())
+
+
+def test_broken_html_keeps_current_channels(tmp_path):
+    html_file = tmp_path / 'final_frameset_builder.html'
+    html_file.write_text(make_html(3), encoding='utf-8')
+    server = GZIPTVPlaylistServer(str(html_file))
+    assert asyncio.run(server.load_html())
+    version = server.version
+
+    html_file.write_text('<html>维护中</html>', encoding='utf-8')
+    assert not asyncio.run(server.load_html())
+    assert server.version == version and len(server.channels) == 3
+
+
+def test_if_none_match_only_matches_served_variant(tmp_path):
+    html_file = tmp_path / 'final_frameset_builder.html'
+    html_file.write_text(make_html(3), encoding='utf-8')
+    server = GZIPTVPlaylistServer(str(html_file))
+
+    async def scenario():
+        await server.load_html()
+        _, plain_headers, _ = await server.handle_request('GET', '/playlist.m3u', {})
+        _, gzip_headers, _ = await server.handle_request('GET', '/playlist.m3u', {'accept-encoding': 'gzip'})
+        assert plain_headers['ETag'] != gzip_headers['ETag']
+
+        status, _, _ = await server.handle_request('GET', '/playlist.m3u', {'if-none-match': plain_headers['ETag']})
+        assert status == 304
+        # 客户端缓存的是未压缩版本，这次要返回gzip版本
+        status, headers, body = await server.handle_request(
+            'GET', '/playlist.m3u', {'accept-encoding': 'gzip', 'if-none-match': plain_headers['ETag']})
+        assert status == 200 and headers['Content-Encoding'] == 'gzip' and body
+        status, _, _ = await server.handle_request(
+            'GET', '/playlist.m3u', {'accept-encoding': 'gzip', 'if-none-match': gzip_headers['ETag']})
+        assert status == 304
+
+    asyncio.run(scenario())
@@ -0,0 +1,125 @@
+import http.server
+import json
+import threading
+from urllib.parse import quote
+
+import pytest
+
+from iptv import GZITVHTMLFetcher
+from redirect_chain import GZITVRedirectChain, fill_url, template_url
+
+TOKEN = 'ab+c/d=='
+USER_ID = 'gz0851'
+HARDWARE_PAGE = ('<html><body onload="gotoEPG()"><form action="funcportalauth.jsp" method="post">'
+                 '<input type="hidden" name="stbinfo" value=""></form></body></html>')
+
+
+@pytest.mark.parametrize('url', [
+    f"http://10.0.0.1/index.jsp?UserToken={TOKEN}&UserID={USER_ID}&STBID=null",
+    f"http://10.0.0.1/auth.jsp?t={quote(TOKEN, safe='')}&u={USER_ID}",
+    f"http://10.0.0.1/mixed.jsp?raw={TOKEN}&quoted={quote(TOKEN, safe='')}",
+])
+def test_template_round_trip_keeps_each_form(url):
+    template = template_url(url, TOKEN, USER_ID)
+    assert TOKEN not in template and quote(TOKEN, safe='') not in template and USER_ID not in template
+    assert fill_url(template, TOKEN, USER_ID) == url
+    # 新的Token按原来的写法填回
+    assert fill_url(template, 'x+y', USER_ID) == url.replace(quote(TOKEN, safe=''), 'x%2By').replace(TOKEN, 'x+y')
+
+
+def test_predict_returns_none_for_different_start(tmp_path):
+    chain = GZITVRedirectChain(str(tmp_path / 'chain.json'))
+    start = f"http://10.0.0.1/index.jsp?UserToken={TOKEN}&UserID={USER_ID}"
+    chain.learn(start, [('http://10.0.0.1/jump.jsp', False), ('http://10.0.0.1/auth.jsp', True)],
+                f"http://10.0.0.1/hw.jsp?UserToken={TOKEN}", TOKEN, USER_ID)
+
+    assert chain.predict(start.replace(TOKEN, 'new+token'), 'new+token', USER_ID) == \
+        ['http://10.0.0.1/auth.jsp', 'http://10.0.0.1/hw.jsp?UserToken=new+token']
+    assert chain.predict('http://10.0.0.2/index.jsp', TOKEN, USER_ID) is None
+    chain.clear()
+    assert chain.predict(start, TOKEN, USER_ID) is None
+
+
+class EPGHandler(http.server.BaseHTTPRequestHandler):
+    """index.jsp -> 302 jump.jsp -> auth.jsp（设置Cookie，JS跳转）-> 硬件认证页面"""
+    state = {}
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body='', headers=None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'text/html; charset=UTF-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.state['paths'].append(self.path)
+        path, _, query = self.path.partition('?')
+        hardware = self.state['hardware']
+        if path == '/index.jsp':
+            return self.reply(302, headers={'Location': f"/jump.jsp?t={quote(TOKEN, safe='')}"})
+        if path == '/jump.jsp':
+            return self.reply(302, headers={'Location': '/auth.jsp'})
+        if path == '/auth.jsp':
+            return self.reply(200, f"<script>window.location.href='{hardware}?UserToken={TOKEN}';</script>",
+                              {'Set-Cookie': 'JSESSIONID=S1; Path=/'})
+        # 只接受原样的Token
+        if path == hardware and query == f"UserToken={TOKEN}":
+            return self.reply(200, HARDWARE_PAGE)
+        return self.reply(200, '<html>系统维护中</html>')
+
+
+@pytest.fixture
+def epg_server():
+    EPGHandler.state = {'paths': [], 'hardware': '/hw.jsp'}
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), EPGHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, EPGHandler.state
+    server.shutdown()
+    server.server_close()
+
+
+def navigate(tmp_path, server):
+    fetcher = GZITVHTMLFetcher(config={'user_id': USER_ID}, output_dir=str(tmp_path),
+                               redirect_chain=GZITVRedirectChain(str(tmp_path / 'chain.json')))
+    fetcher.current_token = TOKEN
+    start = f"http://127.0.0.1:{server.server_port}/index.jsp?UserToken={TOKEN}&UserID={USER_ID}"
+    try:
+        return fetcher.step2_navigate_to_hardware_page(start)
+    finally:
+        fetcher.session.close()
+
+
+def test_learned_chain_requests_the_urls_it_learned(tmp_path, epg_server):
+    server, state = epg_server
+    success, url, _ = navigate(tmp_path, server)
+    assert success and url.endswith(f"/hw.jsp?UserToken={TOKEN}")
+    learned = json.loads((tmp_path / 'chain.json').read_text(encoding='utf-8'))
+    assert learned['final'].endswith('/hw.jsp?UserToken={token}')
+    assert learned['hops'][1]['url'].endswith('/jump.jsp?t={token_q}')
+
+    state['paths'].clear()
+    success, url, _ = navigate(tmp_path, server)
+    assert success
+    # 只请求设置Cookie的跳转和硬件认证页面
+    assert state['paths'] == ['/auth.jsp', f"/hw.jsp?UserToken={TOKEN}"]
+
+
+def test_falls_back_to_full_walk_when_prediction_is_wrong(tmp_path, epg_server):
+    server, state = epg_server
+    assert navigate(tmp_path, server)[0]
+
+    # 硬件认证页面换了地址，预测的页面不再是硬件认证页面
+    state['hardware'] = '/hw2.jsp'
+    state['paths'].clear()
+    success, url, _ = navigate(tmp_path, server)
+    assert success and url.endswith(f"/hw2.jsp?UserToken={TOKEN}")
+    assert state['paths'][:2] == ['/auth.jsp', f"/hw.jsp?UserToken={TOKEN}"]
+    assert state['paths'][2].startswith('/index.jsp')
+    learned = json.loads((tmp_path / 'chain.json').read_text(encoding='utf-8'))
+    assert learned['final'].endswith('/hw2.jsp?UserToken={token}')
@@ -0,0 +1,53 @@
+import os
+import time
+
+import refresh_daemon
+from async_fetcher import FetchProfile
+from refresh_daemon import GZITVRefreshDaemon, RefreshLock
+
+
+def test_lock_is_exclusive_and_reusable(tmp_path):
+    path = str(tmp_path / 'refresh.lock')
+    first, second = RefreshLock(path), RefreshLock(path)
+    assert first.acquire()
+    assert not second.acquire()
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_exclusive_file_lock_takes_over_stale_lock(tmp_path, monkeypatch):
+    # 没有 flock/msvcrt 的平台：崩溃残留的锁文件超时后可以重新获取
+    monkeypatch.setattr(refresh_daemon, 'fcntl', None)
+    monkeypatch.setattr(refresh_daemon, 'msvcrt', None)
+    path = tmp_path / 'refresh.lock'
+    path.write_text('12345\n')
+
+    lock = RefreshLock(str(path), stale_after=60)
+    assert not lock.acquire()
+
+    old = time.time() - 120
+    os.utime(path, (old, old))
+    assert lock.acquire()
+    assert path.read_text() == f"{os.getpid()}\n"
+    lock.release()
+    assert not path.exists()
+
+
+def test_session_cache_and_convert_use_profile_output_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    output_dir = tmp_path / 'profile'
+    output_dir.mkdir()
+    daemon = GZITVRefreshDaemon(FetchProfile(name='test', output_dir=str(output_dir)), formats=('m3u',))
+    assert daemon.session_cache.path == os.path.join(str(output_dir), 'iptv_session.json')
+
+    # 使用获取时流式提取的频道记录，不需要最终HTML文件
+    daemon.records = [('测试频道1', 'igmp://239.1.1.1:8000'), ('测试频道2', 'igmp://239.1.1.2:8000')]
+    assert daemon.convert()
+    assert (tmp_path / 'iptv_channels.m3u').read_text(encoding='utf-8').count('#EXTINF') == 2
+    digest = daemon.last_digest
+
+    daemon.records = daemon.records[:1]
+    assert daemon.convert()
+    assert daemon.last_digest != digest
+    assert (tmp_path / 'iptv_channels.m3u').read_text(encoding='utf-8').count('#EXTINF') == 1